@@ -0,0 +1,3 @@
+"""
+Benchmarks for the MDViewer rendering pipeline
+"""
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Reproducible synthetic Markdown documents for benchmarking
+"""
+
+import random
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog markdown viewer preview editor "
+    "render outline heading table code block list item link image export "
+    "document section paragraph performance latency memory thread cache index "
+    "search token parser extension style theme window file folder value"
+).split()
+
+LANGUAGES = ("python", "javascript", "c", "bash", "json")
+
+CODE_LINES = {
+    "python": ["def handler(event, context):", "    value = compute(event['key'])",
+               "    return {'status': 200, 'body': value}  # done"],
+    "javascript": ["function render(node) {", "  const out = node.children.map(render);",
+                   "  return `<div>${out.join('')}</div>`;", "}"],
+    "c": ["int main(int argc, char **argv) {", "    printf(\"%d\\n\", argc);",
+          "    return 0;", "}"],
+    "bash": ["for f in *.md; do", "  echo \"$f\" | grep -q draft && continue", "done"],
+    "json": ["{", "  \"name\": \"mdviewer\",", "  \"values\": [1, 2, 3]", "}"],
+}
+
+def _sentence(rng, words=12):
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words)))
+    # Sprinkle some inline markup so the highlighter and parser have work to do
+    roll = rng.random()
+    if roll < 0.1:
+        text += " **" + rng.choice(WORDS) + "**"
+    elif roll < 0.2:
+        text += " `" + rng.choice(WORDS) + "()`"
+    elif roll < 0.25:
+        text += " [" + rng.choice(WORDS) + "](https://example.com/" + rng.choice(WORDS) + ")"
+    return text.capitalize() + "."
+
+
+def _heading(rng, level):
+    return "#" * level + " " + " ".join(rng.choice(WORDS) for _ in range(3)).title()
+
+
+def prose(lines, rng):
+    out = []
+    while len(out) < lines:
+        out.append(_heading(rng, rng.choice((1, 2, 2, 3, 3, 3))))
+        out.append("")
+        for _ in range(rng.randint(2, 5)):
+            out.append(" ".join(_sentence(rng) for _ in range(rng.randint(2, 4))))
+            out.append("")
+    return out[:lines]
+
+
+def code(lines, rng):
+    out = []
+    while len(out) < lines:
+        out.append(_heading(rng, 2))
+        out.append(_sentence(rng))
+        out.append("")
+        language = rng.choice(LANGUAGES)
+        out.append("```" + language)
+        for _ in range(rng.randint(3, 12)):
+            out.extend(CODE_LINES[language])
+        out.append("```")
+        out.append("")
+    return out[:lines]
+
+
+def tables(lines, rng):
+    out = []
+    while len(out) < lines:
+        out.append(_heading(rng, 2))
+        out.append("")
+        columns = rng.randint(3, 8)
+        out.append("| " + " | ".join(rng.choice(WORDS).title() for _ in range(columns)) + " |")
+        out.append("|" + "---|" * columns)
+        for _ in range(rng.randint(5, 50)):
+            out.append("| " + " | ".join(
+                str(rng.randint(0, 99999)) if rng.random() < 0.5 else rng.choice(WORDS)
+                for _ in range(columns)
+            ) + " |")
+        out.append("")
+    return out[:lines]
+
+
+def nested(lines, rng):
+    out = []
+    while len(out) < lines:
+        out.append(_heading(rng, 2))
+        out.append("")
+        depth = 0
+        for _ in range(rng.randint(10, 40)):
+            depth = max(0, min(8, depth + rng.choice((-1, 0, 1))))
+            marker = rng.choice(("-", "*", "1."))
+            out.append("    " * depth + marker + " " + _sentence(rng, 8))
+        out.append("")
+    return out[:lines]
+
+
+def gfm(lines, rng):
+    """Task lists, strikethrough, bare links, emoji and fences nested in lists"""
+    out = []
+    while len(out) < lines:
+        out.append(_heading(rng, 2))
+        out.append("")
+        out.append(_sentence(rng) + " ~~" + rng.choice(WORDS) + "~~ :" + rng.choice(
+            ("smile", "rocket", "warning", "+1", "tada")) + ":")
+        out.append("See https://example.com/" + rng.choice(WORDS) + " or www.example.org.")
+        out.append("")
+        for _ in range(rng.randint(3, 10)):
+            out.append("- [" + rng.choice(" x") + "] " + _sentence(rng, 8))
+        out.append("")
+        out.append("1. " + _sentence(rng, 8))
+        out.append("")
+        language = rng.choice(LANGUAGES)
+        out.append("    ```" + language)
+        out.extend("    " + line for line in CODE_LINES[language])
+        out.append("    ```")
+        out.append("")
+    return out[:lines]
+
+
+def mixed(lines, rng):
+    generators = (prose, code, tables, nested)
+    out = []
+    while len(out) < lines:
+        out.extend(rng.choice(generators)(rng.randint(20, 200), rng))
+        out.append("")
+    return out[:lines]
+
+
+CORPORA = {
+    "prose": prose,
+    "code": code,
+    "tables": tables,
+    "nested": nested,
+    "mixed": mixed,
+    "gfm": gfm,
+}
+
+def generate(kind, lines, seed=0):
+    """Return a Markdown document of the given kind and line count"""
+    rng = random.Random(f"{kind}:{lines}:{seed}")
+    return "\n".join(CORPORA[kind](lines, rng))
\ No newline at end of file
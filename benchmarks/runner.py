@@ -0,0 +1,301 @@
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+
+# Qt pieces run without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt6.QtGui import QTextDocument
+from PyQt6.QtWidgets import QApplication
+
+# The exporter pulls in QtWebEngine, which must be imported before QApplication
+from mdviewer.exporter import HTMLExporter
+from mdviewer.editor import MarkdownEditor, MarkdownHighlighter, FindDialog
+from mdviewer.outline import DocumentOutline
+from mdviewer.fileio import atomic_write, read_document
+from mdviewer.paste import html_to_markdown
+from mdviewer.pipeline import EXTENSIONS, MarkdownPipeline, profile_extensions
+
+from benchmarks.corpus import CORPORA, generate
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Register a benchmark; the function returns the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("markdown_to_html")
+def bench_markdown_to_html(text):
+    exporter = HTMLExporter()
+    return lambda: exporter.markdown_to_html(text)
+
+
+@benchmark("markdown_fast_preview")
+def bench_markdown_fast_preview(text):
+    pipeline = MarkdownPipeline(profile_extensions("fast_preview"), preview=True)
+    return lambda: pipeline.convert(text)
+
+
+@benchmark("source_map_lookup")
+def bench_source_map_lookup(text):
+    pipeline = MarkdownPipeline(("source_map",), preview=True)
+    pipeline.convert(text)
+    source_map = pipeline.source_map()
+    # The block of every line, as the editor's cursor passes over them
+    lines = range(text.count('\n') + 1)
+    return lambda: [source_map.block_at(line) for line in lines]
+
+
+# Extensions every document gets; the others are loaded when the pre-scan
+# finds their syntax
+BASE_EXTENSIONS = tuple(
+    name for name in profile_extensions("full") if EXTENSIONS[name].detect is None
+)
+
+@benchmark("markdown_base")
+def bench_markdown_base(text):
+    pipeline = MarkdownPipeline(BASE_EXTENSIONS)
+    return lambda: pipeline.convert(text)
+
+
+def _bench_with_extension(name):
+    def setup(text):
+        # Loaded whether or not the text needs it; the cost of the extension
+        # is the difference to markdown_base
+        pipeline = MarkdownPipeline(BASE_EXTENSIONS + (name,), lazy=False)
+        return lambda: pipeline.convert(text)
+    return setup
+
+
+for _name, _info in EXTENSIONS.items():
+    if _info.detect is not None:
+        benchmark(f"markdown_with_{_name}")(_bench_with_extension(_name))
+
+
+@benchmark("extension_detect")
+def bench_extension_detect(text):
+    pipeline = MarkdownPipeline(profile_extensions("full"))
+    return lambda: pipeline.detect(text)
+
+
+@benchmark("outline_extract")
+def bench_outline_extract(text):
+    outline = DocumentOutline()
+    return lambda: outline.extract_headings(text)
+
+
+@benchmark("outline_build_tree")
+def bench_outline_build_tree(text):
+    outline = DocumentOutline()
+    headings = outline.extract_headings(text)
+    return lambda: outline.build_tree(headings)
+
+
+@benchmark("highlight_document")
+def bench_highlight_document(text):
+    document = QTextDocument()
+    document.setPlainText(text)
+    highlighter = MarkdownHighlighter(document)
+    
+    def run():
+        # rehighlight() calls highlightBlock for every block of the document
+        highlighter.rehighlight()
+        return document
+    return run
+
+
+@benchmark("find_common")
+def bench_find_common(text):
+    editor = MarkdownEditor()
+    editor.setPlainText(text)
+    dialog = FindDialog(editor)
+    dialog.search_input.setText("latency")
+    
+    def run():
+        dialog.find_first()
+        for _ in range(99):
+            dialog.find_next()
+    return run
+
+
+@benchmark("find_missing")
+def bench_find_missing(text):
+    editor = MarkdownEditor()
+    editor.setPlainText(text)
+    dialog = FindDialog(editor)
+    # Not found: scans the whole document, then again after wrapping
+    dialog.search_input.setText("zzzzzz")
+    return dialog.find_first
+
+
+@benchmark("paste_html")
+def bench_paste_html(text):
+    # The corpus as a browser would put it on the clipboard
+    html = HTMLExporter().markdown_to_html(text)
+    return lambda: html_to_markdown(html)
+
+
+@benchmark("read_document")
+def bench_read_document(text):
+    # Windows line endings, so the normalization is part of the timing
+    scratch = tempfile.TemporaryDirectory()
+    path = os.path.join(scratch.name, "document.md")
+    atomic_write(path, text, newline='\r\n')
+    
+    def run():
+        # Keeps the directory alive for as long as the benchmark is
+        return read_document(path), scratch
+    return run
+
+
+def time_callable(func, repeat):
+    """Return the wall time of each of repeat calls, in milliseconds"""
+    func()  # Warm up caches and lazy initialization
+    
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start) * 1000)
+    return runs
+
+
+def run_benchmarks(lines, repeat, corpora, benchmarks, seed=0):
+    results = {}
+    for kind in corpora:
+        text = generate(kind, lines, seed)
+        for name in benchmarks:
+            runs = time_callable(BENCHMARKS[name](text), repeat)
+            key = f"{name}/{kind}"
+            results[key] = {
+                'min_ms': min(runs),
+                'median_ms': statistics.median(runs),
+                'runs_ms': runs,
+            }
+            print(f"{key:40} {results[key]['median_ms']:10.2f} ms", flush=True)
+    
+    return {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'qt': QT_VERSION_STR,
+            'pyqt': PYQT_VERSION_STR,
+            'lines': lines,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def check_lazy_loading(lines, corpora, seed=0):
+    """Print the corpora that convert differently with every extension loaded
+    than with the ones the pre-scan picks, and return them"""
+    mismatches = []
+    for kind in corpora:
+        text = generate(kind, lines, seed)
+        for preview in (False, True):
+            lazy = MarkdownPipeline(profile_extensions("full"), preview=preview)
+            # An extension that takes the place of another renders differently
+            # by design, so both use the one the pre-scan picked
+            picked = lazy.detect(text)
+            eager = MarkdownPipeline(
+                [name for name in profile_extensions("full")
+                 if EXTENSIONS[name].replaces is None or name in picked],
+                lazy=False, preview=preview
+            )
+            key = f"{kind}{' (preview)' if preview else ''}"
+            same = lazy.convert(text) == eager.convert(text)
+            if not same:
+                mismatches.append(key)
+            print(f"{key:40} {'ok' if same else 'MISMATCH'}", flush=True)
+    return mismatches
+
+
+def compare_results(old, new, threshold):
+    """Print a comparison table and return the keys that regressed"""
+    regressions = []
+    print(f"{'benchmark':40} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    
+    for key in sorted(set(old['results']) & set(new['results'])):
+        old_ms = old['results'][key]['median_ms']
+        new_ms = new['results'][key]['median_ms']
+        change = (new_ms - old_ms) / old_ms if old_ms else 0.0
+        
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif change < -threshold:
+            flag = "  improved"
+        print(f"{key:40} {old_ms:10.2f} {new_ms:10.2f} {change:+8.1%}{flag}")
+    
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    run_parser = commands.add_parser('run', help="Run the benchmarks")
+    run_parser.add_argument('--lines', type=int, default=10000,
+                            help="Lines per generated document (default: 10000)")
+    run_parser.add_argument('--repeat', type=int, default=5,
+                            help="Timed runs per benchmark (default: 5)")
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                            help="Corpus to use (default: all)")
+    run_parser.add_argument('--bench', action='append', choices=sorted(BENCHMARKS),
+                            help="Benchmark to run (default: all)")
+    run_parser.add_argument('-o', '--output', help="Write results as JSON to this file")
+    
+    compare_parser = commands.add_parser('compare', help="Compare two result files")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help="Relative slowdown flagged as a regression (default: 0.10)")
+    
+    check_parser = commands.add_parser(
+        'check', help="Check that loading extensions on demand does not change the HTML"
+    )
+    check_parser.add_argument('--lines', type=int, default=2000,
+                              help="Lines per generated document (default: 2000)")
+    check_parser.add_argument('--seed', type=int, default=0)
+    check_parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                              help="Corpus to use (default: all)")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'check':
+        return 1 if check_lazy_loading(args.lines, args.corpus or list(CORPORA), args.seed) else 0
+    
+    if args.command == 'compare':
+        with open(args.old, 'r', encoding='utf-8') as file:
+            old = json.load(file)
+        with open(args.new, 'r', encoding='utf-8') as file:
+            new = json.load(file)
+        return 1 if compare_results(old, new, args.threshold) else 0
+    
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = run_benchmarks(
+        args.lines, args.repeat,
+        args.corpus or list(CORPORA), args.bench or list(BENCHMARKS), args.seed
+    )
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    return 0
\ No newline at end of file
@@ -1,16 +1,41 @@
 #!/usr/bin/env python3
 import sys
+import argparse
 from PyQt6.QtWidgets import QApplication
 from mdviewer.main_window import MainWindow
+from mdviewer.assets import register_asset_scheme
+from mdviewer.profiler import default_profile_dir
+
+def parse_args(arguments):
+    parser = argparse.ArgumentParser(prog="mdviewer", description="Markdown viewer and editor")
+    parser.add_argument("file", nargs="?", help="Markdown file to open")
+    parser.add_argument("--reader", action="store_true",
+                        help="Open in reader mode: preview only, editor loaded on demand")
+    parser.add_argument("--profile", type=float, metavar="SECONDS",
+                        help="Record a performance profile for SECONDS after startup")
+    parser.add_argument("--profile-dir", default=".", metavar="DIR",
+                        help="Folder in which to save the profile (default: current folder)")
+    # QApplication has already taken out its own options (e.g. -platform
+    # offscreen); others, such as Chromium's, are left to QtWebEngine
+    args, _ = parser.parse_known_args(arguments)
+    return args
 
 def main():
+    # Custom URL schemes must be registered before the application starts
+    register_asset_scheme()
+    
     app = QApplication(sys.argv)
     app.setApplicationName("MDViewer")
     app.setOrganizationName("MDViewer")
     
-    window = MainWindow()
+    args = parse_args(app.arguments()[1:])
+    
+    window = MainWindow(args.file, reader_mode=args.reader)
     window.show()
     
+    if args.profile:
+        window.record_profile(args.profile, default_profile_dir(args.profile_dir))
+    
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,293 @@
+import os
+import io
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+from PyQt6.QtCore import (
+    QObject, QRunnable, QThreadPool, QBuffer, QUrl, QStandardPaths, pyqtSignal
+)
+from PyQt6.QtWebEngineCore import (
+    QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+)
+
+ASSET_SCHEME = b"mdasset"
+
+# Images wider or taller than this are downscaled for the preview
+PREVIEW_MAX_SIZE = 1600
+
+# Formats we re-encode; anything else (SVG, animated GIF, ...) is served as is
+SCALABLE_FORMATS = ('JPEG', 'PNG', 'WEBP', 'BMP', 'TIFF')
+
+# Part of the cache key, so thumbnails made differently before are not used
+THUMBNAIL_VERSION = 2
+
+def register_asset_scheme():
+    """Register the asset scheme; must run before QApplication is created"""
+    scheme = QWebEngineUrlScheme(ASSET_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Path)
+    scheme.setFlags(
+        QWebEngineUrlScheme.Flag.SecureScheme |
+        QWebEngineUrlScheme.Flag.LocalAccessAllowed
+    )
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def asset_base_url(directory):
+    """Return the base URL under which relative paths resolve to directory"""
+    url = QUrl.fromLocalFile(os.path.join(os.path.abspath(directory), ''))
+    url.setScheme(ASSET_SCHEME.decode())
+    return url
+
+
+def asset_url_to_path(url):
+    """Map an asset URL back to a local file path"""
+    url = QUrl(url)
+    url.setScheme("file")
+    url.setQuery(None)
+    url.setFragment(None)
+    return url.toLocalFile()
+
+
+def make_preview_image(path, max_size=PREVIEW_MAX_SIZE):
+    """Return (mime type, bytes) of an image downscaled to fit max_size
+
+    Returns None if the image is small enough or cannot be re-encoded, in
+    which case the original file should be served.
+    """
+    with Image.open(path) as image:
+        if image.format not in SCALABLE_FORMATS:
+            return None
+        if image.width <= max_size and image.height <= max_size:
+            return None
+        
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        
+        # draft() lets the JPEG decoder skip most of the work for big images
+        image.draft('RGB', (max_size, max_size))
+        # The re-encoded image has no EXIF, so apply its orientation now
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        
+        # Keep transparency as PNG, everything else becomes a JPEG
+        output = io.BytesIO()
+        if has_alpha:
+            image.save(output, 'PNG')
+            return 'image/png', output.getvalue()
+        
+        image.convert('RGB').save(output, 'JPEG', quality=85)
+        return 'image/jpeg', output.getvalue()
+
+
+class ThumbnailCache:
+    """Preview images cached in memory and on disk by path, mtime and size
+
+    On disk, the least recently used thumbnails are removed once they take
+    more than disk_limit bytes.
+    """
+    
+    def __init__(self, cache_dir=None, memory_limit=64 * 1024 * 1024,
+                 disk_limit=256 * 1024 * 1024):
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation),
+                "thumbnails"
+            )
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+        # Accessed from several worker threads
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.memory_limit = memory_limit
+        
+        # Counted on the first store
+        self.disk_size = None
+        self.disk_limit = disk_limit
+    
+    def key(self, path, max_size=PREVIEW_MAX_SIZE):
+        stat = os.stat(path)
+        raw = (
+            f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{max_size}"
+            f"|{THUMBNAIL_VERSION}"
+        )
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    def get(self, path, max_size=PREVIEW_MAX_SIZE):
+        """Return (mime type, bytes) to serve for the image at path"""
+        key = self.key(path, max_size)
+        
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        
+        result = self._load(key)
+        if result is None:
+            result = make_preview_image(path, max_size)
+            if result is None:
+                # Small or unsupported images are served unchanged
+                with open(path, 'rb') as file:
+                    result = (guess_mime_type(path), file.read())
+            else:
+                self._store(key, result)
+        
+        self._remember(key, result)
+        return result
+    
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key)
+    
+    def _load(self, key):
+        try:
+            with open(self._disk_path(key), 'rb') as file:
+                data = file.read()
+            # The modification time orders thumbnails by last use
+            os.utime(self._disk_path(key))
+        except OSError:
+            return None
+        mime, _, body = data.partition(b'\n')
+        return mime.decode('ascii'), body
+    
+    def _store(self, key, result):
+        mime, body = result
+        temp_path = self._disk_path(key) + f".{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(mime.encode('ascii') + b'\n' + body)
+            os.replace(temp_path, self._disk_path(key))
+        except OSError:
+            return
+        
+        with self.lock:
+            if self.disk_size is None:
+                self.disk_size = sum(size for _, _, size in self._disk_entries())
+            else:
+                self.disk_size += len(mime) + 1 + len(body)
+            if self.disk_size > self.disk_limit:
+                self._trim()
+    
+    def _disk_entries(self):
+        """Return (mtime, path, size) of every cached thumbnail"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for entry in scan:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        except OSError:
+            pass
+        return entries
+    
+    def _trim(self):
+        # Down to three quarters of the limit, so trims are rare
+        entries = sorted(self._disk_entries())
+        self.disk_size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self.disk_size <= self.disk_limit * 3 // 4:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            self.disk_size -= size
+    
+    def _remember(self, key, result):
+        with self.lock:
+            if key in self.memory:
+                return
+            self.memory[key] = result
+            self.memory_size += len(result[1])
+            while self.memory_size > self.memory_limit and len(self.memory) > 1:
+                _, (_, body) = self.memory.popitem(last=False)
+                self.memory_size -= len(body)
+
+
+def guess_mime_type(path):
+    mime, _ = mimetypes.guess_type(path)
+    return mime or 'application/octet-stream'
+
+
+class _AssetSignals(QObject):
+    finished = pyqtSignal(int, str, bytes)  # request id, mime type, data
+    failed = pyqtSignal(int)
+
+
+class _AssetTask(QRunnable):
+    def __init__(self, request_id, path, cache, signals):
+        super().__init__()
+        self.request_id = request_id
+        self.path = path
+        self.cache = cache
+        self.signals = signals
+    
+    def run(self):
+        try:
+            if guess_mime_type(self.path).startswith('image/'):
+                mime, data = self.cache.get(self.path)
+            else:
+                with open(self.path, 'rb') as file:
+                    mime, data = guess_mime_type(self.path), file.read()
+        except Exception:
+            self.signals.failed.emit(self.request_id)
+            return
+        self.signals.finished.emit(self.request_id, mime, data)
+
+
+class AssetSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Serves local files next to the document, with images downscaled"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.cache = ThumbnailCache()
+        self.pool = QThreadPool(self)
+        self.jobs = {}
+        self._next_request_id = 0
+        
+        # Generated pages served from memory, by local path
+        self.pages = {}
+        
+        self.signals = _AssetSignals()
+        self.signals.finished.connect(self.on_finished)
+        self.signals.failed.connect(self.on_failed)
+    
+    def requestStarted(self, job):
+        path = asset_url_to_path(job.requestUrl())
+        if path in self.pages:
+            buffer = QBuffer(job)
+            buffer.setData(self.pages[path])
+            job.reply(b"text/html", buffer)
+            return
+        if not os.path.isfile(path):
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        
+        # The job is deleted if the page navigates away before we reply
+        self._next_request_id += 1
+        request_id = self._next_request_id
+        self.jobs[request_id] = job
+        job.destroyed.connect(lambda: self.jobs.pop(request_id, None))
+        
+        self.pool.start(_AssetTask(request_id, path, self.cache, self.signals))
+    
+    def on_finished(self, request_id, mime, data):
+        job = self.jobs.pop(request_id, None)
+        if job is None:
+            return
+        
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        job.reply(mime.encode('ascii'), buffer)
+    
+    def on_failed(self, request_id):
+        job = self.jobs.pop(request_id, None)
+        if job is not None:
+            job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
\ No newline at end of file
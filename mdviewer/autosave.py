@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import uuid
+
+from PyQt6.QtCore import QObject, QTimer, QStandardPaths, QLockFile
+
+from mdviewer.fileio import FileWriter
+
+class RecoverySnapshot:
+    """A document snapshot left behind by a session that did not exit cleanly"""
+    
+    def __init__(self, meta_path, text_path, lock_path, file_path, saved_at):
+        self.meta_path = meta_path
+        self.text_path = text_path
+        self.lock_path = lock_path
+        self.file_path = file_path
+        self.saved_at = saved_at
+    
+    def read_text(self):
+        with open(self.text_path, 'r', encoding='utf-8', newline='') as file:
+            return file.read()
+    
+    def discard(self):
+        for path in (self.meta_path, self.text_path, self.lock_path):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+class AutosaveManager(QObject):
+    """Periodically snapshots a modified document to the recovery directory"""
+    
+    def __init__(self, document, writer=None, interval_ms=10000, parent=None, busy=None):
+        super().__init__(parent)
+        
+        self.document = document
+        # Returns True while the text is not fit to snapshot, e.g. while it
+        # holds the placeholder of a paste still being converted
+        self.busy = busy
+        self.writer = writer or FileWriter(self)
+        self.current_file = None
+        self.recovery_dir = self.default_recovery_dir()
+        os.makedirs(self.recovery_dir, exist_ok=True)
+        
+        # Every session owns one snapshot, guarded by a lock file so that
+        # other running instances do not offer it for recovery
+        self.session_id = uuid.uuid4().hex
+        base = os.path.join(self.recovery_dir, self.session_id)
+        self.text_path = base + ".md"
+        self.meta_path = base + ".json"
+        self.lock = QLockFile(base + ".lock")
+        self.lock.setStaleLockTime(0)
+        self.lock.tryLock(0)
+        self.has_snapshot = False
+        
+        # Throttle rather than debounce: continuous typing still gets a
+        # snapshot every interval instead of postponing it forever
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.snapshot)
+        
+        self.document.contentsChanged.connect(self.schedule)
+    
+    @staticmethod
+    def default_recovery_dir():
+        data_dir = QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.AppLocalDataLocation
+        )
+        return os.path.join(data_dir, "recovery")
+    
+    def schedule(self):
+        """Start the throttle timer unless a snapshot is already pending"""
+        if not self.timer.isActive():
+            self.timer.start()
+    
+    def snapshot(self):
+        """Write the current text to the recovery directory in the background"""
+        if not self.document.isModified():
+            return
+        if self.busy is not None and self.busy():
+            self.timer.start()
+            return
+        
+        meta = {
+            'file': self.current_file,
+            'saved_at': time.time(),
+        }
+        
+        # The metadata file marks the snapshot as complete, so write it last
+        self.writer.write(self.text_path, self.document.toPlainText(), newline='')
+        self.writer.write(self.meta_path, json.dumps(meta))
+        self.has_snapshot = True
+    
+    def discard(self):
+        """Remove this session's snapshot, e.g. after a successful save"""
+        self.timer.stop()
+        if self.has_snapshot:
+            self.writer.remove(self.meta_path)
+            self.writer.remove(self.text_path)
+            self.has_snapshot = False
+    
+    def shutdown(self):
+        """Clean up on a normal exit"""
+        self.discard()
+        self.writer.wait()
+        self.lock.unlock()
+    
+    def find_snapshots(self):
+        """Return snapshots of crashed sessions, newest first"""
+        snapshots = []
+        
+        with os.scandir(self.recovery_dir) as entries:
+            meta_paths = [e.path for e in entries if e.name.endswith(".json")]
+        
+        for meta_path in meta_paths:
+            base = meta_path[:-len(".json")]
+            if base.endswith(self.session_id):
+                continue
+            
+            # A lock we can take belongs to a process that is no longer running
+            lock = QLockFile(base + ".lock")
+            lock.setStaleLockTime(0)
+            if not lock.tryLock(0):
+                continue
+            lock.unlock()
+            
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as file:
+                    meta = json.load(file)
+            except (OSError, ValueError):
+                continue
+            
+            if not os.path.exists(base + ".md"):
+                continue
+            
+            snapshots.append(RecoverySnapshot(
+                meta_path, base + ".md", base + ".lock",
+                meta.get('file'), meta.get('saved_at', 0)
+            ))
+        
+        snapshots.sort(key=lambda s: s.saved_at, reverse=True)
+        return snapshots
\ No newline at end of file
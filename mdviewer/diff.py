@@ -0,0 +1,356 @@
+from bisect import bisect_left
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QFont, QTextCharFormat, QTextCursor, QTextFormat
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTabWidget, QSplitter,
+    QPlainTextEdit, QTextEdit, QWidget
+)
+
+from mdviewer.pipeline import render_markdown
+from mdviewer.preview import MarkdownPreview
+from mdviewer.server import split_blocks
+
+# Regions without a line unique to both sides are diffed with Myers' algorithm
+# up to this many edits, and otherwise shown as replaced as a whole
+MYERS_LIMIT = 500
+
+# Light and dark backgrounds of (deleted, inserted, padding) rows
+DIFF_COLORS = {
+    False: ("#ffebe9", "#e6ffec", "#f6f8fa"),
+    True: ("#4b1818", "#12361f", "#2d2d2d"),
+}
+
+def _myers(a, b, a_lo, a_hi, b_lo, b_hi, limit):
+    """Return the matching (i, j, size) runs of a region, or None past limit edits"""
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    if abs(n - m) > limit:
+        # Takes at least that many insertions or deletions
+        return None
+    v = {1: 0}
+    trace = []
+    for d in range(min(limit, n + m) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_matches(trace, n, m, a_lo, b_lo)
+    return None
+
+
+def _myers_matches(trace, x, y, a_lo, b_lo):
+    # Walk back from the end; trace[d] holds the furthest points before edit d
+    matches = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            previous_k = k + 1
+            start_x = v[previous_k]
+        else:
+            previous_k = k - 1
+            start_x = v[previous_k] + 1
+        if x > start_x:
+            matches.append((a_lo + start_x, b_lo + start_x - k, x - start_x))
+        x = v[previous_k]
+        y = x - previous_k
+    if x > 0:
+        matches.append((a_lo, b_lo, x))
+    matches.reverse()
+    return matches
+
+
+def _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi):
+    """Return (i, j) of lines that occur once on each side, in order on both"""
+    counts = {}
+    for i in range(a_lo, a_hi):
+        line = a[i]
+        entry = counts.get(line)
+        counts[line] = [i, None] if entry is None else [-1, None]
+    for j in range(b_lo, b_hi):
+        entry = counts.get(b[j])
+        if entry is not None and entry[0] >= 0:
+            # -2 marks a line seen twice in b
+            entry[1] = j if entry[1] is None else -2
+    pairs = sorted((i, j) for i, j in counts.values() if i >= 0 and j is not None and j >= 0)
+    
+    # Longest increasing run of j, by patience sorting
+    tops = []
+    links = []
+    top_index = []
+    for position, (_, j) in enumerate(pairs):
+        pile = bisect_left(tops, j)
+        links.append(top_index[pile - 1] if pile else -1)
+        if pile == len(tops):
+            tops.append(j)
+            top_index.append(position)
+        else:
+            tops[pile] = j
+            top_index[pile] = position
+    
+    anchors = []
+    position = top_index[-1] if top_index else -1
+    while position >= 0:
+        anchors.append(pairs[position])
+        position = links[position]
+    anchors.reverse()
+    return anchors
+
+
+def _diff(a, b, a_lo, a_hi, b_lo, b_hi, matches):
+    # Common prefix and suffix
+    start = a_lo
+    while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+        a_lo += 1
+        b_lo += 1
+    if a_lo > start:
+        matches.append((start, b_lo - (a_lo - start), a_lo - start))
+    
+    suffix = 0
+    while (a_lo < a_hi - suffix and b_lo < b_hi - suffix
+           and a[a_hi - suffix - 1] == b[b_hi - suffix - 1]):
+        suffix += 1
+    a_hi -= suffix
+    b_hi -= suffix
+    
+    if a_lo < a_hi and b_lo < b_hi:
+        anchors = _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi)
+        if anchors:
+            i_lo, j_lo = a_lo, b_lo
+            for i, j in anchors:
+                if i > i_lo or j > j_lo:
+                    _diff(a, b, i_lo, i, j_lo, j, matches)
+                matches.append((i, j, 1))
+                i_lo, j_lo = i + 1, j + 1
+            if i_lo < a_hi or j_lo < b_hi:
+                _diff(a, b, i_lo, a_hi, j_lo, b_hi, matches)
+        else:
+            matches.extend(_myers(a, b, a_lo, a_hi, b_lo, b_hi, MYERS_LIMIT) or ())
+    
+    if suffix:
+        matches.append((a_hi, b_hi, suffix))
+
+
+def diff_sequences(a, b):
+    """Return difflib-style opcodes (tag, i1, i2, j1, j2) turning a into b
+
+    Items are replaced by integers first, so the diff itself only compares
+    small ints. Lines that are unique to both sides anchor the diff, as in
+    patience diff; the regions between them are diffed recursively and
+    fall back to Myers' algorithm when they have no unique lines.
+    """
+    ids = {}
+    a = [ids.setdefault(item, len(ids)) for item in a]
+    b = [ids.setdefault(item, len(ids)) for item in b]
+    
+    matches = []
+    _diff(a, b, 0, len(a), 0, len(b), matches)
+    
+    opcodes = []
+    i = j = 0
+    for match_i, match_j, size in matches + [(len(a), len(b), 0)]:
+        if i < match_i and j < match_j:
+            opcodes.append(('replace', i, match_i, j, match_j))
+        elif i < match_i:
+            opcodes.append(('delete', i, match_i, j, j))
+        elif j < match_j:
+            opcodes.append(('insert', i, i, j, match_j))
+        if size:
+            if opcodes and opcodes[-1][0] == 'equal':
+                # Runs found separately can be adjacent
+                _, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(('equal', i1, match_i + size, j1, match_j + size))
+            else:
+                opcodes.append(('equal', match_i, match_i + size, match_j, match_j + size))
+        i, j = match_i + size, match_j + size
+    return opcodes
+
+
+def diff_lines(old_text, new_text):
+    return diff_sequences(old_text.split('\n'), new_text.split('\n'))
+
+
+def side_by_side(old_lines, new_lines, opcodes):
+    """Return aligned (left rows, right rows, changes) for two columns
+
+    Deleted and inserted lines face empty padding rows on the other side;
+    changes are (first row, row count, tag) of each change.
+    """
+    left = []
+    right = []
+    changes = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            left.extend(old_lines[i1:i2])
+            right.extend(new_lines[j1:j2])
+            continue
+        rows = max(i2 - i1, j2 - j1)
+        changes.append((len(left), rows, tag))
+        left.extend(old_lines[i1:i2])
+        left.extend([''] * (rows - (i2 - i1)))
+        right.extend(new_lines[j1:j2])
+        right.extend([''] * (rows - (j2 - j1)))
+    return left, right, changes
+
+
+def rendered_diff(old_html, new_html):
+    """Return new_html with changed top-level blocks marked, and removed ones kept"""
+    old_blocks = split_blocks(old_html)
+    new_blocks = split_blocks(new_html)
+    parts = []
+    for tag, i1, i2, j1, j2 in diff_sequences(old_blocks, new_blocks):
+        if tag == 'equal':
+            parts.extend(new_blocks[j1:j2])
+            continue
+        parts.extend(f'<div class="diff-deleted">{block}</div>' for block in old_blocks[i1:i2])
+        parts.extend(f'<div class="diff-inserted">{block}</div>' for block in new_blocks[j1:j2])
+    return ''.join(parts)
+
+
+class DiffDialog(QDialog):
+    """Two versions of a document side by side, as source and as rendered"""
+    
+    def __init__(self, parent=None, dark_mode=False):
+        super().__init__(parent)
+        self.dark_mode = dark_mode
+        self.changes = []
+        self.setup_ui()
+    
+    def setup_ui(self):
+        self.setWindowTitle("Compare Versions")
+        self.resize(1100, 700)
+        
+        layout = QVBoxLayout(self)
+        
+        # Summary and change navigation
+        header_layout = QHBoxLayout()
+        self.summary_label = QLabel("")
+        self.previous_button = QPushButton("Previous Change")
+        self.next_button = QPushButton("Next Change")
+        header_layout.addWidget(self.summary_label)
+        header_layout.addStretch()
+        header_layout.addWidget(self.previous_button)
+        header_layout.addWidget(self.next_button)
+        layout.addLayout(header_layout)
+        
+        self.tabs = QTabWidget()
+        layout.addWidget(self.tabs)
+        
+        # Source, with a column per version
+        source = QWidget()
+        source_layout = QVBoxLayout(source)
+        source_layout.setContentsMargins(0, 0, 0, 0)
+        labels_layout = QHBoxLayout()
+        self.old_label = QLabel("")
+        self.new_label = QLabel("")
+        labels_layout.addWidget(self.old_label)
+        labels_layout.addWidget(self.new_label)
+        source_layout.addLayout(labels_layout)
+        
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        font = QFont("Consolas, 'Courier New', monospace")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        self.old_view = QPlainTextEdit()
+        self.new_view = QPlainTextEdit()
+        for view in (self.old_view, self.new_view):
+            view.setReadOnly(True)
+            view.setFont(font)
+            view.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+            splitter.addWidget(view)
+        source_layout.addWidget(splitter)
+        self.tabs.addTab(source, "Source")
+        
+        # Rendered, with changed blocks marked
+        self.preview = MarkdownPreview()
+        self.preview.set_dark_mode(self.dark_mode)
+        self.tabs.addTab(self.preview, "Preview")
+        
+        # Both columns have the same rows, so they scroll together
+        old_bar = self.old_view.verticalScrollBar()
+        new_bar = self.new_view.verticalScrollBar()
+        old_bar.valueChanged.connect(new_bar.setValue)
+        new_bar.valueChanged.connect(old_bar.setValue)
+        old_horizontal = self.old_view.horizontalScrollBar()
+        new_horizontal = self.new_view.horizontalScrollBar()
+        old_horizontal.valueChanged.connect(new_horizontal.setValue)
+        new_horizontal.valueChanged.connect(old_horizontal.setValue)
+        
+        # Connect signals
+        self.previous_button.clicked.connect(lambda: self.go_to_change(-1))
+        self.next_button.clicked.connect(lambda: self.go_to_change(1))
+    
+    def set_versions(self, old_text, new_text, old_name, new_name, base_dir=None):
+        """Compare old_text with new_text"""
+        self.old_label.setText(old_name)
+        self.new_label.setText(new_name)
+        
+        old_lines = old_text.split('\n')
+        new_lines = new_text.split('\n')
+        opcodes = diff_sequences(old_lines, new_lines)
+        left, right, self.changes = side_by_side(old_lines, new_lines, opcodes)
+        
+        deleted = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag != 'equal')
+        inserted = sum(j2 - j1 for tag, _, _, j1, j2 in opcodes if tag != 'equal')
+        self.summary_label.setText(
+            f"{len(self.changes)} changes: {inserted} lines added, {deleted} removed"
+            if self.changes else "No differences"
+        )
+        
+        self.old_view.setPlainText('\n'.join(left))
+        self.new_view.setPlainText('\n'.join(right))
+        self.highlight_changes()
+        
+        self.preview.set_base_path(base_dir)
+        self.preview.show_html(rendered_diff(
+            render_markdown(old_text, base_dir=base_dir),
+            render_markdown(new_text, base_dir=base_dir),
+        ))
+    
+    def highlight_changes(self):
+        deleted, inserted, padding = (QColor(color) for color in DIFF_COLORS[self.dark_mode])
+        for view, side in ((self.old_view, 'delete'), (self.new_view, 'insert')):
+            document = view.document()
+            selections = []
+            for row, rows, tag in self.changes:
+                if tag == 'replace' or tag == side:
+                    color = deleted if side == 'delete' else inserted
+                else:
+                    color = padding
+                
+                # One selection per change; full width covers each of its rows
+                selection = QTextEdit.ExtraSelection()
+                selection.format = QTextCharFormat()
+                selection.format.setBackground(color)
+                selection.format.setProperty(QTextFormat.Property.FullWidthSelection, True)
+                cursor = QTextCursor(document.findBlockByNumber(row))
+                last = document.findBlockByNumber(row + rows - 1)
+                cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+                selection.cursor = cursor
+                selections.append(selection)
+            view.setExtraSelections(selections)
+    
+    def go_to_change(self, step):
+        """Scroll to the next (1) or previous (-1) change after the first visible row"""
+        if not self.changes:
+            return
+        rows = [row for row, _, _ in self.changes]
+        current = self.new_view.firstVisibleBlock().blockNumber()
+        if step > 0:
+            index = bisect_left(rows, current + 1)
+            index = index if index < len(rows) else 0
+        else:
+            index = bisect_left(rows, current) - 1
+        row = rows[index]
+        
+        # The old column follows through the shared scroll position
+        self.new_view.setTextCursor(QTextCursor(self.new_view.document().findBlockByNumber(row)))
+        self.new_view.centerCursor()
\ No newline at end of file
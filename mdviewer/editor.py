@@ -1,14 +1,49 @@
 import re
-from PyQt6.QtCore import Qt, pyqtSignal, QRegularExpression
+from PyQt6.QtCore import Qt, pyqtSignal, QRegularExpression, QEvent, QMimeData
 from PyQt6.QtGui import (
     QColor, QTextCharFormat, QFont, QSyntaxHighlighter,
     QTextCursor, QPalette, QTextDocument, QTextOption
 )
 from PyQt6.QtWidgets import (
     QPlainTextEdit, QWidget, QVBoxLayout, QHBoxLayout,
-    QDialog, QLineEdit, QPushButton, QLabel
+    QDialog, QLineEdit, QPushButton, QLabel, QApplication
 )
 
+from mdviewer.perf import tracer
+from mdviewer.gutter import LineNumberArea, Minimap, MINIMAP_WIDTH
+from mdviewer.paste import (
+    HTMLPasteConverter, html_to_markdown, ASYNC_PASTE_CHARS,
+    LARGE_PASTE_CHARS, PASTE_PLACEHOLDER, RICH_HTML_REGEX
+)
+
+# Applied in order, so later rules win where they overlap. Compiled once,
+# and skipped for lines without the character every match contains:
+# building a QRegularExpression per line made highlighting a long paste
+# take seconds
+HIGHLIGHT_RULES = [
+    # Headings
+    *((QRegularExpression(f"^{'#' * i}\\s+.*$"), 'heading_format', '#') for i in range(6, 0, -1)),
+    
+    # Bold
+    (QRegularExpression("\\*\\*.*?\\*\\*"), 'bold_format', '*'),
+    (QRegularExpression("__.*?__"), 'bold_format', '_'),
+    
+    # Italic
+    (QRegularExpression("\\*[^\\*]*?\\*"), 'italic_format', '*'),
+    (QRegularExpression("_[^_]*?_"), 'italic_format', '_'),
+    
+    # Code
+    (QRegularExpression("`[^`]*?`"), 'code_format', '`'),
+    
+    # Links
+    (QRegularExpression("\\[.*?\\]\\(.*?\\)"), 'link_format', ']('),
+    
+    # List items
+    (QRegularExpression("^[\\*\\-\\+]\\s+.*$"), 'list_format', None),
+    (QRegularExpression("^\\d+\\.\\s+.*$"), 'list_format', '.'),
+]
+
+
 class MarkdownHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None, dark_mode=False):
         super().__init__(parent)
@@ -49,28 +84,10 @@ class MarkdownHighlighter(QSyntaxHighlighter):
         self.rehighlight()
     
     def highlightBlock(self, text):
-        # Heading patterns
-        for i in range(6, 0, -1):
-            pattern = f"^{'#' * i}\\s+.*$"
-            self.apply_format(text, QRegularExpression(pattern), self.heading_format)
-        
-        # Bold pattern
-        self.apply_format(text, QRegularExpression("\\*\\*.*?\\*\\*"), self.bold_format)
-        self.apply_format(text, QRegularExpression("__.*?__"), self.bold_format)
-        
-        # Italic pattern
-        self.apply_format(text, QRegularExpression("\\*[^\\*]*?\\*"), self.italic_format)
-        self.apply_format(text, QRegularExpression("_[^_]*?_"), self.italic_format)
-        
-        # Code pattern
-        self.apply_format(text, QRegularExpression("`[^`]*?`"), self.code_format)
-        
-        # Link pattern
-        self.apply_format(text, QRegularExpression("\\[.*?\\]\\(.*?\\)"), self.link_format)
-        
-        # List item pattern
-        self.apply_format(text, QRegularExpression("^[\\*\\-\\+]\\s+.*$"), self.list_format)
-        self.apply_format(text, QRegularExpression("^\\d+\\.\\s+.*$"), self.list_format)
+        with tracer.span("highlight"):
+            for pattern, format_name, marker in HIGHLIGHT_RULES:
+                if marker is None or marker in text:
+                    self.apply_format(text, pattern, getattr(self, format_name))
     
     def apply_format(self, text, pattern, fmt):
         regex = pattern
@@ -202,14 +219,41 @@ class FindDialog(QDialog):
 
 
 class MarkdownEditor(QPlainTextEdit):
-    def __init__(self, parent=None):
+    # Percent done of the pasted HTML being converted
+    paste_progress = pyqtSignal(int)
+    
+    # A large paste is in, and the document can be rendered again
+    paste_finished = pyqtSignal()
+    
+    def __init__(self, parent=None, highlight=True):
         super().__init__(parent)
         
         self.setup_editor()
-        self.highlighter = MarkdownHighlighter(self.document())
+        self.dark_mode = False
+        self.highlighter = None
+        if highlight:
+            self.enable_highlighting()
         self.find_dialog = None
+        
+        # Large HTML pastes are converted on a worker thread; each waits
+        # behind a placeholder, by paste id
+        self.pastes = {}
+        self.next_paste_id = 0
+        self.inserting_paste = False
+        self.paste_converter = HTMLPasteConverter(self)
+        self.paste_converter.progress.connect(self.on_paste_progress)
+        self.paste_converter.finished.connect(self.on_paste_converted)
+    
+    def enable_highlighting(self):
+        """Create the syntax highlighter, unless it already exists"""
+        if self.highlighter is None:
+            self.highlighter = MarkdownHighlighter(self.document(), self.dark_mode)
     
     def setup_editor(self):
+        # Line numbers on the left, a document minimap on the right
+        self.line_number_area = LineNumberArea(self)
+        self.minimap = Minimap(self)
+        
         # Use a monospaced font
         font = QFont("Courier New", 10)
         self.setFont(font)
@@ -217,11 +261,136 @@ class MarkdownEditor(QPlainTextEdit):
         # Word wrap
         self.setWordWrapMode(QTextOption.WrapMode.WordWrap)
         
-        # Line numbers would go here (with custom implementation)
+        # Keep the gutters in step with the document and viewport
+        self.blockCountChanged.connect(self.update_margins)
+        self.updateRequest.connect(self.update_line_number_area)
+        self.cursorPositionChanged.connect(self.line_number_area.update)
+        self.update_margins()
         
         # Tab settings
         self.setTabStopDistance(4 * self.fontMetrics().horizontalAdvance(' '))
     
+    def set_line_numbers_visible(self, visible):
+        self.line_number_area.setVisible(visible)
+        self.update_margins()
+    
+    def set_minimap_visible(self, visible):
+        self.minimap.setVisible(visible)
+        self.update_margins()
+    
+    def update_margins(self):
+        left = 0 if self.line_number_area.isHidden() else self.line_number_area.area_width()
+        right = 0 if self.minimap.isHidden() else MINIMAP_WIDTH
+        self.setViewportMargins(left, 0, right, 0)
+        self.layout_margins()
+    
+    def layout_margins(self):
+        viewport = self.viewport().geometry()
+        self.line_number_area.setGeometry(
+            viewport.left() - self.line_number_area.area_width(), viewport.top(),
+            self.line_number_area.area_width(), viewport.height()
+        )
+        self.minimap.setGeometry(viewport.right() + 1, viewport.top(), MINIMAP_WIDTH, viewport.height())
+    
+    def update_line_number_area(self, rect, dy):
+        if dy:
+            self.line_number_area.scroll(0, dy)
+        else:
+            self.line_number_area.update(0, rect.y(), self.line_number_area.width(), rect.height())
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.layout_margins()
+    
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        # The gutter width depends on the font
+        if event.type() == QEvent.Type.FontChange:
+            self.update_margins()
+    
+    def keyPressEvent(self, event):
+        # A keystroke starts a new frame of the latency trace
+        tracer.begin_frame()
+        super().keyPressEvent(event)
+    
+    def canInsertFromMimeData(self, source):
+        return source.hasHtml() or super().canInsertFromMimeData(source)
+    
+    def insertFromMimeData(self, source):
+        # HTML from a web page or a word processor becomes Markdown
+        if source.hasHtml() and RICH_HTML_REGEX.search(source.html()):
+            self.paste_html(source.html(), source.text())
+            return
+        
+        text = source.text()
+        if len(text) < LARGE_PASTE_CHARS:
+            super().insertFromMimeData(source)
+            return
+        self.insert_paste(self.textCursor(), text)
+        self.paste_finished.emit()
+    
+    def paste_plain_text(self):
+        """Paste the clipboard's text, ignoring any formatting"""
+        if self.isReadOnly():
+            return
+        source = QMimeData()
+        source.setText(QApplication.clipboard().text())
+        self.insertFromMimeData(source)
+    
+    def is_pasting(self):
+        """Return True while a large paste is inserted or being converted"""
+        return self.inserting_paste or bool(self.pastes)
+    
+    def insert_paste(self, cursor, text, join=False):
+        """Insert pasted text as a single undo step, replacing the selection"""
+        self.inserting_paste = True
+        try:
+            if join:
+                cursor.joinPreviousEditBlock()
+            else:
+                cursor.beginEditBlock()
+            cursor.insertText(text)
+            cursor.endEditBlock()
+        finally:
+            self.inserting_paste = False
+    
+    def paste_html(self, html, text):
+        if len(html) < ASYNC_PASTE_CHARS:
+            self.insertPlainText(html_to_markdown(html) or text)
+            return
+        
+        self.next_paste_id += 1
+        paste_id = self.next_paste_id
+        placeholder = PASTE_PLACEHOLDER.format(paste_id)
+        self.insert_paste(self.textCursor(), placeholder)
+        self.ensureCursorVisible()
+        
+        # If the placeholder is still the last edit when the conversion is
+        # done, the result joins its undo step
+        revision = self.document().revision()
+        self.pastes[paste_id] = (placeholder, text, revision)
+        self.paste_progress.emit(0)
+        self.paste_converter.convert(paste_id, html)
+    
+    def finish_pastes(self):
+        """Wait for pending conversions, so no placeholder is left in the text"""
+        if self.pastes:
+            self.paste_converter.flush()
+    
+    def on_paste_progress(self, paste_id, percent):
+        if paste_id in self.pastes:
+            self.paste_progress.emit(percent)
+    
+    def on_paste_converted(self, paste_id, markdown):
+        placeholder, text, revision = self.pastes.pop(paste_id)
+        
+        # Deleting the placeholder, or opening another file, cancels the paste
+        cursor = self.document().find(placeholder)
+        if not cursor.isNull():
+            join = self.document().revision() == revision
+            self.insert_paste(cursor, markdown or text, join)
+        self.paste_finished.emit()
+    
     def set_dark_mode(self, dark_mode):
         # Set dark mode for the editor
         palette = self.palette()
@@ -233,9 +402,15 @@ class MarkdownEditor(QPlainTextEdit):
             palette.setColor(QPalette.ColorRole.Text, QColor("#000000"))
         
         self.setPalette(palette)
+        self.dark_mode = dark_mode
         
         # Update highlighter
-        self.highlighter.set_dark_mode(dark_mode)
+        if self.highlighter is not None:
+            self.highlighter.set_dark_mode(dark_mode)
+        
+        # Redraw the gutters in the new colors
+        self.line_number_area.update()
+        self.minimap.redraw()
     
     def show_find_dialog(self):
         if not self.find_dialog:
@@ -257,8 +432,36 @@ class MarkdownEditor(QPlainTextEdit):
         else:
             self.find_dialog.cursor_position = cursor.position()
     
-    def scroll_to_heading(self, heading_text, level):
-        """Scroll to the heading with the given text and level"""
+    def go_to_line(self, line):
+        """Move the cursor to the start of a 1-based line"""
+        block = self.document().findBlockByNumber(line - 1)
+        if block.isValid():
+            cursor = QTextCursor(block)
+            self.setTextCursor(cursor)
+            self.centerCursor()
+    
+    def select_source(self, start_line, start_column, end_line, end_column):
+        """Select from one 0-based (line, column) to another"""
+        document = self.document()
+        
+        def position(line, column):
+            block = document.findBlockByNumber(min(line, document.blockCount() - 1))
+            # Columns count characters; the document counts UTF-16 units
+            prefix = block.text()[:column]
+            return block.position() + len(prefix.encode('utf-16-le')) // 2
+        
+        cursor = QTextCursor(document)
+        cursor.setPosition(position(start_line, start_column))
+        cursor.setPosition(position(end_line, end_column), QTextCursor.MoveMode.KeepAnchor)
+        self.setTextCursor(cursor)
+        self.centerCursor()
+    
+    def scroll_to_heading(self, heading_text, level, line=None):
+        """Scroll to the heading with the given text and level
+        
+        If the 1-based line of the heading is known, the search starts
+        there, so repeated headings resolve to the right one.
+        """
         cursor = self.textCursor()
         cursor.movePosition(QTextCursor.MoveOperation.Start)
         
@@ -268,7 +471,13 @@ class MarkdownEditor(QPlainTextEdit):
         
         # Search for the heading
         document = self.document()
-        find_cursor = document.find(regex, cursor)
+        find_cursor = QTextCursor()
+        if line is not None:
+            block = document.findBlockByNumber(line - 1)
+            if block.isValid():
+                find_cursor = document.find(regex, QTextCursor(block))
+        if find_cursor.isNull():
+            find_cursor = document.find(regex, cursor)
         
         if not find_cursor.isNull():
             self.setTextCursor(find_cursor)
@@ -1,14 +1,193 @@
 import os
-import markdown
-from markdown.extensions.codehilite import CodeHiliteExtension
-from markdown.extensions.fenced_code import FencedCodeExtension
-from markdown.extensions.tables import TableExtension
+import re
+import html
+import base64
+import shutil
+import tempfile
+from pygments.formatters import HtmlFormatter
+from markdown.extensions.toc import slugify, unique
 
-from PyQt6.QtCore import QUrl, QMarginsF, QSize, QEventLoop
+from PyQt6.QtCore import QObject, QUrl, QMarginsF, QSize, QEventLoop, pyqtSignal
 from PyQt6.QtGui import QPainter, QPageLayout, QPageSize
-from PyQt6.QtPrintSupport import QPrinter
-from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineSettings
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineSettings
+
+from mdviewer.assets import make_preview_image, guess_mime_type
+from mdviewer.includes import expand_includes
+from mdviewer.outline import extract_headings
+from mdviewer.pdf import PdfReader, PdfWriter
+from mdviewer.pipeline import render_markdown
+
+# Images inlined into self-contained exports are downscaled to fit this size
+EXPORT_MAX_SIZE = 2400
+
+# Content inside these elements is whitespace-sensitive and never minified
+PRESERVED_BLOCKS_REGEX = re.compile(
+    r'(<(pre|textarea|script)\b.*?</\2>)', re.DOTALL | re.IGNORECASE
+)
+
+BLOCK_TAGS_REGEX = re.compile(
+    r'\s*(</?(?:html|head|body|meta|title|style|link|div|p|h[1-6]|ul|ol|li|'
+    r'table|thead|tbody|tr|th|td|blockquote|hr|br|pre)\b[^>]*>)\s*',
+    re.IGNORECASE
+)
+
+IMG_SRC_REGEX = re.compile(r'(<img\b[^>]*?\bsrc=")([^"]+)(")', re.IGNORECASE)
+
+# Documents longer than this are exported to PDF in chunks of about this size
+CHUNK_CHARS = 200000
+
+# Chunks rendered at the same time; each one holds a page in memory
+CHUNK_WORKERS = 2
+
+FENCE_REGEX = re.compile(r' {0,3}(`{3,}|~{3,})')
+CHUNK_HEADING_REGEX = re.compile(r'(#{1,6})[ \t]')
+
+# Link reference definitions ([id]: url) apply to the whole document
+REFERENCE_REGEX = re.compile(r'^ {0,3}\[[^\]\n]+\]:[^\n]*$', re.MULTILINE)
+
+RENDERED_HEADING_REGEX = re.compile(r'<h([1-6]) id="([^"]+)"[^>]*>(.*?)</h\1>', re.DOTALL)
+
+HEADING_ID_REGEX = re.compile(r'(<h[1-6] id=")([^"]+)"')
+
+# A suffix the toc extension adds to a repeated id
+ID_SUFFIX_REGEX = re.compile(r'^(.+)_\d+$')
+
+# Rendered headings searched for the next heading of the outline; the ones
+# skipped over are setext headings, which the outline does not list
+HEADING_LOOKAHEAD = 20
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from CSS"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def minify_html(html):
+    """Collapse whitespace in HTML, leaving preformatted blocks untouched"""
+    parts = []
+    position = 0
+    for match in PRESERVED_BLOCKS_REGEX.finditer(html):
+        parts.append(_collapse_whitespace(html[position:match.start()]))
+        parts.append(match.group(1))
+        position = match.end()
+    parts.append(_collapse_whitespace(html[position:]))
+    return ''.join(parts).strip()
+
+
+def _collapse_whitespace(html):
+    html = re.sub(r'\s+', ' ', html)
+    # Whitespace next to block-level tags is not rendered
+    return BLOCK_TAGS_REGEX.sub(r'\1', html)
+
+
+def used_pygments_css(html, style='default', selector='.highlight'):
+    """Return the Pygments style rules for token classes that occur in html"""
+    used = set()
+    for classes in re.findall(r'class="([^"]+)"', html):
+        used.update(classes.split())
+    
+    rules = []
+    for rule in HtmlFormatter(style=style).get_style_defs(selector).splitlines():
+        rule_selector = rule.split('{', 1)[0]
+        classes = set(re.findall(r'\.([\w-]+)', rule_selector)) - {selector.lstrip('.')}
+        if classes <= used:
+            rules.append(rule)
+    return '\n'.join(rules)
+
+
+def split_markdown(markdown_text, chunk_chars=CHUNK_CHARS):
+    """Split markdown into chunks of at least chunk_chars at top-level headings
+    
+    Top-level headings are those of the smallest level used outside code
+    blocks. Link reference definitions are repeated in every chunk.
+    """
+    lines = markdown_text.splitlines(keepends=True)
+    headings = []  # (line number, level)
+    fence = None
+    
+    for number, line in enumerate(lines):
+        match = FENCE_REGEX.match(line)
+        if match:
+            marker = match.group(1)
+            if fence is None:
+                fence = marker
+            elif marker[0] == fence[0] and len(marker) >= len(fence):
+                fence = None
+            continue
+        if fence is None and line.startswith('#'):
+            match = CHUNK_HEADING_REGEX.match(line)
+            if match:
+                headings.append((number, len(match.group(1))))
+    
+    top = min((level for _, level in headings), default=0)
+    boundaries = {number for number, level in headings if level == top}
+    
+    chunks = []
+    start = 0
+    size = 0
+    for number, line in enumerate(lines):
+        if number in boundaries and size >= chunk_chars:
+            chunks.append(''.join(lines[start:number]))
+            start = number
+            size = 0
+        size += len(line)
+    chunks.append(''.join(lines[start:]))
+    
+    references = '\n'.join(REFERENCE_REGEX.findall(markdown_text))
+    if references and len(chunks) > 1:
+        chunks = [f"{chunk}\n\n{references}\n" for chunk in chunks]
+    return chunks
+
+
+def _plain_heading(text):
+    return re.sub(r'[*_`]', '', text).strip()
+
+
+def heading_targets(markdown_text, html_content):
+    """Return (title, level, element id) of the headings in rendered HTML
+    
+    Titles and levels come from extract_headings(), like the outline; each
+    heading is paired with the id the toc extension gave it in html_content.
+    Outline entries without a rendered heading (such as '#' comment lines
+    in code blocks) are left out.
+    """
+    rendered = [
+        (int(level), heading_id, _plain_heading(html.unescape(re.sub(r'<[^>]+>', '', text))))
+        for level, heading_id, text in RENDERED_HEADING_REGEX.findall(html_content)
+    ]
+    headings = extract_headings(markdown_text)
+    targets = []
+    position = 0
+    
+    for node in range(1, len(headings) + 1):
+        text, level, _ = headings.heading(node)
+        title = _plain_heading(text)
+        slug = slugify(title, '-')
+        
+        for index in range(position, min(position + HEADING_LOOKAHEAD, len(rendered))):
+            rendered_level, heading_id, rendered_title = rendered[index]
+            if rendered_level != level:
+                continue
+            # Repeated headings get a numeric suffix
+            if rendered_title == title or (slug and (heading_id == slug or heading_id.startswith(slug + '_'))):
+                targets.append((rendered_title or title, level, heading_id))
+                position = index + 1
+                break
+    
+    return targets
+
+
+def page_layout():
+    """Return the page layout used for PDF export"""
+    layout = QPageLayout()
+    layout.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+    margins = QMarginsF(20, 20, 20, 20)  # left, top, right, bottom
+    layout.setMargins(margins)
+    return layout
+
 
 class HTMLExporter:
     """Exports Markdown content to HTML"""
@@ -16,24 +195,14 @@ class HTMLExporter:
     def __init__(self):
         pass
     
-    def export(self, markdown_text):
+    def export(self, markdown_text, base_dir=None, path=None):
         """Convert markdown to HTML and return it"""
-        html_content = self.markdown_to_html(markdown_text)
+        html_content = self.markdown_to_html(markdown_text, base_dir, path)
         return html_content
     
-    def markdown_to_html(self, markdown_text):
+    def markdown_to_html(self, markdown_text, base_dir=None, path=None):
         """Convert markdown to HTML with full styling"""
-        # Process markdown to HTML
-        extensions = [
-            FencedCodeExtension(),
-            CodeHiliteExtension(linenums=False, css_class='highlight'),
-            TableExtension(),
-            'nl2br',  # newline to break
-            'sane_lists',
-            'toc'  # table of contents
-        ]
-        
-        html = markdown.markdown(markdown_text, extensions=extensions)
+        html = self._render(markdown_text, base_dir, path)
         
         # Add CSS styling
         css = self._get_css()
@@ -58,6 +227,83 @@ class HTMLExporter:
         
         return full_html
     
+    def _render(self, markdown_text, base_dir=None, path=None):
+        """Convert markdown to an HTML fragment"""
+        return render_markdown(markdown_text, base_dir=base_dir, path=path)
+    
+    def export_self_contained(self, markdown_text, base_dir=None, path=None,
+                              recompress_images=False, minify=True, used_styles_only=True):
+        """Convert markdown to a single HTML file with all local assets inlined"""
+        html = self._render(markdown_text, base_dir, path)
+        html = self._inline_images(html, base_dir, recompress_images)
+        
+        # Syntax highlighting rules, optionally only for the tokens in use
+        if used_styles_only:
+            pygments_css = used_pygments_css(html)
+        else:
+            pygments_css = HtmlFormatter(style='default').get_style_defs('.highlight')
+        
+        css = self._get_css() + pygments_css
+        if minify:
+            css = minify_css(css)
+        
+        full_html = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1">
+            <title>Markdown Export</title>
+            <style>
+                {css}
+            </style>
+        </head>
+        <body>
+            {html}
+        </body>
+        </html>
+        """
+        
+        if minify:
+            full_html = minify_html(full_html)
+        return full_html
+    
+    def _inline_images(self, html, base_dir, recompress_images):
+        """Replace local image references with data URIs
+        
+        Each image is read and encoded once, however often it is used.
+        Every use carries its own copy of the data URI: browsers and mail
+        viewers differ on CSS ways of sharing one, and some show nothing.
+        """
+        base_dir = base_dir or os.getcwd()
+        data_uris = {}  # path -> data uri, or None
+        
+        def replace(match):
+            src = match.group(2)
+            if re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', src) or src.startswith('//'):
+                return match.group(0)  # Remote or already inlined
+            path = os.path.normpath(os.path.join(base_dir, src.split('#')[0].split('?')[0]))
+            if path not in data_uris:
+                data_uris[path] = self._encode_image(path, recompress_images)
+            if data_uris[path] is None:
+                return match.group(0)
+            return f'{match.group(1)}{data_uris[path]}{match.group(3)}'
+        
+        return IMG_SRC_REGEX.sub(replace, html)
+    
+    def _encode_image(self, path, recompress_images):
+        """Return a data uri for a local image, or None"""
+        try:
+            result = make_preview_image(path, EXPORT_MAX_SIZE) if recompress_images else None
+            if result is None:
+                with open(path, 'rb') as file:
+                    result = (guess_mime_type(path), file.read())
+        except Exception:
+            return None
+        
+        mime, data = result
+        return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+    
     def _get_css(self):
         """Get the CSS to style the exported HTML"""
         return """
@@ -140,6 +386,34 @@ class HTMLExporter:
             box-sizing: content-box;
         }
         
+        math {
+            font-family: "Latin Modern Math", "STIX Two Math", "Cambria Math", math;
+        }
+        
+        math[display="block"] {
+            margin: 16px 0;
+            overflow-x: auto;
+        }
+        
+        .math-error {
+            color: #d73a49;
+        }
+        
+        .include-error {
+            padding: 0 1em;
+            color: #d73a49;
+            border-left: 0.25em solid #d73a49;
+        }
+        
+        .task-list-item {
+            list-style-type: none;
+        }
+        
+        .task-list-item input {
+            margin: 0 0.2em 0.25em -1.4em;
+            vertical-align: middle;
+        }
+        
         a {
             color: #0366d6;
             text-decoration: none;
@@ -157,44 +431,240 @@ class PDFExporter:
     def __init__(self):
         self.html_exporter = HTMLExporter()
     
-    def export(self, markdown_text, output_path):
+    def export(self, markdown_text, output_path, base_dir=None, path=None):
         """Convert markdown to PDF and save to file"""
-        html_content = self.markdown_to_html(markdown_text)
+        job = ChunkedPDFExport(
+            self, [expand_includes(markdown_text, base_dir, path)], output_path, 1,
+            base_dir=base_dir
+        )
+        errors = []
         
-        # Create a printer object
-        printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-        printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
-        printer.setOutputFileName(output_path)
+        # Run an event loop until the page is loaded and printed
+        loop = QEventLoop()
+        job.finished.connect(lambda error: (errors.append(error), loop.quit()))
+        job.start()
+        if not errors:
+            loop.exec()
         
-        # Set page layout
-        layout = QPageLayout()
-        layout.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
-        margins = QMarginsF(20, 20, 20, 20)  # left, top, right, bottom
-        layout.setMargins(margins)
-        printer.setPageLayout(layout)
+        if errors[0]:
+            raise RuntimeError(errors[0])
+        return True
+    
+    def export_chunked(self, markdown_text, output_path, workers=CHUNK_WORKERS, parent=None,
+                       base_dir=None, path=None):
+        """Return a ChunkedPDFExport of markdown to output_path; call start() on it"""
+        # Includes are resolved first so chunks and bookmarks cover the included files
+        chunks = split_markdown(expand_includes(markdown_text, base_dir, path))
+        return ChunkedPDFExport(self, chunks, output_path, workers, parent, base_dir)
+    
+    def markdown_to_html(self, markdown_text, base_dir=None, path=None):
+        """Convert markdown to HTML using the HTML exporter"""
+        return self.html_exporter.markdown_to_html(markdown_text, base_dir, path)
+
+
+    
+class ChunkedPDFExport(QObject):
+    """Exports a document to PDF one chunk at a time
+    
+    At most `workers` chunks are loaded and printed at once, each into its
+    own temporary PDF. Finished parts are appended to the output in document
+    order and deleted straight away, so neither memory nor disk use grows
+    with the length of the document.
+    
+    Headings become bookmarks and named destinations. Their pages are known
+    from the print itself: Chromium emits a named destination for every
+    element a link points to, so each chunk gets hidden links to its headings.
+    
+    Relative image paths resolve against `base_dir`, the document's folder.
+    """
+    
+    progress = pyqtSignal(int, int)  # chunks done, total
+    
+    # Emitted with an empty string on success, or an error message
+    finished = pyqtSignal(str)
+    
+    def __init__(self, exporter, chunks, output_path, workers=CHUNK_WORKERS, parent=None,
+                 base_dir=None):
+        super().__init__(parent)
         
-        # Create a web view to render the HTML
-        view = QWebEngineView()
-        view.setHtml(html_content, QUrl("file://"))
+        self.exporter = exporter
+        self.chunks = chunks
+        self.output_path = output_path
+        self.base_dir = base_dir
+        self.workers = max(1, workers)
+        self.total = len(chunks)
         
-        # Create event loop to wait for page load
-        loop = QEventLoop()
+        self.temp_dir = None
+        self.writer = None
+        self.temp_output = None
+        self.pages = {}  # chunk index -> QWebEnginePage being rendered
+        self.headings = {}  # chunk index -> [(title, level, heading id)]
+        self.rendered = {}  # chunk index -> PDF path, waiting to be merged
+        self.outline = []
+        self.heading_ids = set()  # of the chunks rendered so far
+        self.next_chunk = 0
+        self.merged = 0
+        self.page_count = 0
+        self.cancelled = False
+        self.done = False
+    
+    def start(self):
+        directory = os.path.dirname(os.path.abspath(self.output_path))
+        self.temp_dir = tempfile.mkdtemp(prefix="mdviewer-pdf-")
+        fd, self.temp_output = tempfile.mkstemp(
+            prefix=f".{os.path.basename(self.output_path)}.", suffix=".tmp", dir=directory
+        )
+        os.close(fd)
+        self.writer = PdfWriter(self.temp_output)
         
-        # Print to PDF when page is loaded
-        view.loadFinished.connect(lambda ok: self._on_load_finished(ok, view, printer, loop))
+        for _ in range(min(self.workers, self.total)):
+            if not self.render_next():
+                break
+    
+    def cancel(self):
+        if not self.done:
+            self.cancelled = True
+            self.fail("Export cancelled")
+    
+    def render_next(self):
+        """Start rendering the next chunk; returns False if the export failed"""
+        index = self.next_chunk
+        self.next_chunk += 1
+        try:
+            self.load_chunk(index)
+        except Exception as e:
+            self.fail(str(e))
+            return False
+        return True
+    
+    def load_chunk(self, index):
+        html_content = self.exporter.markdown_to_html(self.chunks[index], self.base_dir)
+        html_content = self.number_heading_ids(html_content)
+        headings = heading_targets(self.chunks[index], html_content)
+        self.chunks[index] = None
         
-        # Run the event loop until the page is loaded and printed
-        loop.exec()
+        self.headings[index] = headings
+        links = ''.join(f'<a href="#{heading_id}"></a>' for _, _, heading_id in headings)
+        html_content = html_content.replace(
+            '</body>', f'<nav style="display:none">{links}</nav></body>', 1
+        )
         
-        return True
+        # Loaded from a file, as setHtml() is limited to 2 MB of content
+        html_path = os.path.join(self.temp_dir, f"part-{index:05d}.html")
+        if self.base_dir:
+            # Chromium still takes "#id" links for links within the page,
+            # as it compares them with the base URL
+            base_url = QUrl.fromLocalFile(os.path.join(self.base_dir, '')).toEncoded().data().decode()
+            html_content = html_content.replace(
+                '<head>', f'<head>\n<base href="{html.escape(base_url)}">', 1
+            )
+        with open(html_path, 'w', encoding='utf-8') as file:
+            file.write(html_content)
+        del html_content
+        
+        page = QWebEnginePage(self)
+        self.pages[index] = page
+        path = os.path.join(self.temp_dir, f"part-{index:05d}.pdf")
+        page.loadFinished.connect(lambda ok: self.on_load_finished(index, path, ok))
+        page.pdfPrintingFinished.connect(lambda file_path, ok: self.on_printed(index, file_path, ok))
+        page.load(QUrl.fromLocalFile(html_path))
     
-    def markdown_to_html(self, markdown_text):
-        """Convert markdown to HTML using the HTML exporter"""
-        return self.html_exporter.markdown_to_html(markdown_text)
+    def number_heading_ids(self, html_content):
+        """Give headings the ids they have when the whole document is rendered
+        
+        The toc extension numbers repeated ids within a chunk only; chunks
+        are rendered in document order, so the ids of earlier chunks are
+        known.
+        """
+        chunk_ids = set()
+        
+        def renumber(match):
+            heading_id = match.group(2)
+            suffix = ID_SUFFIX_REGEX.match(heading_id)
+            if suffix and suffix.group(1) in chunk_ids:
+                heading_id = suffix.group(1)
+            chunk_ids.add(heading_id)
+            return f'{match.group(1)}{unique(heading_id, self.heading_ids)}"'
+        
+        return HEADING_ID_REGEX.sub(renumber, html_content)
     
-    def _on_load_finished(self, ok, view, printer, loop):
-        """Called when the page has finished loading"""
-        if ok:
-            view.page().print(printer, lambda success: loop.quit())
-        else:
-            loop.quit() 
\ No newline at end of file
+    def on_load_finished(self, index, path, ok):
+        page = self.pages.get(index)
+        if page is None or self.done:
+            return
+        if not ok:
+            self.fail(f"Could not render part {index + 1} of {self.total}")
+            return
+        page.printToPdf(path, page_layout())
+    
+    def on_printed(self, index, path, ok):
+        page = self.pages.pop(index, None)
+        if page is None or self.done:
+            return
+        page.deleteLater()
+        os.unlink(path[:-len(".pdf")] + ".html")
+        if not ok:
+            self.fail(f"Could not print part {index + 1} of {self.total}")
+            return
+        
+        self.rendered[index] = path
+        try:
+            self.merge_ready()
+        except Exception as e:
+            self.fail(str(e))
+            return
+        
+        self.progress.emit(self.merged, self.total)
+        if self.merged == self.total:
+            self.finish()
+        elif self.next_chunk < self.total:
+            self.render_next()
+    
+    def merge_ready(self):
+        """Append the rendered parts that are next in document order"""
+        while self.merged in self.rendered:
+            path = self.rendered.pop(self.merged)
+            first_page, destinations = self.writer.append(PdfReader(path))
+            self.page_count = len(self.writer.pages)
+            os.unlink(path)
+            
+            for title, level, heading_id in self.headings.pop(self.merged):
+                # Without a destination, point at the start of the part
+                dest = destinations.get(heading_id) or self.writer.destination(first_page)
+                self.outline.append((title, level, dest))
+            self.merged += 1
+    
+    def finish(self):
+        self.done = True
+        try:
+            self.writer.close(self.outline)
+            os.replace(self.temp_output, self.output_path)
+        except Exception as e:
+            self.writer.abort()
+            self.cleanup()
+            self.finished.emit(str(e))
+            return
+        self.cleanup()
+        self.finished.emit("")
+    
+    def fail(self, message):
+        if self.done:
+            return
+        self.done = True
+        for page in self.pages.values():
+            page.deleteLater()
+        self.pages.clear()
+        if self.writer:
+            self.writer.abort()
+        self.cleanup()
+        self.finished.emit(message)
+    
+    def cleanup(self):
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
+        if self.temp_output and os.path.exists(self.temp_output):
+            try:
+                os.unlink(self.temp_output)
+            except OSError:
+                pass
\ No newline at end of file
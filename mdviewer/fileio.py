@@ -0,0 +1,267 @@
+import os
+import codecs
+import tempfile
+import threading
+from collections import namedtuple
+
+from PyQt6.QtCore import QCoreApplication, QEvent, QObject, QRunnable, QThreadPool, pyqtSignal
+
+# How a document is stored on disk, so saving writes it back the same way.
+# encoding names a byte order for UTF-16/32, bom says whether the file
+# starts with a byte order mark, and lossy that a UTF-8 file had bytes read
+# as Windows-1252, which saving would not write back
+FileFormat = namedtuple('FileFormat', 'encoding bom newline lossy', defaults=(False,))
+
+DEFAULT_FORMAT = FileFormat('utf-8', False, '\n')
+
+# Longest prefix looked at to guess the encoding and line endings
+SAMPLE_SIZE = 64 * 1024
+
+CHUNK_SIZE = 1024 * 1024
+
+# Longest first, since the UTF-32 LE mark starts with the UTF-16 LE one
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+# Bytes Windows-1252 leaves undefined
+CP1252_UNDEFINED = frozenset(b'\x81\x8d\x8f\x90\x9d')
+
+ENCODING_NAMES = {
+    'utf-8': "UTF-8", 'utf-16-le': "UTF-16 LE", 'utf-16-be': "UTF-16 BE",
+    'utf-32-le': "UTF-32 LE", 'utf-32-be': "UTF-32 BE",
+    'cp1252': "Windows-1252", 'latin-1': "ISO-8859-1",
+}
+
+NEWLINE_NAMES = {'\n': "LF", '\r\n': "CRLF", '\r': "CR"}
+
+# Set when the legacy error handler is used, per thread reading a file
+_legacy = threading.local()
+
+
+def _decode_legacy(error):
+    # Bytes that are not valid UTF-8 in a mostly UTF-8 file are usually
+    # Windows-1252 text pasted in from elsewhere
+    _legacy.used = True
+    data = error.object[error.start:error.end]
+    return ''.join(
+        bytes([byte]).decode('latin-1' if byte in CP1252_UNDEFINED else 'cp1252')
+        for byte in data
+    ), error.end
+
+
+codecs.register_error('mdviewer-legacy', _decode_legacy)
+
+
+def _guess_encoding(sample):
+    """Return (encoding, BOM length) for the first bytes of a file"""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding, len(bom)
+    
+    # UTF-16 without a BOM: ASCII text leaves every other byte zero
+    if len(sample) >= 4:
+        even_zeros = sample[0::2].count(0)
+        odd_zeros = sample[1::2].count(0)
+        half = len(sample) // 2
+        if even_zeros > half * 0.4 and odd_zeros < half * 0.05:
+            return 'utf-16-be', 0
+        if odd_zeros > half * 0.4 and even_zeros < half * 0.05:
+            return 'utf-16-le', 0
+    
+    try:
+        # Not final, so a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8', 0
+    except UnicodeDecodeError:
+        pass
+    if any(byte in CP1252_UNDEFINED for byte in sample):
+        return 'latin-1', 0
+    return 'cp1252', 0
+
+
+def _guess_newline(text):
+    crlf = text.count('\r\n')
+    cr = text.count('\r') - crlf
+    lf = text.count('\n') - crlf
+    
+    # The most common ending, so a few stray lines do not change the file
+    if crlf > lf and crlf >= cr:
+        return '\r\n'
+    if cr > lf:
+        return '\r'
+    return '\n'
+
+
+def read_document(file_path):
+    """Read a text file of any common encoding; return (text, FileFormat)
+
+    The encoding is taken from the BOM, or guessed from the first
+    SAMPLE_SIZE bytes, and the file is decoded a chunk at a time. Bytes a
+    UTF-8 file gets wrong further on are read as Windows-1252 instead of
+    failing, so no file is decoded twice, and the format is marked lossy.
+    Line endings in the returned text are always "\\n"; the format records
+    the most common ending in the sample.
+    """
+    _legacy.used = False
+    with open(file_path, 'rb') as file:
+        sample = file.read(SAMPLE_SIZE)
+        encoding, bom_size = _guess_encoding(sample)
+        
+        # Nothing refuses the file: stray bytes in UTF-8 and Windows-1252
+        # fall back to a single-byte reading, UTF-16/32 errors are replaced
+        errors = 'mdviewer-legacy' if encoding in ('utf-8', 'cp1252') else 'replace'
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+        parts = [decoder.decode(sample[bom_size:])]
+        newline = _guess_newline(parts[0])
+        del sample
+        while True:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b'', final=True))
+    
+    text = ''.join(parts)
+    del parts
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+        if '\r' in text:
+            text = text.replace('\r', '\n')
+    lossy = encoding == 'utf-8' and _legacy.used
+    return text, FileFormat(encoding, bom_size > 0, newline, lossy)
+
+
+def sniff_format(file_path):
+    """Return the FileFormat of a file from its first bytes only"""
+    with open(file_path, 'rb') as file:
+        sample = file.read(SAMPLE_SIZE)
+    encoding, bom_size = _guess_encoding(sample)
+    text = sample[bom_size:].decode(encoding, errors='ignore')
+    return FileFormat(encoding, bom_size > 0, _guess_newline(text))
+
+
+def describe_format(file_format):
+    """Return a short label for the status bar, e.g. UTF-8 with BOM, CRLF"""
+    name = ENCODING_NAMES.get(file_format.encoding, file_format.encoding)
+    if file_format.bom:
+        name += " with BOM"
+    return f"{name}, {NEWLINE_NAMES.get(file_format.newline, 'LF')}"
+
+
+def atomic_write(file_path, text, encoding='utf-8', newline=None, bom=False):
+    """Write text to file_path via a temp file, fsync and rename"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(file_path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline=newline) as file:
+            if bom:
+                file.write('\ufeff')
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        
+        # Keep the permissions of the file we are replacing
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    
+    # Make the rename itself durable (not supported on Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+class _WriteSignals(QObject):
+    finished = pyqtSignal(int, str, str)  # job id, path, error message
+
+
+class _WriteTask(QRunnable):
+    def __init__(self, job_id, signals, file_path, text, encoding, newline, bom, remove):
+        super().__init__()
+        self.job_id = job_id
+        self.signals = signals
+        self.file_path = file_path
+        self.text = text
+        self.encoding = encoding
+        self.newline = newline
+        self.bom = bom
+        self.remove = remove
+    
+    def run(self):
+        error = ""
+        try:
+            if self.remove:
+                if os.path.exists(self.file_path):
+                    os.unlink(self.file_path)
+            else:
+                atomic_write(self.file_path, self.text, self.encoding, self.newline, self.bom)
+        except Exception as e:
+            error = str(e)
+        
+        # Drop the reference to the (possibly huge) text as soon as possible
+        self.text = None
+        self.signals.finished.emit(self.job_id, self.file_path, error)
+
+
+class FileWriter(QObject):
+    """Performs atomic file writes on a single background thread, in order"""
+    
+    # Emitted on the GUI thread once a write or removal has completed
+    finished = pyqtSignal(int, str, str)  # job id, path, error message
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        # One thread keeps writes to the same file in submission order
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        
+        self.signals = _WriteSignals()
+        self.signals.finished.connect(self.finished)
+        self._next_job_id = 0
+    
+    def write(self, file_path, text, encoding='utf-8', newline=None, bom=False):
+        """Queue an atomic write and return its job id"""
+        return self._submit(file_path, text, encoding, newline, bom, False)
+    
+    def remove(self, file_path):
+        """Queue the removal of a file and return its job id"""
+        return self._submit(file_path, None, None, None, False, True)
+    
+    def wait(self):
+        """Block until all queued jobs have completed"""
+        self.pool.waitForDone()
+    
+    def flush(self):
+        """Block until all queued jobs have completed and emit their results now"""
+        self.pool.waitForDone()
+        # finished reaches this thread as queued calls; deliver only those
+        QCoreApplication.sendPostedEvents(self, QEvent.Type.MetaCall)
+    
+    def _submit(self, file_path, text, encoding, newline, bom, remove):
+        self._next_job_id += 1
+        task = _WriteTask(
+            self._next_job_id, self.signals, file_path, text, encoding, newline, bom, remove
+        )
+        self.pool.start(task)
+        return self._next_job_id
\ No newline at end of file
@@ -0,0 +1,99 @@
+import re
+import html
+from collections import OrderedDict
+
+from latex2mathml.converter import convert
+from markdown.postprocessors import Postprocessor
+from mdx_math import MathExtension, InlineMathPattern
+
+# What MathExtension leaves in the HTML for each formula
+MATH_SCRIPT_REGEX = re.compile(r'<script type="math/tex(; mode=display)?">(.*?)</script>', re.S)
+
+# $...$ by GitHub's rules: no space inside next to either dollar and no
+# digit after the closing one, so "costs $5 and then $10" stays text
+DOLLAR_MATH_PATTERN = r'(?<![\\$])(\$)([^\s$](?:[^$]*?[^\s$\\])?)(\$)(?![$\d])'
+
+def render_formula(tex, display=False):
+    """Return the MathML of a TeX formula, or the source marked as an error"""
+    try:
+        return convert(tex, display='block' if display else 'inline')
+    except Exception as error:
+        return (
+            f'<code class="math-error" title="{html.escape(str(error))}">'
+            f'{html.escape(tex)}</code>'
+        )
+
+
+class FormulaCache:
+    """Rendered formulas by TeX source and display mode
+
+    Typesetting is by far the most expensive part of rendering math, and
+    most edits leave every formula unchanged, so each one is only rendered
+    the first time it is seen. The least recently used entries are dropped
+    once the cache holds `limit` formulas.
+    """
+    
+    def __init__(self, limit=10000):
+        self.limit = limit
+        self.entries = OrderedDict()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def render(self, tex, display=False):
+        key = (tex, display)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        
+        result = render_formula(tex, display)
+        self.entries[key] = result
+        if len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+        return result
+    
+    def clear(self):
+        self.entries.clear()
+
+
+# Shared by the preview and the exporters
+formula_cache = FormulaCache()
+
+
+class MathPostprocessor(Postprocessor):
+    """Replaces the math placeholders with MathML from the cache"""
+    
+    def __init__(self, md, cache):
+        super().__init__(md)
+        self.cache = cache
+    
+    def run(self, text):
+        if '<script type="math/tex' not in text:
+            return text
+        return MATH_SCRIPT_REGEX.sub(
+            lambda match: self.cache.render(match.group(2).strip(), bool(match.group(1))), text
+        )
+
+
+class PrerenderedMathExtension(MathExtension):
+    """TeX math typeset to MathML while converting, so no script is needed to show it
+
+    Parsing is left to python-markdown-math; `$...$`, `\\(...\\)`, `$$...$$`,
+    `\\[...\\]` and `\\begin{...}...\\end{...}` are recognized.
+    """
+    
+    def __init__(self, **kwargs):
+        kwargs.setdefault('enable_dollar_delimiter', True)
+        self.cache = kwargs.pop('cache', formula_cache)
+        super().__init__(**kwargs)
+    
+    def extendMarkdown(self, md):
+        super().extendMarkdown(md)
+        if self.getConfig('enable_dollar_delimiter'):
+            previous = md.inlinePatterns['math-inline-0']
+            pattern = InlineMathPattern(DOLLAR_MATH_PATTERN)
+            pattern._add_preview = previous._add_preview
+            pattern._content_type = previous._content_type
+            md.inlinePatterns.register(pattern, 'math-inline-0', 185)
+        # After raw HTML (30) has been put back
+        md.postprocessors.register(MathPostprocessor(md, self.cache), 'prerendered_math', 5)
\ No newline at end of file
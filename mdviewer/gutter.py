@@ -0,0 +1,301 @@
+from array import array
+from operator import sub
+
+from PyQt6.QtCore import Qt, QRect, QSize, QTimer
+from PyQt6.QtGui import QColor, QImage, QPainter, QTextCursor
+from PyQt6.QtWidgets import QWidget
+
+MINIMAP_WIDTH = 100
+
+# Lines longer than this are drawn at the full minimap width
+MINIMAP_COLUMNS = 120
+
+# Pixel rows per line while the whole document fits the minimap
+MINIMAP_LINE_HEIGHT = 2
+
+# QTextCursor.selectedText() separates blocks with U+2029
+PARAGRAPH_SEPARATOR = '\u2029'
+
+def changed_lines(document, position, chars_added, line_count):
+    """Map a contentsChange onto per-line data kept for a document
+
+    line_count is the number of lines the data had before the change.
+    Returns (first, old_last, lines): the old lines first to old_last,
+    inclusive, are replaced by the current text of lines. Returns None
+    when the change can't be mapped and the data must be rebuilt.
+    """
+    first = document.findBlock(position)
+    last = document.findBlock(position + chars_added)
+    if not last.isValid():
+        last = document.lastBlock()
+    if not first.isValid():
+        first = document.firstBlock()
+    
+    first_number = first.blockNumber()
+    last_number = last.blockNumber()
+    old_last = last_number - (document.blockCount() - line_count)
+    if old_last < first_number - 1 or old_last >= line_count:
+        return None
+    
+    cursor = QTextCursor(first)
+    cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+    lines = cursor.selectedText().split(PARAGRAPH_SEPARATOR)
+    if len(lines) != last_number - first_number + 1:
+        return None
+    return first_number, old_last, lines
+
+
+def gutter_colors(palette):
+    """Return (background, text) colors for a gutter next to a text area"""
+    base = palette.color(palette.ColorRole.Base)
+    text = QColor(palette.color(palette.ColorRole.Text))
+    background = base.darker(106) if base.lightness() > 128 else base.lighter(130)
+    text.setAlpha(110)
+    return background, text
+
+
+class LineNumberArea(QWidget):
+    """Line numbers painted for the visible blocks of a QPlainTextEdit"""
+    
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+    
+    def sizeHint(self):
+        return QSize(self.area_width(), 0)
+    
+    def area_width(self):
+        digits = len(str(max(1, self.editor.blockCount())))
+        return 12 + self.editor.fontMetrics().horizontalAdvance('9') * digits
+    
+    def paintEvent(self, event):
+        editor = self.editor
+        painter = QPainter(self)
+        background, text_color = gutter_colors(editor.palette())
+        painter.fillRect(event.rect(), background)
+        painter.setFont(editor.font())
+        
+        current = editor.textCursor().blockNumber()
+        height = editor.fontMetrics().height()
+        width = self.width() - 6
+        
+        # Only walk the blocks between the top of the viewport and the
+        # bottom of the area to repaint
+        block = editor.firstVisibleBlock()
+        number = block.blockNumber()
+        top = round(editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top())
+        bottom = top + round(editor.blockBoundingRect(block).height())
+        
+        while block.isValid() and top <= event.rect().bottom():
+            if block.isVisible() and bottom >= event.rect().top():
+                painter.setPen(editor.palette().color(editor.palette().ColorRole.Text)
+                               if number == current else text_color)
+                painter.drawText(0, top, width, height, Qt.AlignmentFlag.AlignRight, str(number + 1))
+            
+            block = block.next()
+            top = bottom
+            bottom = top + round(editor.blockBoundingRect(block).height())
+            number += 1
+
+
+class LineDensity:
+    """Indentation and length of every line, kept in sync with a document
+
+    Only the blocks touched by an edit are read back from the document; the
+    rest of the arrays is shifted in place when lines are added or removed.
+    """
+    
+    def __init__(self, document):
+        self.document = document
+        self.indents = array('H', [0])
+        self.lengths = array('H', [0])
+        
+        # Range of lines changed since the last call to take_dirty()
+        self.dirty = None
+        self.count_changed = False
+        
+        document.contentsChange.connect(self.on_contents_change)
+        self.rebuild()
+    
+    def __len__(self):
+        return len(self.lengths)
+    
+    def rebuild(self):
+        self.indents, self.lengths = self.measure(self.document.toPlainText().split('\n'))
+        self.mark_dirty(0, len(self.lengths) - 1, True)
+    
+    @staticmethod
+    def measure(lines):
+        # map() keeps the per-line work in C, which matters for huge files
+        lengths = list(map(len, lines))
+        indents = list(map(sub, lengths, map(len, map(str.lstrip, lines))))
+        if lengths and max(lengths) > 0xFFFF:
+            lengths = [min(length, 0xFFFF) for length in lengths]
+            indents = [min(indent, 0xFFFF) for indent in indents]
+        return array('H', indents), array('H', lengths)
+    
+    def on_contents_change(self, position, chars_removed, chars_added):
+        change = changed_lines(self.document, position, chars_added, len(self.lengths))
+        if change is None:
+            self.rebuild()
+            return
+        
+        first, old_last, lines = change
+        indents, lengths = self.measure(lines)
+        self.indents[first:old_last + 1] = indents
+        self.lengths[first:old_last + 1] = lengths
+        last = first + len(lines) - 1
+        self.mark_dirty(first, last, last != old_last)
+    
+    def mark_dirty(self, first, last, count_changed):
+        if self.dirty is None:
+            self.dirty = (first, last)
+        else:
+            self.dirty = (min(first, self.dirty[0]), max(last, self.dirty[1]))
+        self.count_changed = self.count_changed or count_changed
+    
+    def take_dirty(self):
+        """Return and reset (first line, last line, line count changed), or None"""
+        if self.dirty is None:
+            return None
+        result = (*self.dirty, self.count_changed)
+        self.dirty = None
+        self.count_changed = False
+        return result
+
+
+class Minimap(QWidget):
+    """Overview of the whole document next to the editor
+
+    The document is drawn into a cached image with one pixel row per group
+    of lines. Edits only redraw the rows of the lines they touched (all rows
+    if lines were added or removed, which moves the line to row mapping),
+    and scrolling only repaints the viewport marker over the cached image.
+    """
+    
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.density = LineDensity(editor.document())
+        self.image = None
+        self.dragging = False
+        
+        # Coalesce bursts of edits into one image update
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(50)
+        self.update_timer.timeout.connect(self.refresh)
+        
+        editor.document().contentsChange.connect(lambda *args: self.update_timer.start())
+        editor.verticalScrollBar().valueChanged.connect(self.update)
+        
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+    
+    def sizeHint(self):
+        return QSize(MINIMAP_WIDTH, 0)
+    
+    def row_count(self):
+        return min(self.height(), len(self.density) * MINIMAP_LINE_HEIGHT)
+    
+    def row_lines(self, row, rows):
+        """Return the range of lines shown in a pixel row"""
+        lines = len(self.density)
+        first = row * lines // rows
+        return first, max(first + 1, (row + 1) * lines // rows)
+    
+    def line_row(self, line, rows):
+        return line * rows // max(1, len(self.density))
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.image = None
+    
+    def redraw(self):
+        """Redraw the whole image, e.g. after a palette change"""
+        self.image = None
+        self.update()
+    
+    def refresh(self):
+        dirty = self.density.take_dirty()
+        if dirty is None or self.image is None:
+            self.update()
+            return
+        
+        first, last, count_changed = dirty
+        rows = self.row_count()
+        if count_changed:
+            self.draw_rows(0, self.height())
+        else:
+            self.draw_rows(self.line_row(first, rows), self.line_row(last, rows) + 1)
+        self.update()
+    
+    def draw_rows(self, first_row, end_row):
+        """Redraw pixel rows [first_row, end_row) of the cached image"""
+        rows = self.row_count()
+        indents = self.density.indents
+        lengths = self.density.lengths
+        background, color = gutter_colors(self.editor.palette())
+        scale = self.width() / MINIMAP_COLUMNS
+        
+        painter = QPainter(self.image)
+        painter.fillRect(0, first_row, self.width(), end_row - first_row, background)
+        for row in range(first_row, min(end_row, rows)):
+            start, end = self.row_lines(row, rows)
+            # Rows covering many lines sample a few of them
+            step = max(1, (end - start) // 8)
+            length = min(max(lengths[start:end:step]), MINIMAP_COLUMNS)
+            if length:
+                indent = min(min(indents[start:end:step]), length)
+                painter.fillRect(round(indent * scale), row, max(1, round((length - indent) * scale)), 1, color)
+        painter.end()
+    
+    def visible_rows(self):
+        """Return the pixel rows covered by the editor's viewport"""
+        rows = self.row_count()
+        editor = self.editor
+        first = editor.firstVisibleBlock().blockNumber()
+        visible = max(1, editor.viewport().height() // max(1, editor.fontMetrics().height()))
+        top = self.line_row(first, rows)
+        bottom = max(top + 3, self.line_row(first + visible, rows))
+        return top, min(bottom, rows)
+    
+    def paintEvent(self, event):
+        if self.image is None or self.image.size() != self.size():
+            self.image = QImage(self.size(), QImage.Format.Format_ARGB32_Premultiplied)
+            self.density.take_dirty()
+            self.draw_rows(0, self.height())
+        
+        painter = QPainter(self)
+        painter.drawImage(event.rect(), self.image, event.rect())
+        
+        # Marker for the part of the document shown in the editor
+        top, bottom = self.visible_rows()
+        marker = QColor(self.editor.palette().color(self.editor.palette().ColorRole.Highlight))
+        marker.setAlpha(60)
+        painter.fillRect(QRect(0, top, self.width(), bottom - top), marker)
+    
+    def scroll_to_row(self, y):
+        rows = self.row_count()
+        if rows <= 0:
+            return
+        row = max(0, min(rows - 1, y))
+        first, _ = self.row_lines(row, rows)
+        
+        # Center the clicked line in the editor
+        visible = self.editor.viewport().height() // max(1, self.editor.fontMetrics().height())
+        self.editor.verticalScrollBar().setValue(max(0, first - visible // 2))
+    
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.dragging = True
+            self.scroll_to_row(round(event.position().y()))
+    
+    def mouseMoveEvent(self, event):
+        if self.dragging:
+            self.scroll_to_row(round(event.position().y()))
+    
+    def mouseReleaseEvent(self, event):
+        self.dragging = False
+    
+    def wheelEvent(self, event):
+        self.editor.wheelEvent(event)
\ No newline at end of file
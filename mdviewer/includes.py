@@ -0,0 +1,212 @@
+import os
+import re
+import html
+import hashlib
+
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+
+# --8<-- "path/to/file.md" on a line of its own, as in pymdownx.snippets
+INCLUDE_REGEX = re.compile(r'^([ \t]*)--8<--[ \t]+"([^"]+)"[ \t]*$')
+
+FENCE_REGEX = re.compile(r'^[ \t]*(`{3,}|~{3,})')
+
+class _IncludedFile:
+    __slots__ = ('stat', 'digest', 'lines', 'expanded', 'files')
+    
+    def __init__(self, stat, digest, lines):
+        self.stat = stat
+        self.digest = digest
+        self.lines = lines
+        
+        # Lines with includes resolved and every file they came from, or
+        # None until the file is expanded (again)
+        self.expanded = None
+        self.files = None
+
+
+def _include_error(message):
+    return ['', f'<div class="include-error">{html.escape(message)}</div>', '']
+
+
+class IncludeGraph:
+    """Included files, the files that include them and their expanded text
+
+    Each file is read once and re-read only when its mtime or size changes;
+    its expansion is kept until its content hash changes, which also drops
+    the expansions of every file that includes it, directly or not. Files
+    whose expansion hit a cycle or a missing file are expanded every time.
+    """
+    
+    def __init__(self):
+        self.nodes = {}
+        
+        # Path -> paths of the files that include it
+        self.parents = {}
+    
+    def expand(self, lines, base_dir, path=None):
+        """Return (lines, files) for a document, with every include resolved
+
+        files is the set of files the document depends on. path is the
+        file of the document itself, if it has one, so including it is a
+        cycle.
+        """
+        self.check()
+        stack = (os.path.normpath(path),) if path else ()
+        lines, files, _ = self._expand(lines, base_dir, stack)
+        return lines, files
+    
+    def check(self):
+        """Forget the expansions that depend on files changed on disk"""
+        for path, node in list(self.nodes.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self.invalidate(path)
+                del self.nodes[path]
+                continue
+            
+            if (stat.st_mtime_ns, stat.st_size) == node.stat:
+                continue
+            changed = self._load(path)
+            if changed.digest != node.digest:
+                self.nodes[path] = changed
+                self.invalidate(path)
+            else:
+                node.stat = changed.stat
+    
+    def invalidate(self, path):
+        """Drop the expansion of path and of everything that includes it"""
+        pending = [path]
+        seen = set()
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            node = self.nodes.get(current)
+            if node is not None:
+                node.expanded = None
+                node.files = None
+            pending.extend(self.parents.get(current, ()))
+    
+    def _load(self, path):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            data = file.read()
+        text = data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+        return _IncludedFile(
+            (stat.st_mtime_ns, stat.st_size), hashlib.sha1(data).digest(), text.split('\n')
+        )
+    
+    def _expand_file(self, path, stack):
+        node = self.nodes.get(path)
+        if node is None:
+            node = self.nodes[path] = self._load(path)
+        if node.expanded is not None:
+            return node.expanded, node.files, True
+        
+        lines, files, cacheable = self._expand(node.lines, os.path.dirname(path), stack + (path,))
+        if cacheable:
+            node.expanded = lines
+            node.files = files
+        return lines, files, cacheable
+    
+    def _expand(self, lines, base_dir, stack):
+        output = []
+        files = set()
+        cacheable = True
+        fence = None
+        for line in lines:
+            match = FENCE_REGEX.match(line)
+            if match:
+                marker = match.group(1)
+                if fence is None:
+                    fence = marker
+                elif marker[0] == fence[0] and len(marker) >= len(fence):
+                    fence = None
+            if fence is not None or '--8<--' not in line:
+                output.append(line)
+                continue
+            match = INCLUDE_REGEX.match(line)
+            if match is None:
+                output.append(line)
+                continue
+            
+            indent, target = match.groups()
+            path = os.path.normpath(os.path.join(base_dir, target))
+            files.add(path)
+            if stack:
+                self.parents.setdefault(path, set()).add(stack[-1])
+            
+            if path in stack:
+                chain = ' → '.join(os.path.basename(p) for p in stack[stack.index(path):] + (path,))
+                output.extend(_include_error(f"Include cycle: {chain}"))
+                cacheable = False
+                continue
+            
+            try:
+                included, included_files, included_cacheable = self._expand_file(path, stack)
+            except OSError as e:
+                output.extend(_include_error(f"Cannot include {target}: {e.strerror}"))
+                cacheable = False
+                continue
+            
+            files.update(included_files)
+            cacheable = cacheable and included_cacheable
+            if indent:
+                output.extend(indent + included_line if included_line else '' for included_line in included)
+            else:
+                output.extend(included)
+        return output, files, cacheable
+
+
+# Shared by the preview and the exporters
+include_graph = IncludeGraph()
+
+
+def expand_includes(text, base_dir=None, path=None, graph=include_graph):
+    """Return text with every include directive replaced by the file it names"""
+    if '--8<--' not in text:
+        return text
+    lines, _ = graph.expand(text.split('\n'), base_dir or os.getcwd(), path)
+    return '\n'.join(lines)
+
+
+class IncludePreprocessor(Preprocessor):
+    def __init__(self, md, extension):
+        super().__init__(md)
+        self.extension = extension
+    
+    def run(self, lines):
+        self.extension.files = set()
+        if not any('--8<--' in line for line in lines):
+            return lines
+        lines, self.extension.files = self.extension.graph.expand(
+            lines, self.extension.getConfig('base_dir') or os.getcwd(),
+            self.extension.getConfig('path') or None
+        )
+        return lines
+
+
+class IncludeExtension(Extension):
+    """Include directive: `--8<-- "file.md"` is replaced by that file
+
+    Paths are relative to the including file, or to `base_dir` for the
+    document itself. `path` is the document's own file, which it cannot
+    include. After a conversion `files` holds the files the document
+    depends on.
+    """
+    
+    def __init__(self, **kwargs):
+        self.config = {
+            'base_dir': ['', "Directory that paths in the document are relative to"],
+            'path': ['', "File of the document itself"],
+        }
+        self.graph = kwargs.pop('graph', include_graph)
+        self.files = set()
+        super().__init__(**kwargs)
+    
+    def extendMarkdown(self, md):
+        # Before whitespace is normalized (30), so included text is too
+        md.preprocessors.register(IncludePreprocessor(md, self), 'include', 31)
\ No newline at end of file
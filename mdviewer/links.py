@@ -0,0 +1,384 @@
+import os
+import sys
+import hashlib
+import argparse
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, unquote
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTreeWidget, QTreeWidgetItem
+)
+
+from mdviewer.includes import IncludeGraph
+from mdviewer.pipeline import (
+    EXPORT_PROFILE, ExtensionTimings, MarkdownPipeline, profile_extensions
+)
+from mdviewer.workspace import scan_markdown_files
+
+class _LinkParser(HTMLParser):
+    """Collects link targets and element ids from rendered HTML"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.anchors = set()
+    
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if attrs.get('id'):
+            self.anchors.add(attrs['id'])
+        if tag == 'a' and attrs.get('name'):
+            self.anchors.add(attrs['name'])
+        if tag == 'a' and attrs.get('href'):
+            self.links.append(attrs['href'])
+        elif tag == 'img' and attrs.get('src'):
+            self.links.append(attrs['src'])
+
+
+class FileLinks:
+    """Links and anchors extracted from one Markdown file"""
+    
+    __slots__ = ('mtime', 'size', 'digest', 'links', 'anchors', 'includes')
+    
+    def __init__(self, mtime, size, digest, links, anchors, includes):
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.links = links  # list of (target, line)
+        self.anchors = anchors
+        self.includes = includes  # included path -> (mtime, size)
+
+
+class LinkProblem:
+    """A broken link or missing anchor"""
+    
+    __slots__ = ('source', 'line', 'target', 'message')
+    
+    def __init__(self, source, line, target, message):
+        self.source = source
+        self.line = line
+        self.target = target
+        self.message = message
+    
+    def __str__(self):
+        return f"{self.source}:{self.line}: {self.message}: {self.target}"
+
+
+class LinkChecker:
+    """Builds the link graph of a folder and reports broken links"""
+    
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.files = {}  # path -> FileLinks
+        
+        # The extensions of an export, so headings get the same ids as in the
+        # preview. Includes are expanded per file beforehand, which lets one
+        # pipeline serve every file; highlighting adds no links or ids.
+        self.pipeline = MarkdownPipeline([
+            name for name in profile_extensions(EXPORT_PROFILE)
+            if name not in ("includes", "codehilite")
+        ], timings=ExtensionTimings())
+        # Its own include graph and timings, since checks run on a worker thread
+        self.include_graph = IncludeGraph()
+    
+    def extract(self, text, path=None):
+        """Return (links, anchors, included files) for markdown text"""
+        included = set()
+        expanded = text
+        if '--8<--' in text:
+            lines, included = self.include_graph.expand(
+                text.split('\n'), os.path.dirname(path) if path else os.getcwd(), path
+            )
+            expanded = '\n'.join(lines)
+        html = self.pipeline.convert(expanded)
+        
+        parser = _LinkParser()
+        parser.feed(html)
+        parser.close()
+        
+        # Links appear in document order, so locate each one after the previous
+        links = []
+        position = 0
+        for target in parser.links:
+            found = text.find(target, position)
+            if found < 0:
+                found = text.find(unquote(target), position)
+            if found >= 0:
+                position = found + len(target)
+            links.append((target, text.count('\n', 0, position) + 1))
+        
+        return links, parser.anchors, included
+    
+    def update_file(self, path, mtime=None, size=None):
+        """Re-parse a file unless its cached entry is still valid"""
+        if mtime is None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self.files.pop(path, None)
+                return False
+            mtime, size = stat.st_mtime, stat.st_size
+        
+        cached = self.files.get(path)
+        if cached and not self._includes_changed(cached):
+            if cached.mtime == mtime and cached.size == size:
+                return False
+        
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            self.files.pop(path, None)
+            return False
+        
+        # A touched but unchanged file keeps its parse results
+        digest = hashlib.sha1(data).hexdigest()
+        if cached and cached.digest == digest and not self._includes_changed(cached):
+            cached.mtime, cached.size = mtime, size
+            return False
+        
+        links, anchors, included = self.extract(data.decode('utf-8', errors='replace'), path)
+        self.files[path] = FileLinks(
+            mtime, size, digest, links, anchors,
+            {included_path: self._stat(included_path) for included_path in included}
+        )
+        return True
+    
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+    
+    def _includes_changed(self, cached):
+        return any(self._stat(path) != stat for path, stat in cached.includes.items())
+    
+    def scan(self):
+        """Refresh the cache from disk, returning the number of re-parsed files"""
+        parsed = 0
+        seen = set()
+        for path, mtime, size in scan_markdown_files(self.root):
+            seen.add(path)
+            if self.update_file(path, mtime, size):
+                parsed += 1
+        
+        for path in list(self.files):
+            if path not in seen:
+                del self.files[path]
+        
+        return parsed
+    
+    def check(self):
+        """Return a list of LinkProblems for all cached files"""
+        problems = []
+        exists_cache = {}
+        
+        for source in sorted(self.files):
+            directory = os.path.dirname(source)
+            for target, line in self.files[source].links:
+                problem = self._check_link(source, directory, target, line, exists_cache)
+                if problem:
+                    problems.append(problem)
+        
+        return problems
+    
+    def _check_link(self, source, directory, target, line, exists_cache):
+        parts = urlsplit(target)
+        
+        # External links are out of scope
+        if parts.scheme or parts.netloc:
+            return None
+        
+        resolved = self._resolve(directory, unquote(parts.path)) if parts.path else source
+        
+        if resolved not in self.files:
+            if resolved not in exists_cache:
+                exists_cache[resolved] = os.path.exists(resolved)
+            if not exists_cache[resolved]:
+                return LinkProblem(source, line, target, "Broken link")
+            return None
+        
+        fragment = unquote(parts.fragment)
+        if fragment and fragment not in self.files[resolved].anchors:
+            return LinkProblem(source, line, target, "Missing anchor")
+        return None
+    
+    def _resolve(self, directory, path):
+        # Absolute link paths are relative to the folder root
+        if path.startswith('/'):
+            return os.path.normpath(os.path.join(self.root, path.lstrip('/')))
+        return os.path.normpath(os.path.join(directory, path))
+    
+    def outgoing(self, path):
+        """Return the local files a file links to"""
+        targets = set()
+        if path not in self.files:
+            return targets
+        
+        directory = os.path.dirname(path)
+        for target, _ in self.files[path].links:
+            parts = urlsplit(target)
+            if not (parts.scheme or parts.netloc) and parts.path:
+                targets.add(self._resolve(directory, unquote(parts.path)))
+        return targets
+    
+    def incoming(self, path):
+        """Return the files that link to path"""
+        path = os.path.normpath(path)
+        return {source for source in self.files if path in self.outgoing(source)}
+
+
+class _CheckSignals(QObject):
+    finished = pyqtSignal(list)  # LinkProblems
+
+
+class _CheckTask(QRunnable):
+    def __init__(self, checker, signals):
+        super().__init__()
+        self.checker = checker
+        self.signals = signals
+    
+    def run(self):
+        self.checker.scan()
+        self.signals.finished.emit(self.checker.check())
+
+
+class LinkPanel(QWidget):
+    # Signal emitted when a problem should be opened at its line
+    file_requested = pyqtSignal(str, int)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.checker = None
+        self.checking = False
+        self.check_pending = False
+        
+        self.signals = _CheckSignals()
+        self.signals.finished.connect(self.on_check_finished)
+        
+        self.setup_ui()
+    
+    def setup_ui(self):
+        self.setMinimumWidth(200)
+        self.setMaximumWidth(400)
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        # Header with a re-check button
+        header_layout = QHBoxLayout()
+        self.header_label = QLabel("Links")
+        self.check_button = QPushButton("Check")
+        header_layout.addWidget(self.header_label)
+        header_layout.addStretch()
+        header_layout.addWidget(self.check_button)
+        layout.addLayout(header_layout)
+        
+        # Problems grouped by file
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setIndentation(15)
+        layout.addWidget(self.tree)
+        
+        # Connect signals
+        self.check_button.clicked.connect(self.check)
+        self.tree.itemClicked.connect(self.on_item_clicked)
+        self.tree.itemActivated.connect(self.on_item_clicked)
+    
+    def set_root(self, root):
+        """Check links below root, keeping the parse cache if it is unchanged"""
+        root = os.path.abspath(root)
+        if not self.checker or self.checker.root != root:
+            self.checker = LinkChecker(root)
+        self.check()
+    
+    def check(self):
+        """Re-check on a worker thread; only changed files are re-parsed"""
+        if not self.checker:
+            return
+        if self.checking:
+            self.check_pending = True
+            return
+        
+        self.checking = True
+        self.header_label.setText("Links (checking...)")
+        QThreadPool.globalInstance().start(_CheckTask(self.checker, self.signals))
+    
+    def on_check_finished(self, problems):
+        self.checking = False
+        if self.check_pending:
+            self.check_pending = False
+            self.check()
+            return
+        
+        self.header_label.setText(f"Links ({len(problems)} problems)")
+        self.tree.clear()
+        
+        items = {}
+        for problem in problems:
+            parent = items.get(problem.source)
+            if parent is None:
+                parent = QTreeWidgetItem([os.path.relpath(problem.source, self.checker.root)])
+                parent.setData(0, Qt.ItemDataRole.UserRole, (problem.source, 0))
+                self.tree.addTopLevelItem(parent)
+                items[problem.source] = parent
+            
+            item = QTreeWidgetItem([f"{problem.line}: {problem.message}: {problem.target}"])
+            item.setData(0, Qt.ItemDataRole.UserRole, (problem.source, problem.line))
+            parent.addChild(item)
+        
+        self.tree.expandAll()
+    
+    def on_item_clicked(self, item, column=0):
+        path, line = item.data(0, Qt.ItemDataRole.UserRole)
+        self.file_requested.emit(path, line)
+    
+    def set_dark_mode(self, dark_mode):
+        """Apply dark mode to the links widget"""
+        palette = self.palette()
+        
+        if dark_mode:
+            # Dark mode colors
+            palette.setColor(QPalette.ColorRole.Base, QColor("#1E1E1E"))
+            palette.setColor(QPalette.ColorRole.Text, QColor("#FFFFFF"))
+            palette.setColor(QPalette.ColorRole.Window, QColor("#252526"))
+            palette.setColor(QPalette.ColorRole.WindowText, QColor("#FFFFFF"))
+        else:
+            # Light mode colors
+            palette.setColor(QPalette.ColorRole.Base, QColor("#FFFFFF"))
+            palette.setColor(QPalette.ColorRole.Text, QColor("#000000"))
+            palette.setColor(QPalette.ColorRole.Window, QColor("#F0F0F0"))
+            palette.setColor(QPalette.ColorRole.WindowText, QColor("#000000"))
+        
+        self.setPalette(palette)
+        self.tree.setPalette(palette)
+
+
+def main(argv=None):
+    """Check the links of a folder from the command line"""
+    parser = argparse.ArgumentParser(
+        prog="python -m mdviewer.links",
+        description="Report broken links and missing anchors in Markdown files"
+    )
+    parser.add_argument("folder", help="Folder containing Markdown files")
+    args = parser.parse_args(argv)
+    
+    checker = LinkChecker(args.folder)
+    checker.scan()
+    problems = checker.check()
+    
+    for problem in problems:
+        print(problem)
+    print(f"{len(checker.files)} files checked, {len(problems)} problems found")
+    
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
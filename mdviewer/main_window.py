@@ -1,33 +1,54 @@
 import os
-import sys
+import re
 import json
+import time
+import hashlib
 import webbrowser
 from pathlib import Path
 from urllib.parse import urlparse
 import requests
 
 from PyQt6.QtCore import (
-    Qt, QUrl, QSettings, QSize, pyqtSlot, QTimer, QFileInfo, QMimeData
+    Qt, QUrl, QSettings, QSize, pyqtSlot, QTimer, QFileInfo, QMimeData,
+    QFileSystemWatcher
 )
 from PyQt6.QtGui import (
-    QIcon, QTextCursor, QAction, QKeySequence, QFont, 
+    QIcon, QTextCursor, QAction, QActionGroup, QKeySequence, QFont, 
     QFontDatabase, QDesktopServices, QDragEnterEvent, QDropEvent
 )
 from PyQt6.QtWidgets import (
     QMainWindow, QApplication, QSplitter, QWidget, QVBoxLayout, 
     QHBoxLayout, QToolBar, QFileDialog, QInputDialog, QMessageBox,
     QLineEdit, QPushButton, QMenu, QStatusBar, QToolButton,
-    QLabel, QComboBox, QSlider
+    QLabel, QComboBox, QSlider, QProgressDialog
 )
 from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
+from PyQt6.QtWebEngineCore import QWebEnginePage
 
 from mdviewer.editor import MarkdownEditor
 from mdviewer.preview import MarkdownPreview
 from mdviewer.outline import DocumentOutline
-from mdviewer.exporter import HTMLExporter, PDFExporter
+from mdviewer.workspace import WorkspacePanel
+from mdviewer.links import LinkPanel
+from mdviewer.stats import StatisticsPanel
+from mdviewer.diff import DiffDialog
+from mdviewer.palette import QuickOpenDialog, HEADING_PREFIX
+from mdviewer.exporter import HTMLExporter, PDFExporter, CHUNK_CHARS
+from mdviewer.fileio import (
+    FileWriter, atomic_write, read_document, sniff_format, describe_format, DEFAULT_FORMAT
+)
+from mdviewer.includes import expand_includes
+from mdviewer.sourcemap import strip_source_map
+from mdviewer.autosave import AutosaveManager
+from mdviewer.perf import tracer, PerformanceHUD
+from mdviewer.pipeline import (
+    CORE, EXTENSIONS, PROFILES, extension_timings, matching_profile, profile_extensions
+)
+from mdviewer.profiler import ProfileRecorder, default_profile_dir
+from mdviewer.server import PreviewServer, DEFAULT_PORT
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, file_path=None, reader_mode=False):
         super().__init__()
         
         self.setWindowTitle("MDViewer")
@@ -37,12 +58,20 @@ class MainWindow(QMainWindow):
         self.setAcceptDrops(True)
         
         self.current_file = None
+        self.file_format = DEFAULT_FORMAT
         self.recent_files = []
         self.max_recent_files = 5
         
         self.settings = QSettings("MDViewer", "MDViewer")
         self.load_settings()
         
+        # In reader mode documents go straight to the preview; the editor
+        # stays empty (reader_text holds the document) until editing starts.
+        # Only --reader starts in it, so later launches still edit.
+        self.reader_mode = reader_mode
+        self.reader_text = None
+        self.preview_find_text = ""
+        
         self.setup_ui()
         self.create_actions()
         self.create_menus()
@@ -51,9 +80,42 @@ class MainWindow(QMainWindow):
         self.setup_connections()
         self.update_recent_files_menu()
         
-        # Check for command-line arguments
-        if len(sys.argv) > 1:
-            file_path = sys.argv[1]
+        # Apply the saved gutter settings
+        self.editor.set_line_numbers_visible(self.line_numbers_action.isChecked())
+        self.editor.set_minimap_visible(self.minimap_action.isChecked())
+        
+        if self.reader_mode:
+            self.set_reader_mode(True)
+        
+        # Saves and autosave snapshots are written on a background thread
+        self.file_writer = FileWriter(self)
+        self.file_writer.finished.connect(self.on_write_finished)
+        self.pending_saves = {}
+        self.autosave = AutosaveManager(
+            self.editor.document(), self.file_writer, parent=self, busy=self.editor.is_pasting
+        )
+        
+        # Serves the preview to browsers while "Serve Preview" is on
+        self.preview_server = None
+        
+        # Notices when another program changes the open file; the timer
+        # lets a burst of writes settle before the file is read
+        self.disk_digest = None
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher_timer = QTimer(self)
+        self.file_watcher_timer.setSingleShot(True)
+        self.file_watcher_timer.setInterval(200)
+        self.file_watcher_timer.timeout.connect(self.check_file_on_disk)
+        self.file_watcher.fileChanged.connect(lambda path: self.file_watcher_timer.start())
+        
+        self.profile_recorder = ProfileRecorder(self.document_text, self)
+        self.profile_recorder.finished.connect(self.on_profile_finished)
+        
+        self.apply_preview_extensions()
+        
+        # Offer to restore unsaved work from a crashed session, otherwise
+        # open the file given on the command line
+        if not self.offer_recovery() and file_path:
             self.open_file(file_path)
     
     def setup_ui(self):
@@ -64,11 +126,17 @@ class MainWindow(QMainWindow):
         self.main_layout.setContentsMargins(0, 0, 0, 0)
         
         # Create editor and preview widgets
-        self.editor = MarkdownEditor()
+        self.editor = MarkdownEditor(highlight=not self.reader_mode)
         self.preview = MarkdownPreview()
         
-        # Create outline widget
+        # Create outline, workspace, link checker and statistics widgets
         self.outline = DocumentOutline()
+        self.workspace = WorkspacePanel()
+        self.links = LinkPanel()
+        self.statistics = StatisticsPanel()
+        
+        # Fuzzy "go to file / heading" palette
+        self.quick_open = QuickOpenDialog(self)
         
         # Set up splitters
         self.h_splitter = QSplitter(Qt.Orientation.Horizontal)
@@ -78,15 +146,24 @@ class MainWindow(QMainWindow):
         self.h_splitter.setStretchFactor(1, 1)
         
         self.v_splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.v_splitter.addWidget(self.workspace)
         self.v_splitter.addWidget(self.outline)
         self.v_splitter.addWidget(self.h_splitter)
+        self.v_splitter.addWidget(self.links)
+        self.v_splitter.addWidget(self.statistics)
         self.v_splitter.setStretchFactor(0, 0)
-        self.v_splitter.setStretchFactor(1, 3)
+        self.v_splitter.setStretchFactor(1, 0)
+        self.v_splitter.setStretchFactor(2, 3)
+        self.v_splitter.setStretchFactor(3, 0)
+        self.v_splitter.setStretchFactor(4, 0)
         
         self.main_layout.addWidget(self.v_splitter)
         
-        # Initially hide the outline
+        # Initially hide the side panels
         self.outline.hide()
+        self.workspace.hide()
+        self.links.hide()
+        self.statistics.hide()
     
     def create_actions(self):
         # File actions
@@ -99,13 +176,24 @@ class MainWindow(QMainWindow):
         self.open_url_action = QAction("Open from URL...", self)
         self.open_url_action.setShortcut(QKeySequence("Ctrl+U"))
         
+        self.open_folder_action = QAction("Open Folder...", self)
+        self.open_folder_action.setShortcut(QKeySequence("Ctrl+Shift+O"))
+        
         self.save_action = QAction("Save", self)
         self.save_action.setShortcut(QKeySequence.StandardKey.Save)
         
         self.save_as_action = QAction("Save As...", self)
         self.save_as_action.setShortcut(QKeySequence.StandardKey.SaveAs)
         
+        self.compare_saved_action = QAction("Compare with Saved...", self)
+        
         self.export_html_action = QAction("Export as HTML...", self)
+        self.export_standalone_action = QAction("Export as Self-Contained HTML...", self)
+        self.recompress_images_action = QAction("Recompress Images on Export", self)
+        self.recompress_images_action.setCheckable(True)
+        self.recompress_images_action.setChecked(
+            self.settings.value("recompress_images", False, type=bool)
+        )
         self.export_pdf_action = QAction("Export as PDF...", self)
         self.print_action = QAction("Print...", self)
         self.print_action.setShortcut(QKeySequence.StandardKey.Print)
@@ -129,9 +217,18 @@ class MainWindow(QMainWindow):
         self.paste_action = QAction("Paste", self)
         self.paste_action.setShortcut(QKeySequence.StandardKey.Paste)
         
+        self.paste_plain_action = QAction("Paste as Plain Text", self)
+        self.paste_plain_action.setShortcut(QKeySequence("Ctrl+Shift+V"))
+        
         self.find_action = QAction("Find...", self)
         self.find_action.setShortcut(QKeySequence.StandardKey.Find)
         
+        self.quick_open_action = QAction("Go to File or Heading...", self)
+        self.quick_open_action.setShortcut(QKeySequence("Ctrl+Shift+P"))
+        
+        self.go_to_heading_action = QAction("Go to Heading...", self)
+        self.go_to_heading_action.setShortcut(QKeySequence("Ctrl+R"))
+        
         # View actions
         self.increase_font_action = QAction("Increase Font Size", self)
         self.increase_font_action.setShortcut(QKeySequence("Ctrl++"))
@@ -143,10 +240,45 @@ class MainWindow(QMainWindow):
         self.toggle_outline_action.setShortcut(QKeySequence("Ctrl+L"))
         self.toggle_outline_action.setCheckable(True)
         
+        self.toggle_workspace_action = QAction("Toggle Workspace", self)
+        self.toggle_workspace_action.setShortcut(QKeySequence("Ctrl+Shift+E"))
+        self.toggle_workspace_action.setCheckable(True)
+        
+        self.toggle_links_action = QAction("Check Links", self)
+        self.toggle_links_action.setCheckable(True)
+        
+        self.toggle_statistics_action = QAction("Toggle Statistics", self)
+        self.toggle_statistics_action.setShortcut(QKeySequence("Ctrl+Shift+I"))
+        self.toggle_statistics_action.setCheckable(True)
+        
+        self.line_numbers_action = QAction("Line Numbers", self)
+        self.line_numbers_action.setCheckable(True)
+        self.line_numbers_action.setChecked(self.settings.value("line_numbers", True, type=bool))
+        
+        self.minimap_action = QAction("Minimap", self)
+        self.minimap_action.setCheckable(True)
+        self.minimap_action.setChecked(self.settings.value("minimap", True, type=bool))
+        
         self.dark_mode_action = QAction("Dark Mode", self)
         self.dark_mode_action.setCheckable(True)
         self.dark_mode_action.setChecked(self.settings.value("dark_mode", False, type=bool))
         
+        self.serve_preview_action = QAction("Serve Preview", self)
+        self.serve_preview_action.setCheckable(True)
+        
+        self.serve_network_action = QAction("Allow Network Access to Preview", self)
+        self.serve_network_action.setCheckable(True)
+        self.serve_network_action.setChecked(
+            self.settings.value("serve_preview_network", False, type=bool)
+        )
+        
+        self.perf_hud_action = QAction("Performance HUD", self)
+        self.perf_hud_action.setCheckable(True)
+        
+        self.export_trace_action = QAction("Export Performance Trace...", self)
+        self.extension_timings_action = QAction("Extension Timings...", self)
+        self.record_profile_action = QAction("Record Performance Profile...", self)
+        
         # View mode actions
         self.editor_only_action = QAction("Editor Only", self)
         self.editor_only_action.setCheckable(True)
@@ -158,6 +290,29 @@ class MainWindow(QMainWindow):
         self.preview_only_action = QAction("Preview Only", self)
         self.preview_only_action.setCheckable(True)
         
+        self.reader_mode_action = QAction("Reader Mode", self)
+        self.reader_mode_action.setShortcut(QKeySequence("Ctrl+Shift+R"))
+        self.reader_mode_action.setCheckable(True)
+        
+        # Preview extensions, chosen one by one or as a profile; the
+        # disabled ones are saved so that new extensions start out enabled
+        disabled = self.settings.value("preview_extensions_disabled", [], type=list)
+        self.extension_actions = {}
+        for name, info in EXTENSIONS.items():
+            action = QAction(info.label, self)
+            action.setCheckable(True)
+            action.setChecked(name not in disabled)
+            self.extension_actions[name] = action
+        
+        self.profile_actions = {}
+        profile_group = QActionGroup(self)
+        profile_group.setExclusionPolicy(QActionGroup.ExclusionPolicy.ExclusiveOptional)
+        for profile, (label, _) in PROFILES.items():
+            action = QAction(f"{label} Profile", self)
+            action.setCheckable(True)
+            profile_group.addAction(action)
+            self.profile_actions[profile] = action
+        
         view_mode_group = QActionGroup(self)
         view_mode_group.addAction(self.editor_only_action)
         view_mode_group.addAction(self.split_view_action)
@@ -176,14 +331,19 @@ class MainWindow(QMainWindow):
         self.file_menu.addAction(self.new_action)
         self.file_menu.addAction(self.open_action)
         self.file_menu.addAction(self.open_url_action)
+        self.file_menu.addAction(self.open_folder_action)
         self.file_menu.addSeparator()
         self.file_menu.addAction(self.save_action)
         self.file_menu.addAction(self.save_as_action)
+        self.file_menu.addAction(self.compare_saved_action)
         self.file_menu.addSeparator()
         
         # Export submenu
         self.export_menu = self.file_menu.addMenu("Export")
         self.export_menu.addAction(self.export_html_action)
+        self.export_menu.addAction(self.export_standalone_action)
+        self.export_menu.addAction(self.recompress_images_action)
+        self.export_menu.addSeparator()
         self.export_menu.addAction(self.export_pdf_action)
         self.file_menu.addAction(self.print_action)
         self.file_menu.addSeparator()
@@ -202,8 +362,11 @@ class MainWindow(QMainWindow):
         self.edit_menu.addAction(self.cut_action)
         self.edit_menu.addAction(self.copy_action)
         self.edit_menu.addAction(self.paste_action)
+        self.edit_menu.addAction(self.paste_plain_action)
         self.edit_menu.addSeparator()
         self.edit_menu.addAction(self.find_action)
+        self.edit_menu.addAction(self.quick_open_action)
+        self.edit_menu.addAction(self.go_to_heading_action)
         
         # View menu
         self.view_menu = menu_bar.addMenu("View")
@@ -213,16 +376,41 @@ class MainWindow(QMainWindow):
         self.view_mode_menu.addAction(self.editor_only_action)
         self.view_mode_menu.addAction(self.split_view_action)
         self.view_mode_menu.addAction(self.preview_only_action)
+        self.view_menu.addAction(self.reader_mode_action)
         
         self.view_menu.addAction(self.toggle_outline_action)
+        self.view_menu.addAction(self.toggle_workspace_action)
+        self.view_menu.addAction(self.toggle_links_action)
+        self.view_menu.addAction(self.toggle_statistics_action)
+        self.view_menu.addSeparator()
+        self.view_menu.addAction(self.line_numbers_action)
+        self.view_menu.addAction(self.minimap_action)
+        self.view_menu.addSeparator()
+        
+        # Preview extensions submenu
+        self.preview_extensions_menu = self.view_menu.addMenu("Preview Extensions")
+        for action in self.profile_actions.values():
+            self.preview_extensions_menu.addAction(action)
+        self.preview_extensions_menu.addSeparator()
+        for action in self.extension_actions.values():
+            self.preview_extensions_menu.addAction(action)
         self.view_menu.addSeparator()
         self.view_menu.addAction(self.increase_font_action)
         self.view_menu.addAction(self.decrease_font_action)
         self.view_menu.addSeparator()
         self.view_menu.addAction(self.dark_mode_action)
+        self.view_menu.addSeparator()
+        self.view_menu.addAction(self.serve_preview_action)
+        self.view_menu.addAction(self.serve_network_action)
+        self.view_menu.addSeparator()
+        self.view_menu.addAction(self.perf_hud_action)
         
         # Help menu
         self.help_menu = menu_bar.addMenu("Help")
+        self.help_menu.addAction(self.record_profile_action)
+        self.help_menu.addAction(self.export_trace_action)
+        self.help_menu.addAction(self.extension_timings_action)
+        self.help_menu.addSeparator()
         self.help_menu.addAction(self.about_action)
     
     def create_toolbar(self):
@@ -260,15 +448,28 @@ class MainWindow(QMainWindow):
         
         self.status_label = QLabel("Ready")
         self.statusbar.addWidget(self.status_label)
+        
+        # Encoding and line endings the document is saved with
+        self.format_label = QLabel(describe_format(self.file_format))
+        self.statusbar.addPermanentWidget(self.format_label)
+        
+        self.perf_hud = PerformanceHUD()
+        self.statusbar.addPermanentWidget(self.perf_hud)
     
     def setup_connections(self):
         # Connect file actions
         self.new_action.triggered.connect(self.new_file)
         self.open_action.triggered.connect(self.show_open_dialog)
         self.open_url_action.triggered.connect(self.show_open_url_dialog)
+        self.open_folder_action.triggered.connect(self.show_open_folder_dialog)
         self.save_action.triggered.connect(self.save_file)
         self.save_as_action.triggered.connect(self.save_file_as)
+        self.compare_saved_action.triggered.connect(self.compare_with_saved)
         self.export_html_action.triggered.connect(self.export_html)
+        self.export_standalone_action.triggered.connect(self.export_standalone_html)
+        self.recompress_images_action.triggered.connect(
+            lambda checked: self.settings.setValue("recompress_images", checked)
+        )
         self.export_pdf_action.triggered.connect(self.export_pdf)
         self.print_action.triggered.connect(self.print_document)
         self.exit_action.triggered.connect(self.close)
@@ -277,34 +478,79 @@ class MainWindow(QMainWindow):
         self.undo_action.triggered.connect(self.editor.undo)
         self.redo_action.triggered.connect(self.editor.redo)
         self.cut_action.triggered.connect(self.editor.cut)
-        self.copy_action.triggered.connect(self.editor.copy)
+        self.copy_action.triggered.connect(self.copy)
         self.paste_action.triggered.connect(self.editor.paste)
-        self.find_action.triggered.connect(self.editor.show_find_dialog)
+        self.paste_plain_action.triggered.connect(self.editor.paste_plain_text)
+        self.editor.paste_progress.connect(
+            lambda percent: self.status_label.setText(f"Converting pasted HTML... {percent}%")
+        )
+        self.editor.paste_finished.connect(self.on_paste_finished)
+        self.find_action.triggered.connect(self.find)
+        self.quick_open_action.triggered.connect(self.show_quick_open)
+        self.go_to_heading_action.triggered.connect(
+            lambda: self.show_quick_open(HEADING_PREFIX)
+        )
         
         # Connect view actions
         self.increase_font_action.triggered.connect(self.increase_font_size)
         self.decrease_font_action.triggered.connect(self.decrease_font_size)
         self.toggle_outline_action.triggered.connect(self.toggle_outline)
+        self.toggle_workspace_action.triggered.connect(self.toggle_workspace)
+        self.toggle_links_action.triggered.connect(self.toggle_links)
+        self.toggle_statistics_action.triggered.connect(self.toggle_statistics)
+        self.line_numbers_action.triggered.connect(self.toggle_line_numbers)
+        self.minimap_action.triggered.connect(self.toggle_minimap)
         self.dark_mode_action.triggered.connect(self.toggle_dark_mode)
+        self.serve_preview_action.triggered.connect(self.toggle_serve_preview)
+        self.serve_network_action.triggered.connect(self.toggle_serve_network)
+        self.perf_hud_action.triggered.connect(self.perf_hud.set_active)
+        self.export_trace_action.triggered.connect(self.export_performance_trace)
+        self.extension_timings_action.triggered.connect(self.show_extension_timings)
+        for profile, action in self.profile_actions.items():
+            action.triggered.connect(lambda checked, profile=profile: self.set_preview_profile(profile))
+        for action in self.extension_actions.values():
+            action.triggered.connect(self.apply_preview_extensions)
+        self.record_profile_action.triggered.connect(self.show_record_profile_dialog)
         
         # Connect view mode actions
         self.editor_only_action.triggered.connect(self.set_editor_only)
         self.split_view_action.triggered.connect(self.set_split_view)
         self.preview_only_action.triggered.connect(self.set_preview_only)
+        self.reader_mode_action.triggered.connect(self.toggle_reader_mode)
         
         # Connect editor and preview
         self.editor.textChanged.connect(self.update_preview)
+        self.preview.includes_changed.connect(self.update_preview)
+        self.preview.rendered.connect(self.publish_preview)
+        self.preview.source_selected.connect(self.select_source)
+        self.editor.cursorPositionChanged.connect(self.highlight_editor_block)
         
         # Connect outline to editor
-        self.outline.heading_clicked.connect(self.editor.scroll_to_heading)
+        self.outline.heading_clicked.connect(self.go_to_heading)
+        self.statistics.heading_clicked.connect(self.go_to_heading)
+        
+        # Connect workspace search results and tree to the editor
+        self.workspace.file_requested.connect(self.open_file_at_line)
+        self.links.file_requested.connect(self.open_file_at_line)
+        self.quick_open.file_requested.connect(self.open_file_at_line)
+        self.quick_open.heading_requested.connect(self.go_to_heading)
         
         # Connect help actions
         self.about_action.triggered.connect(self.show_about_dialog)
     
     def new_file(self):
         if self.maybe_save():
+            # A new document is for writing
+            if self.reader_mode:
+                self.set_reader_mode(False)
+            self.reader_text = None
+            self.preview.set_base_path(None)
             self.editor.clear()
             self.current_file = None
+            self.autosave.current_file = None
+            self.autosave.discard()
+            self.set_file_format(DEFAULT_FORMAT)
+            self.remember_disk_text(None)
             self.setWindowTitle("MDViewer - Untitled")
             self.status_label.setText("New document created")
     
@@ -326,11 +572,15 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
+            content, file_format = read_document(file_path)
             
-            self.editor.setPlainText(content)
+            self.preview.set_document_path(file_path)
+            self.set_document_text(content)
             self.current_file = file_path
+            self.autosave.current_file = file_path
+            self.autosave.discard()
+            self.set_file_format(file_format)
+            self.remember_disk_text(content)
             self.setWindowTitle(f"MDViewer - {os.path.basename(file_path)}")
             self.status_label.setText(f"Opened {file_path}")
             
@@ -355,8 +605,13 @@ class MainWindow(QMainWindow):
                 response.raise_for_status()
                 
                 content = response.text
-                self.editor.setPlainText(content)
+                self.preview.set_base_path(None)
+                self.set_document_text(content)
                 self.current_file = None  # No local file
+                self.autosave.current_file = None
+                self.autosave.discard()
+                self.set_file_format(DEFAULT_FORMAT)
+                self.remember_disk_text(None)
                 self.setWindowTitle(f"MDViewer - {url}")
                 self.status_label.setText(f"Opened from URL: {url}")
                 
@@ -366,45 +621,301 @@ class MainWindow(QMainWindow):
                     f"Could not open URL: {str(e)}"
                 )
     
-    def save_file(self):
+    def show_open_folder_dialog(self):
+        folder = QFileDialog.getExistingDirectory(
+            self, "Open Folder", self.settings.value("workspace", "")
+        )
+        if folder:
+            self.open_workspace(folder)
+    
+    def open_workspace(self, folder):
+        self.workspace.set_root(folder)
+        self.settings.setValue("workspace", folder)
+        self.workspace.show()
+        self.toggle_workspace_action.setChecked(True)
+        self.status_label.setText(f"Opened workspace {folder}")
+    
+    def open_file_at_line(self, file_path, line):
+        """Open a file (if not already open) and move the cursor to a line"""
+        if os.path.normpath(file_path) != os.path.normpath(self.current_file or ""):
+            if not self.maybe_save():
+                return
+            self.open_file(file_path)
+        
+        if line > 0:
+            self.editor.go_to_line(line)
+    
+    @pyqtSlot()
+    def save_file(self, background=True):
         if self.current_file:
-            return self.save_to_file(self.current_file)
+            return self.save_to_file(self.current_file, background)
         else:
-            return self.save_file_as()
+            return self.save_file_as(background)
     
-    def save_file_as(self):
+    @pyqtSlot()
+    def save_file_as(self, background=True):
         file_path, _ = QFileDialog.getSaveFileName(
             self, "Save Markdown File", "",
             "Markdown Files (*.md *.markdown);;All Files (*)"
         )
         
         if file_path:
-            return self.save_to_file(file_path)
+            return self.save_to_file(file_path, background)
         return False
     
-    def save_to_file(self, file_path):
-        try:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(self.editor.toPlainText())
-            
-            self.current_file = file_path
-            self.setWindowTitle(f"MDViewer - {os.path.basename(file_path)}")
+    def save_to_file(self, file_path, background=True):
+        # Saving a paste's placeholder would lose the paste
+        self.editor.finish_pastes()
+        text = self.document_text()
+        if not self.check_encoding(text):
+            return False
+        file_format = self.file_format
+        
+        if background:
+            # The write completes on the writer thread; failures are
+            # reported from on_write_finished
+            job_id = self.file_writer.write(
+                file_path, text, file_format.encoding, file_format.newline, file_format.bom
+            )
+            # The document stays modified, and its snapshot kept, until the
+            # write succeeds
+            self.pending_saves[job_id] = (file_path, self.editor.document().revision())
+            self.status_label.setText(f"Saving to {file_path}...")
+        else:
+            try:
+                atomic_write(
+                    file_path, text, file_format.encoding, file_format.newline, file_format.bom
+                )
+            except Exception as e:
+                QMessageBox.warning(
+                    self, "Error Saving File",
+                    f"Could not save file: {str(e)}"
+                )
+                return False
             self.status_label.setText(f"Saved to {file_path}")
-            
-            # Add to recent files
-            self.add_recent_file(file_path)
-            
-            return True
-            
-        except Exception as e:
+            self.file_saved(file_path)
+            self.editor.document().setModified(False)
+            self.autosave.discard()
+        
+        self.current_file = file_path
+        self.autosave.current_file = file_path
+        self.remember_disk_text(text)
+        self.preview.set_document_path(file_path)
+        self.setWindowTitle(f"MDViewer - {os.path.basename(file_path)}")
+        
+        # Add to recent files
+        self.add_recent_file(file_path)
+        
+        return True
+    
+    def on_write_finished(self, job_id, file_path, error):
+        """Handle completion of a background save"""
+        if job_id not in self.pending_saves:
+            return  # Autosave snapshot
+        _, revision = self.pending_saves.pop(job_id)
+        
+        if error:
+            # The document was left modified, so the changes are not lost
+            self.status_label.setText(f"Failed to save {file_path}")
             QMessageBox.warning(
                 self, "Error Saving File",
-                f"Could not save file: {str(e)}"
+                f"Could not save {file_path}: {error}"
+            )
+            return
+        
+        self.status_label.setText(f"Saved to {file_path}")
+        self.file_saved(file_path)
+        # Unless it was edited since, or another file opened meanwhile
+        document = self.editor.document()
+        if file_path == self.current_file and document.revision() == revision:
+            document.setModified(False)
+            self.autosave.discard()
+    
+    def remember_disk_text(self, text):
+        """Record what the current file holds on disk and watch it for changes"""
+        self.disk_digest = None if text is None else hashlib.sha1(text.encode('utf-8')).digest()
+        self.watch_file()
+    
+    def watch_file(self):
+        """Watch the current file, and only it"""
+        watched = self.file_watcher.files()
+        if self.current_file and os.path.exists(self.current_file):
+            path = os.path.abspath(self.current_file)
+            if watched != [path]:
+                if watched:
+                    self.file_watcher.removePaths(watched)
+                self.file_watcher.addPath(path)
+        elif watched:
+            self.file_watcher.removePaths(watched)
+    
+    def read_saved_text(self):
+        """Return the text of the current file on disk"""
+        return read_document(self.current_file)[0]
+    
+    def set_file_format(self, file_format):
+        self.file_format = file_format
+        self.format_label.setText(describe_format(file_format))
+    
+    def saved_file_format(self, file_path):
+        """Return the format of a file on disk, or the default for new files"""
+        try:
+            return sniff_format(file_path) if file_path else DEFAULT_FORMAT
+        except OSError:
+            return DEFAULT_FORMAT
+    
+    def check_encoding(self, text):
+        """Make sure the file's encoding can store text, offering UTF-8 if not"""
+        encoding = self.file_format.encoding
+        if self.file_format.lossy:
+            ret = QMessageBox.question(
+                self, "Save as UTF-8",
+                "The file is UTF-8 but also contains bytes that were read as Windows-1252.\n"
+                "Saving writes them as UTF-8, which changes those bytes. Do you want to save anyway?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.Cancel
             )
+            if ret != QMessageBox.StandardButton.Yes:
+                return False
+            self.set_file_format(self.file_format._replace(lossy=False))
+        if encoding.startswith('utf'):
+            return True
+        try:
+            text.encode(encoding)
+            return True
+        except UnicodeEncodeError as e:
+            character = e.object[e.start]
+        
+        name = describe_format(self.file_format).split(',')[0]
+        ret = QMessageBox.question(
+            self, "Save as UTF-8",
+            f"The document contains characters, such as \"{character}\", that {name} "
+            f"cannot store.\nDo you want to save it as UTF-8 instead?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.Cancel
+        )
+        if ret != QMessageBox.StandardButton.Yes:
             return False
+        self.set_file_format(self.file_format._replace(encoding='utf-8', bom=False))
+        return True
+    
+    def check_file_on_disk(self):
+        """Offer to reload or compare when another program changed the file"""
+        # Saves replace the file, which drops it from the watcher
+        self.watch_file()
+        if not self.current_file or self.pending_saves:
+            return
+        try:
+            text, file_format = read_document(self.current_file)
+        except (OSError, ValueError):
+            return  # Gone or half-written; a later change brings it back
+        
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        if digest == self.disk_digest:
+            return  # Our own save, or touched without changes
+        self.disk_digest = digest
+        
+        name = os.path.basename(self.current_file)
+        box = QMessageBox(
+            QMessageBox.Icon.Question, "File Changed",
+            f"{name} has been changed by another program.", parent=self
+        )
+        if self.editor.document().isModified():
+            box.setInformativeText("Reloading it discards your unsaved changes.")
+        else:
+            box.setInformativeText("Do you want to reload it?")
+        reload_button = box.addButton("Reload", QMessageBox.ButtonRole.AcceptRole)
+        compare_button = box.addButton("Compare...", QMessageBox.ButtonRole.ActionRole)
+        box.addButton("Ignore", QMessageBox.ButtonRole.RejectRole)
+        box.setDefaultButton(reload_button)
+        box.exec()
+        
+        if box.clickedButton() is reload_button:
+            self.set_document_text(text)
+            self.set_file_format(file_format)
+            self.editor.document().setModified(False)
+            self.autosave.discard()
+            self.status_label.setText(f"Reloaded {self.current_file}")
+        elif box.clickedButton() is compare_button:
+            self.show_diff(text, self.document_text(), "On disk", "Editor")
+    
+    def compare_with_saved(self):
+        """Show the unsaved changes against the file on disk"""
+        if not self.current_file:
+            QMessageBox.information(
+                self, "Compare with Saved",
+                "The document has not been saved yet."
+            )
+            return
+        try:
+            saved = self.read_saved_text()
+        except Exception as e:
+            QMessageBox.warning(
+                self, "Error Opening File",
+                f"Could not open file: {str(e)}"
+            )
+            return
+        
+        text = self.document_text()
+        if saved == text:
+            QMessageBox.information(
+                self, "Compare with Saved",
+                "The document has no unsaved changes."
+            )
+            return
+        self.show_diff(saved, text, "Saved", "Editor")
+    
+    def show_diff(self, old_text, new_text, old_name, new_name):
+        dialog = DiffDialog(self, self.dark_mode_action.isChecked())
+        dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dialog.set_versions(old_text, new_text, old_name, new_name, self.document_dir())
+        dialog.show()
+    
+    def offer_recovery(self):
+        """Offer to restore a snapshot left behind by a crashed session"""
+        for snapshot in self.autosave.find_snapshots():
+            name = snapshot.file_path or "an untitled document"
+            ret = QMessageBox.question(
+                self, "Recover Unsaved Changes",
+                f"MDViewer did not shut down properly.\n"
+                f"Do you want to restore unsaved changes to {name}?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            
+            if ret != QMessageBox.StandardButton.Yes:
+                snapshot.discard()
+                continue
+            
+            try:
+                content = snapshot.read_text()
+            except Exception as e:
+                QMessageBox.warning(
+                    self, "Recovery Error",
+                    f"Could not restore changes: {str(e)}"
+                )
+                continue
+            
+            # Recovered changes are unsaved edits, so they go to the editor
+            if self.reader_mode:
+                self.set_reader_mode(False)
+            if snapshot.file_path:
+                self.preview.set_document_path(snapshot.file_path)
+            self.editor.setPlainText(content)
+            self.editor.document().setModified(True)
+            self.current_file = snapshot.file_path
+            self.autosave.current_file = snapshot.file_path
+            self.set_file_format(self.saved_file_format(snapshot.file_path))
+            self.remember_disk_text(None)
+            title = os.path.basename(snapshot.file_path) if snapshot.file_path else "Untitled"
+            self.setWindowTitle(f"MDViewer - {title} (recovered)")
+            self.status_label.setText("Recovered unsaved changes")
+            
+            # Our own session now snapshots the restored text
+            snapshot.discard()
+            self.autosave.snapshot()
+            return True
+        
+        return False
     
     def export_html(self):
-        if not self.editor.toPlainText():
+        if not self.document_text():
             QMessageBox.warning(self, "Empty Document", "Nothing to export.")
             return
         
@@ -416,7 +927,9 @@ class MainWindow(QMainWindow):
         if file_path:
             exporter = HTMLExporter()
             try:
-                html_content = exporter.export(self.editor.toPlainText())
+                html_content = exporter.export(
+                    self.document_text(), self.document_dir(), self.document_path()
+                )
                 
                 with open(file_path, 'w', encoding='utf-8') as file:
                     file.write(html_content)
@@ -429,8 +942,42 @@ class MainWindow(QMainWindow):
                     f"Could not export to HTML: {str(e)}"
                 )
     
+    def export_standalone_html(self):
+        if not self.document_text():
+            QMessageBox.warning(self, "Empty Document", "Nothing to export.")
+            return
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Self-Contained HTML", "",
+            "HTML Files (*.html *.htm);;All Files (*)"
+        )
+        
+        if file_path:
+            exporter = HTMLExporter()
+            try:
+                start = time.perf_counter()
+                html_content = exporter.export_self_contained(
+                    self.document_text(), self.document_dir(), self.document_path(),
+                    recompress_images=self.recompress_images_action.isChecked()
+                )
+                
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.write(html_content)
+                
+                elapsed = (time.perf_counter() - start) * 1000
+                size = os.path.getsize(file_path) / 1024
+                self.status_label.setText(
+                    f"Exported HTML to {file_path} ({size:.1f} KB in {elapsed:.0f} ms)"
+                )
+                
+            except Exception as e:
+                QMessageBox.warning(
+                    self, "Export Error",
+                    f"Could not export to HTML: {str(e)}"
+                )
+    
     def export_pdf(self):
-        if not self.editor.toPlainText():
+        if not self.document_text():
             QMessageBox.warning(self, "Empty Document", "Nothing to export.")
             return
         
@@ -441,8 +988,13 @@ class MainWindow(QMainWindow):
         
         if file_path:
             exporter = PDFExporter()
+            text = expand_includes(self.document_text(), self.document_dir(), self.document_path())
+            if len(text) > CHUNK_CHARS:
+                self.export_pdf_chunked(exporter, text, file_path)
+                return
+            
             try:
-                exporter.export(self.editor.toPlainText(), file_path)
+                exporter.export(text, file_path, self.document_dir(), self.document_path())
                 self.status_label.setText(f"Exported PDF to {file_path}")
                 
             except Exception as e:
@@ -451,8 +1003,47 @@ class MainWindow(QMainWindow):
                     f"Could not export to PDF: {str(e)}"
                 )
     
+    def export_pdf_chunked(self, exporter, text, file_path):
+        """Export a large document in chunks, with progress and cancel"""
+        job = exporter.export_chunked(
+            text, file_path, parent=self, base_dir=self.document_dir(), path=self.document_path()
+        )
+        
+        progress = QProgressDialog("Exporting PDF...", "Cancel", 0, job.total, self)
+        progress.setWindowTitle("Export PDF")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setValue(0)
+        
+        start = time.perf_counter()
+        job.progress.connect(lambda done, total: progress.setValue(done))
+        job.finished.connect(
+            lambda error: self.on_pdf_export_finished(job, progress, file_path, start, error)
+        )
+        progress.canceled.connect(job.cancel)
+        job.start()
+    
+    def on_pdf_export_finished(self, job, progress, file_path, start, error):
+        progress.canceled.disconnect(job.cancel)
+        progress.close()
+        progress.deleteLater()
+        job.deleteLater()
+        
+        if job.cancelled:
+            self.status_label.setText("PDF export cancelled")
+        elif error:
+            QMessageBox.warning(
+                self, "Export Error",
+                f"Could not export to PDF: {error}"
+            )
+        else:
+            elapsed = time.perf_counter() - start
+            self.status_label.setText(
+                f"Exported PDF to {file_path} ({job.page_count} pages in {elapsed:.1f} s)"
+            )
+    
     def print_document(self):
-        if not self.editor.toPlainText():
+        if not self.document_text():
             QMessageBox.warning(self, "Empty Document", "Nothing to print.")
             return
         
@@ -462,7 +1053,9 @@ class MainWindow(QMainWindow):
         if dialog.exec() == QPrintDialog.DialogCode.Accepted:
             exporter = PDFExporter()
             try:
-                html_content = exporter.markdown_to_html(self.editor.toPlainText())
+                html_content = exporter.markdown_to_html(
+                    self.document_text(), self.document_dir(), self.document_path()
+                )
                 self.preview.print_(printer, html_content)
                 self.status_label.setText("Document sent to printer")
                 
@@ -473,6 +1066,11 @@ class MainWindow(QMainWindow):
                 )
     
     def maybe_save(self):
+        # Pastes being converted land in this document, not the next one
+        self.editor.finish_pastes()
+        # A background save that fails leaves the document modified
+        if self.pending_saves:
+            self.file_writer.flush()
         if not self.editor.document().isModified():
             return True
         
@@ -485,7 +1083,8 @@ class MainWindow(QMainWindow):
         )
         
         if ret == QMessageBox.StandardButton.Save:
-            return self.save_file()
+            # Callers continue straight away, so write synchronously
+            return self.save_file(background=False)
         elif ret == QMessageBox.StandardButton.Cancel:
             return False
         
@@ -507,6 +1106,14 @@ class MainWindow(QMainWindow):
             self.editor.setFont(current_font)
             self.preview.set_zoom_factor(self.preview.zoom_factor * 0.9)
     
+    def toggle_line_numbers(self, visible):
+        self.editor.set_line_numbers_visible(visible)
+        self.settings.setValue("line_numbers", visible)
+    
+    def toggle_minimap(self, visible):
+        self.editor.set_minimap_visible(visible)
+        self.settings.setValue("minimap", visible)
+    
     def toggle_outline(self):
         if self.outline.isVisible():
             self.outline.hide()
@@ -516,6 +1123,88 @@ class MainWindow(QMainWindow):
             self.toggle_outline_action.setChecked(True)
             self.update_outline()
     
+    @pyqtSlot()
+    def show_quick_open(self, text=""):
+        """Show the palette over recent and workspace files and this document's headings"""
+        paths = [path for path in self.recent_files if os.path.isfile(path)]
+        root = None
+        if self.workspace.index:
+            root = self.workspace.root
+            recent = set(paths)
+            paths.extend(path for path in self.workspace.index.paths() if path not in recent)
+        
+        # Indexes are only rebuilt, in the background, when these changed
+        self.quick_open.set_files(paths, root)
+        self.quick_open.set_document(self.document_text())
+        self.quick_open.popup(text)
+    
+    def toggle_workspace(self):
+        if self.workspace.isVisible():
+            self.workspace.hide()
+            self.toggle_workspace_action.setChecked(False)
+            return
+        
+        if self.workspace.root:
+            self.workspace.show()
+            self.toggle_workspace_action.setChecked(True)
+            self.workspace.reindex()
+            return
+        
+        # Reopen the last workspace, or ask for a folder
+        folder = self.settings.value("workspace", "")
+        if folder and os.path.isdir(folder):
+            self.open_workspace(folder)
+        else:
+            self.toggle_workspace_action.setChecked(False)
+            self.show_open_folder_dialog()
+    
+    def toggle_links(self):
+        if self.links.isVisible():
+            self.links.hide()
+            self.toggle_links_action.setChecked(False)
+            return
+        
+        # Check the workspace, or the folder of the current file
+        root = self.workspace.root
+        if not root and self.current_file:
+            root = os.path.dirname(os.path.abspath(self.current_file))
+        if not root:
+            self.toggle_links_action.setChecked(False)
+            QMessageBox.information(
+                self, "Check Links",
+                "Open a folder or save the document to check its links."
+            )
+            return
+        
+        self.links.show()
+        self.toggle_links_action.setChecked(True)
+        self.links.set_root(root)
+    
+    def toggle_statistics(self):
+        if self.statistics.isVisible():
+            # Stop counting edits while nobody looks
+            self.statistics.disconnect_document()
+            self.statistics.hide()
+            self.toggle_statistics_action.setChecked(False)
+        else:
+            self.statistics.show()
+            self.toggle_statistics_action.setChecked(True)
+            self.update_statistics()
+    
+    def update_statistics(self):
+        if self.reader_text is not None:
+            self.statistics.set_text(self.reader_text)
+        else:
+            # Edits are followed from here on
+            self.statistics.set_document(self.editor.document())
+    
+    def file_saved(self, file_path):
+        """Refresh the panels that index files on disk"""
+        self.watch_file()
+        self.workspace.file_saved(file_path)
+        if self.links.isVisible():
+            self.links.check()
+    
     def toggle_dark_mode(self):
         is_dark = self.dark_mode_action.isChecked()
         self.settings.setValue("dark_mode", is_dark)
@@ -524,15 +1213,96 @@ class MainWindow(QMainWindow):
         self.editor.set_dark_mode(is_dark)
         self.preview.set_dark_mode(is_dark)
         self.outline.set_dark_mode(is_dark)
+        self.workspace.set_dark_mode(is_dark)
+        self.links.set_dark_mode(is_dark)
+        self.statistics.set_dark_mode(is_dark)
         
         # Update the window
         self.status_label.setText(f"Theme: {'Dark' if is_dark else 'Light'}")
     
+    def set_preview_profile(self, profile):
+        names = profile_extensions(profile)
+        for name, action in self.extension_actions.items():
+            action.setChecked(name in names)
+        self.apply_preview_extensions()
+    
+    def apply_preview_extensions(self):
+        """Render the preview with the checked extensions"""
+        names = [name for name, action in self.extension_actions.items() if action.isChecked()]
+        self.settings.setValue(
+            "preview_extensions_disabled",
+            [name for name in self.extension_actions if name not in names]
+        )
+        
+        profile = matching_profile(names)
+        for key, action in self.profile_actions.items():
+            action.setChecked(key == profile)
+        self.preview.set_extensions(names)
+    
+    def toggle_serve_preview(self, enabled):
+        if not enabled:
+            self.preview_server.stop()
+            self.preview_server = None
+            self.status_label.setText("Stopped serving the preview")
+            return
+        
+        host = "0.0.0.0" if self.serve_network_action.isChecked() else "127.0.0.1"
+        port = self.settings.value("serve_preview_port", DEFAULT_PORT, type=int)
+        server = PreviewServer(host, port)
+        try:
+            server.start()
+        except OSError:
+            # The usual port is taken, e.g. by another window
+            server = PreviewServer(host, 0)
+            try:
+                server.start()
+            except OSError as e:
+                self.serve_preview_action.setChecked(False)
+                QMessageBox.warning(
+                    self, "Error Serving Preview",
+                    f"Could not start the preview server: {str(e)}"
+                )
+                return
+        
+        self.preview_server = server
+        self.update_preview()
+        self.status_label.setText(f"Serving preview at {server.url}")
+    
+    def toggle_serve_network(self, enabled):
+        self.settings.setValue("serve_preview_network", enabled)
+        if self.preview_server is not None:
+            # Rebind on the new interface
+            self.toggle_serve_preview(False)
+            self.toggle_serve_preview(True)
+    
+    def publish_preview(self, html):
+        if self.preview_server is not None:
+            self.preview_server.publish(
+                strip_source_map(html), self.preview.current_css, self.preview.base_path()
+            )
+    
+    def select_source(self, start_line, start_column, end_line, end_column):
+        # In reader mode the editor is empty
+        if self.reader_text is not None or not self.editor.isVisible():
+            return
+        self.editor.select_source(start_line, start_column, end_line, end_column)
+        self.editor.setFocus()
+    
+    def highlight_editor_block(self):
+        # Cheap unless the cursor moves to another block
+        self.preview.highlight_source_line(self.editor.textCursor().blockNumber())
+    
     def set_editor_only(self):
+        if self.reader_mode:
+            self.set_reader_mode(False)
+            self.editor_only_action.setChecked(True)
         self.preview.hide()
         self.editor.show()
     
     def set_split_view(self):
+        if self.reader_mode:
+            self.set_reader_mode(False)
+            return
         self.editor.show()
         self.preview.show()
         # Reset splitter sizes
@@ -542,16 +1312,141 @@ class MainWindow(QMainWindow):
         self.editor.hide()
         self.preview.show()
     
+    def document_dir(self):
+        """Return the directory of the current file, which relative paths resolve against"""
+        return os.path.dirname(os.path.abspath(self.current_file)) if self.current_file else None
+    
+    def document_path(self):
+        """Return the absolute path of the current file, if any"""
+        return os.path.abspath(self.current_file) if self.current_file else None
+    
+    def document_text(self):
+        """Return the markdown of the current document"""
+        if self.reader_text is not None:
+            return self.reader_text
+        return self.editor.toPlainText()
+    
+    def set_document_text(self, content):
+        """Show a newly opened document"""
+        if self.reader_mode:
+            # Straight to the renderer, without the editor pipeline
+            self.unload_editor(content)
+            self.update_preview()
+        else:
+            self.reader_text = None
+            self.editor.setPlainText(content)
+    
+    def unload_editor(self, text):
+        """Keep text for the preview only and empty the editor"""
+        self.reader_text = text
+        if not self.editor.document().isEmpty():
+            self.editor.textChanged.disconnect(self.update_preview)
+            self.editor.clear()
+            self.editor.textChanged.connect(self.update_preview)
+        self.editor.document().setModified(False)
+    
+    def load_editor(self):
+        """Move the document from the reader into the editor"""
+        self.editor.enable_highlighting()
+        if self.reader_text is None:
+            return
+        
+        # The preview already shows this text
+        self.editor.textChanged.disconnect(self.update_preview)
+        self.editor.setPlainText(self.reader_text)
+        self.editor.textChanged.connect(self.update_preview)
+        self.editor.document().setModified(False)
+        self.reader_text = None
+    
+    def set_reader_mode(self, enabled):
+        """Switch between the read-only viewer and the editor"""
+        self.reader_mode = enabled
+        self.reader_mode_action.setChecked(enabled)
+        self.editor.setReadOnly(enabled)
+        # The preview is all there is to copy from and search
+        for action in (self.undo_action, self.redo_action, self.cut_action,
+                       self.paste_action, self.paste_plain_action):
+            action.setEnabled(not enabled)
+        
+        if enabled:
+            # Unsaved edits stay in the (now read-only) editor
+            if self.reader_text is None and not self.editor.document().isModified():
+                self.unload_editor(self.editor.toPlainText())
+            self.preview_only_action.setChecked(True)
+            self.set_preview_only()
+        else:
+            self.load_editor()
+            self.split_view_action.setChecked(True)
+            self.set_split_view()
+        
+        if self.statistics.isVisible():
+            self.update_statistics()
+    
+    def toggle_reader_mode(self, enabled):
+        self.set_reader_mode(enabled)
+        self.status_label.setText("Reader mode" if enabled else "Editing")
+    
+    def copy(self):
+        if self.reader_mode:
+            self.preview.triggerPageAction(QWebEnginePage.WebAction.Copy)
+        else:
+            self.editor.copy()
+    
+    def find(self):
+        if not self.reader_mode:
+            self.editor.show_find_dialog()
+            return
+        
+        text, ok = QInputDialog.getText(self, "Find", "Find in document:", text=self.preview_find_text)
+        if ok:
+            # Finding the same text again moves on to the next match
+            self.preview_find_text = text
+            self.preview.findText(text, resultCallback=self.on_preview_find_result)
+    
+    def on_preview_find_result(self, result):
+        if self.preview_find_text and not result.numberOfMatches():
+            self.status_label.setText(f"'{self.preview_find_text}' not found")
+    
+    def go_to_heading(self, heading_text, level, line):
+        if self.reader_text is None:
+            self.editor.scroll_to_heading(heading_text, level, line)
+            return
+        
+        # Count the headings with the same text above, for the preview
+        pattern = re.compile(rf'^{"#" * level}[ \t]+{re.escape(heading_text)}[ \t]*$', re.MULTILINE)
+        end = 0
+        for _ in range(line - 1):
+            end = self.reader_text.find('\n', end) + 1
+            if not end:
+                break
+        occurrence = len(pattern.findall(self.reader_text, 0, end)) if end else 0
+        self.preview.scroll_to_heading(heading_text, level, occurrence)
+    
+    def on_paste_finished(self):
+        self.status_label.setText("Pasted")
+        # After the editor has shown the pasted text
+        QTimer.singleShot(0, self.update_preview)
+    
     def update_preview(self):
+        if self.editor.is_pasting():
+            return  # Rendered once the paste is in
+        
         # Update markdown preview
-        markdown_text = self.editor.toPlainText()
+        with tracer.span("toPlainText"):
+            markdown_text = self.document_text()
         self.preview.set_markdown(markdown_text)
         
-        # Update outline
-        self.update_outline()
+        # Update outline; it is rebuilt when shown again
+        if self.outline.isVisible():
+            with tracer.span("outline"):
+                self.update_outline()
+        
+        # The statistics follow the editor's edits by themselves
+        if self.statistics.isVisible() and self.reader_text is not None:
+            self.update_statistics()
     
     def update_outline(self):
-        markdown_text = self.editor.toPlainText()
+        markdown_text = self.document_text()
         self.outline.update_outline(markdown_text)
     
     def add_recent_file(self, file_path):
@@ -602,6 +1497,89 @@ class MainWindow(QMainWindow):
         self.update_recent_files_menu()
         self.settings.setValue("recent_files", self.recent_files)
     
+    def export_performance_trace(self):
+        if not tracer.events:
+            QMessageBox.information(
+                self, "Export Performance Trace",
+                "No timings recorded. Enable View > Performance HUD and edit the document first."
+            )
+            return
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Performance Trace", "mdviewer-trace.json",
+            "Chrome Trace Files (*.json);;All Files (*)"
+        )
+        
+        if file_path:
+            try:
+                tracer.save_chrome_trace(file_path)
+                self.status_label.setText(f"Exported performance trace to {file_path}")
+            except Exception as e:
+                QMessageBox.warning(
+                    self, "Export Error",
+                    f"Could not export trace: {str(e)}"
+                )
+    
+    def show_extension_timings(self):
+        rows = extension_timings.report()
+        if not rows:
+            QMessageBox.information(
+                self, "Extension Timings",
+                "No timings recorded yet. Edit or open a document first."
+            )
+            return
+        
+        labels = {name: info.label for name, info in EXTENSIONS.items()}
+        labels[CORE] = "Markdown Core"
+        table = "".join(
+            f"<tr><td>{labels.get(name, name)}</td><td align='right'>{last:.1f}</td>"
+            f"<td align='right'>{mean:.1f}</td><td align='right'>{share:.0%}</td></tr>"
+            for name, last, mean, share in rows
+        )
+        QMessageBox.information(
+            self, "Extension Timings",
+            "<p>Time spent in each extension while rendering, in milliseconds.</p>"
+            "<table cellspacing='6'><tr><th align='left'>Extension</th><th>Last</th>"
+            f"<th>Mean</th><th>Share</th></tr>{table}</table>"
+            "<p>Fenced code is highlighted by Fenced Code Blocks when Syntax Highlighting "
+            "is on, and inline patterns count as Markdown Core. Slow extensions can be "
+            "turned off under View &gt; Preview Extensions; exports always use all of them.</p>"
+        )
+    
+    def show_record_profile_dialog(self):
+        if self.profile_recorder.is_recording():
+            self.profile_recorder.stop()
+            return
+        
+        seconds, ok = QInputDialog.getInt(
+            self, "Record Performance Profile",
+            "Use MDViewer as usual while the profile is recorded.\n"
+            "Recording time in seconds:",
+            10, 1, 600
+        )
+        if not ok:
+            return
+        
+        folder = QFileDialog.getExistingDirectory(self, "Save Profile In")
+        if folder:
+            self.record_profile(seconds, default_profile_dir(folder))
+    
+    def record_profile(self, seconds, output_dir):
+        """Sample the GUI thread for the given number of seconds"""
+        self.profile_recorder.start(seconds, output_dir)
+        self.record_profile_action.setText("Stop Recording Profile")
+        self.status_label.setText(f"Recording performance profile for {seconds} s...")
+    
+    def on_profile_finished(self, output_dir):
+        self.record_profile_action.setText("Record Performance Profile...")
+        if output_dir:
+            self.status_label.setText(f"Saved performance profile to {output_dir}")
+        else:
+            QMessageBox.warning(
+                self, "Profile Error",
+                "Could not save the performance profile."
+            )
+    
     def show_about_dialog(self):
         QMessageBox.about(
             self, "About MDViewer",
@@ -639,6 +1617,12 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         if self.maybe_save():
             self.save_settings()
+            
+            # Let pending saves land before exiting
+            self.file_writer.wait()
+            self.autosave.shutdown()
+            if self.preview_server is not None:
+                self.preview_server.stop()
             event.accept()
         else:
             event.ignore()
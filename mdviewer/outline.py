@@ -1,14 +1,170 @@
 import re
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QColor, QPalette, QBrush
-from PyQt6.QtWidgets import (
-    QWidget, QTreeWidget, QTreeWidgetItem, QVBoxLayout,
-    QLabel, QHeaderView
-)
+from array import array
+from PyQt6.QtCore import Qt, QAbstractItemModel, QModelIndex, pyqtSignal
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtWidgets import QWidget, QTreeView, QVBoxLayout, QLabel
+
+# Headings (# Heading), matched across the whole document at once. Starting
+# with a literal '#' rather than '^' lets the regex engine skip ahead to
+# candidates; the lookbehind then checks the '#' starts a line.
+HEADING_REGEX = re.compile(r'#(?<![^\n]#)(#{0,5})[^\S\n]+(.+)')
+
+# Rows handed to the view per fetchMore() call
+FETCH_BATCH = 500
+
+# Outline levels are expanded while the number of rows shown stays below this
+EXPAND_LIMIT = 1000
+
+class HeadingTable:
+    """Headings of a document stored in flat arrays
+    
+    Heading i (1-based) has its level, line and text at index i - 1 of
+    levels, lines and texts. Node 0 is the root: parents[i] and rows[i]
+    give the parent node and the row below it, children[i] the child nodes.
+    """
+    
+    __slots__ = ('levels', 'lines', 'texts', 'parents', 'rows', 'children')
+    
+    def __init__(self):
+        self.levels = array('B')
+        self.lines = array('L')
+        self.texts = []
+        self.parents = array('L', [0])
+        self.rows = array('L', [0])
+        self.children = [[]]
+    
+    def __len__(self):
+        return len(self.texts)
+    
+    def heading(self, node):
+        """Return (text, level, line) of a heading node"""
+        return self.texts[node - 1], self.levels[node - 1], self.lines[node - 1]
+
+
+def extract_headings(markdown_text):
+    """Extract all headings from markdown text into a HeadingTable"""
+    headings = HeadingTable()
+    if not markdown_text:
+        return headings
+    
+    levels = headings.levels
+    lines = headings.lines
+    texts = headings.texts
+    parents = headings.parents
+    rows = headings.rows
+    children = headings.children
+    
+    # Closest node at each level, 0 if none (H1-H6, so 7 elements)
+    parent_stack = [0] * 7
+    line = 1
+    position = 0
+    
+    for match in HEADING_REGEX.finditer(markdown_text):
+        start = match.start()
+        line += markdown_text.count('\n', position, start)
+        position = start
+        
+        level = match.end(1) - start  # Number of # symbols
+        node = len(texts) + 1
+        
+        # Find the closest parent level that exists
+        parent_level = level - 1
+        while parent_level > 0 and not parent_stack[parent_level]:
+            parent_level -= 1
+        parent = parent_stack[parent_level]
+        
+        levels.append(level)
+        lines.append(line)
+        texts.append(match.group(2).strip())
+        parents.append(parent)
+        rows.append(len(children[parent]))
+        children[parent].append(node)
+        children.append([])
+        
+        # Update the stack for this level and clear all deeper levels
+        parent_stack[level] = node
+        parent_stack[level + 1:] = [0] * (6 - level)
+    
+    return headings
+
+
+class OutlineModel(QAbstractItemModel):
+    """Read-only tree model over a HeadingTable
+    
+    Items are created by the view on demand, and children are handed out
+    in batches through canFetchMore/fetchMore.
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headings = HeadingTable()
+        self.fetched = {}  # node -> number of children made visible
+    
+    def set_headings(self, headings):
+        self.beginResetModel()
+        self.headings = headings
+        self.fetched = {}
+        self.endResetModel()
+    
+    def node(self, index):
+        return index.internalId() if index.isValid() else 0
+    
+    def index(self, row, column, parent=QModelIndex()):
+        children = self.headings.children[self.node(parent)]
+        if column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, 0, children[row])
+    
+    def parent(self, index=None):
+        if index is None:
+            # QObject.parent()
+            return super().parent()
+        
+        parent = self.headings.parents[index.internalId()] if index.isValid() else 0
+        if parent == 0:
+            return QModelIndex()
+        return self.createIndex(self.headings.rows[parent], 0, parent)
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self.node(parent)
+        return self.fetched.get(node, min(FETCH_BATCH, len(self.headings.children[node])))
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+    
+    def hasChildren(self, parent=QModelIndex()):
+        return len(self.headings.children[self.node(parent)]) > 0
+    
+    def canFetchMore(self, parent):
+        return self.rowCount(parent) < len(self.headings.children[self.node(parent)])
+    
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        first = self.rowCount(parent)
+        last = min(first + FETCH_BATCH, len(self.headings.children[node]))
+        if last <= first:
+            return
+        
+        self.beginInsertRows(parent, first, last - 1)
+        self.fetched[node] = last
+        self.endInsertRows()
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalId()
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return self.headings.texts[node - 1]
+        if role == Qt.ItemDataRole.UserRole:
+            return self.headings.levels[node - 1]
+        return None
+
 
 class DocumentOutline(QWidget):
-    # Signal emitted when a heading is clicked
-    heading_clicked = pyqtSignal(str, int)
+    # Signal emitted with the text, level and line of a clicked heading
+    heading_clicked = pyqtSignal(str, int, int)
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -27,102 +183,63 @@ class DocumentOutline(QWidget):
         header_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(header_label)
         
-        # Tree widget for outline
-        self.tree = QTreeWidget()
+        # Tree view for outline
+        self.model = OutlineModel(self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
         self.tree.setHeaderHidden(True)
         self.tree.setIndentation(15)
         self.tree.setAnimated(True)
+        # Lets the view lay out thousands of rows without measuring each one
+        self.tree.setUniformRowHeights(True)
         
         layout.addWidget(self.tree)
         
         # Connect signals
-        self.tree.itemClicked.connect(self.on_item_clicked)
+        self.tree.clicked.connect(self.on_item_clicked)
     
     def update_outline(self, markdown_text):
         """Extract headings from markdown and build the outline"""
-        self.tree.clear()
-        
-        if not markdown_text:
-            return
-        
         # Extract headings (# Heading)
         headings = self.extract_headings(markdown_text)
         
         # Build the tree
         self.build_tree(headings)
-        
-        # Expand all items
-        self.tree.expandAll()
     
     def extract_headings(self, markdown_text):
-        """Extract all headings from markdown text with their levels"""
-        headings = []
-        
-        # Split markdown into lines
-        lines = markdown_text.split('\n')
-        
-        # Regex for headings (# Heading)
-        heading_regex = re.compile(r'^(#{1,6})\s+(.+)$')
-        
-        for line in lines:
-            match = heading_regex.match(line)
-            if match:
-                level = len(match.group(1))  # Number of # symbols
-                text = match.group(2).strip()
-                headings.append({
-                    'level': level,
-                    'text': text,
-                })
-        
-        return headings
+        """Extract all headings from markdown text into a HeadingTable"""
+        return extract_headings(markdown_text)
     
     def build_tree(self, headings):
-        """Build the tree widget from the extracted headings"""
-        if not headings:
-            return
-        
-        # Stack to keep track of parent items at each level
-        parent_stack = [None] * 7  # H1-H6 (0-indexed, so 7 elements)
+        """Show the extracted headings in the tree view"""
+        self.model.set_headings(headings)
+        self.expand_levels()
+    
+    def expand_levels(self):
+        """Expand whole levels of the outline, as long as they fit EXPAND_LIMIT"""
+        children = self.model.headings.children
+        nodes = list(children[0][:FETCH_BATCH])
+        shown = len(nodes)
         
-        for heading in headings:
-            level = heading['level']
-            text = heading['text']
+        while nodes:
+            expandable = [node for node in nodes if children[node]]
+            added = sum(min(FETCH_BATCH, len(children[node])) for node in expandable)
+            if not expandable or shown + added > EXPAND_LIMIT:
+                break
             
-            # Create the item
-            item = QTreeWidgetItem([text])
-            item.setData(0, Qt.ItemDataRole.UserRole, level)  # Store level in user data
+            for node in expandable:
+                self.tree.setExpanded(self.index_of(node), True)
             
-            # Find the parent
-            if level == 1:
-                # Top level heading - add to root
-                self.tree.addTopLevelItem(item)
-                parent_stack[1] = item
-            else:
-                # Find the closest parent level
-                parent_level = level - 1
-                # Search for the closest parent level that exists
-                while parent_level > 0 and parent_stack[parent_level] is None:
-                    parent_level -= 1
-                
-                if parent_level == 0:
-                    # No parent found, add to root
-                    self.tree.addTopLevelItem(item)
-                else:
-                    # Add as child of parent
-                    parent_stack[parent_level].addChild(item)
-            
-            # Update the parent stack for this level
-            parent_stack[level] = item
-            
-            # Clear all deeper levels from the stack
-            for i in range(level + 1, 7):
-                parent_stack[i] = None
+            shown += added
+            nodes = [child for node in expandable for child in children[node][:FETCH_BATCH]]
+    
+    def index_of(self, node):
+        return self.model.createIndex(self.model.headings.rows[node], 0, node)
     
-    def on_item_clicked(self, item, column):
+    def on_item_clicked(self, index):
         """Handle click on a heading item"""
-        level = item.data(0, Qt.ItemDataRole.UserRole)
-        text = item.text(0)
-        self.heading_clicked.emit(text, level)
+        text, level, line = self.model.headings.heading(index.internalId())
+        self.heading_clicked.emit(text, level, line)
     
     def set_dark_mode(self, dark_mode):
         """Apply dark mode to the outline widget"""
@@ -0,0 +1,393 @@
+import os
+import heapq
+from collections import defaultdict
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel
+)
+
+from mdviewer.outline import extract_headings
+
+# Prefix restricting the palette to headings of the current document
+HEADING_PREFIX = '@'
+
+# Characters after which a match counts as the start of a word
+SEPARATORS = frozenset(' /\\-_.:#()[]')
+
+# Candidates scored on the UI thread per keystroke; larger candidate
+# sets are ranked in full on a worker thread
+SYNC_LIMIT = 2000
+
+RESULT_LIMIT = 50
+
+class Candidate:
+    """A file or heading the palette can jump to"""
+    
+    __slots__ = ('label', 'detail', 'path', 'line', 'level')
+    
+    def __init__(self, label, detail, path=None, line=0, level=0):
+        self.label = label
+        self.detail = detail
+        self.path = path
+        self.line = line
+        self.level = level
+
+
+def fuzzy_score(key, query):
+    """Return how well query matches key as a subsequence, or None
+
+    Both strings must be lowercase; spaces in query match anything.
+    Substrings score highest, then matches on word starts and runs of
+    consecutive characters.
+    """
+    position = key.find(query)
+    if position >= 0:
+        score = 100 - min(position, 20)
+        if position == 0 or key[position - 1] in SEPARATORS:
+            score += 30
+        end = position + len(query)
+        if end == len(key) or key[end] in SEPARATORS:
+            score += 10
+        return score
+    
+    score = 0
+    position = -1
+    for char in query:
+        if char == ' ':
+            continue
+        found = key.find(char, position + 1)
+        if found < 0:
+            return None
+        if found == 0 or key[found - 1] in SEPARATORS:
+            score += 8
+        elif found == position + 1:
+            score += 4
+        else:
+            score -= min(found - position - 1, 5)
+        position = found
+    return score
+
+
+class FuzzyIndex:
+    """Lowercased candidate keys with a character to candidates index
+
+    The index only tells which candidates contain all characters of a
+    query; fuzzy_score() then checks their order. The set intersections
+    run in C, so narrowing stays cheap for 100k candidates.
+    """
+    
+    def __init__(self, candidates, keys):
+        self.candidates = candidates
+        self.keys = keys
+        # Labels are matched separately so e.g. file names beat folder names
+        self.labels = [candidate.label.lower() for candidate in candidates]
+        self.all_ids = frozenset(range(len(candidates)))
+        # Shortest keys first; used to pick results without scoring everything
+        self.by_length = sorted(range(len(keys)), key=lambda i: len(keys[i]))
+        
+        # Building this takes about a second per 100k keys, so indexes are
+        # built on a worker thread
+        char_lists = defaultdict(list)
+        for i, key in enumerate(keys):
+            for char in set(key):
+                char_lists[char].append(i)
+        self.char_index = {char: set(ids) for char, ids in char_lists.items()}
+    
+    def __len__(self):
+        return len(self.candidates)
+    
+    def narrow(self, chars, ids=None):
+        """Return the ids in ids (default: all) whose keys contain every char"""
+        if ids is None:
+            ids = self.all_ids
+        for char in sorted(chars, key=lambda char: len(self.char_index.get(char, ()))):
+            ids = ids & self.char_index.get(char, frozenset())
+            if not ids:
+                break
+        return ids
+    
+    def score(self, i, query):
+        score = fuzzy_score(self.keys[i], query)
+        if self.labels[i] != self.keys[i]:
+            label_score = fuzzy_score(self.labels[i], query)
+            if label_score is not None:
+                score = label_score + 20 if score is None else max(score, label_score + 20)
+        return score
+    
+    def rank(self, ids, query, limit=RESULT_LIMIT, cancelled=None):
+        """Return the best (score, -length, id) tuples among ids"""
+        scored = []
+        for count, i in enumerate(ids):
+            if cancelled is not None and count % 1024 == 0 and cancelled():
+                return []
+            score = self.score(i, query)
+            if score is not None:
+                scored.append((score, -len(self.keys[i]), i))
+        return heapq.nlargest(limit, scored)
+    
+    def first_matches(self, ids, query, limit=RESULT_LIMIT, budget=SYNC_LIMIT):
+        """Return matches among ids, shortest keys first, scoring at most budget"""
+        matches = []
+        for i in self.by_length:
+            if i in ids:
+                score = self.score(i, query)
+                if score is not None:
+                    matches.append((score, -len(self.keys[i]), i))
+                    if len(matches) == limit:
+                        break
+                budget -= 1
+                if not budget:
+                    break
+        return matches
+
+
+def file_index(paths, root=None):
+    """Build a FuzzyIndex over file paths, keyed by their path below root"""
+    candidates = []
+    keys = []
+    for path in paths:
+        if root and path.startswith(root + os.sep):
+            detail = os.path.relpath(path, root)
+        else:
+            detail = path
+        candidates.append(Candidate(os.path.basename(path), detail, path=path))
+        keys.append(detail.replace(os.sep, '/').lower())
+    return FuzzyIndex(candidates, keys)
+
+
+def heading_index(markdown_text):
+    """Build a FuzzyIndex over the headings of a document"""
+    headings = extract_headings(markdown_text)
+    candidates = []
+    for node in range(1, len(headings) + 1):
+        text, level, line = headings.heading(node)
+        candidates.append(Candidate(text, f"H{level} · line {line}", line=line, level=level))
+    return FuzzyIndex(candidates, [text.lower() for text in headings.texts])
+
+
+class _PaletteSignals(QObject):
+    index_built = pyqtSignal(str, object, object)  # kind, key, FuzzyIndex
+    ranked = pyqtSignal(int, list)  # generation, [(score, -length, index, id)]
+
+
+class _BuildTask(QRunnable):
+    def __init__(self, kind, key, build, args, signals):
+        super().__init__()
+        self.kind = kind
+        self.key = key
+        self.build = build
+        self.args = args
+        self.signals = signals
+    
+    def run(self):
+        self.signals.index_built.emit(self.kind, self.key, self.build(*self.args))
+
+
+class _RankTask(QRunnable):
+    def __init__(self, generation, jobs, query, dialog):
+        super().__init__()
+        self.generation = generation
+        self.jobs = jobs  # [(index, ids)]
+        self.query = query
+        self.dialog = dialog
+        self.signals = dialog.signals
+    
+    def cancelled(self):
+        # Superseded by a later keystroke
+        return self.dialog.generation != self.generation
+    
+    def run(self):
+        results = []
+        for index, ids in self.jobs:
+            ranked = index.rank(ids, self.query, cancelled=self.cancelled)
+            results.extend((score, length, index, i) for score, length, i in ranked)
+        if not self.cancelled():
+            self.signals.ranked.emit(self.generation, merge_results(results))
+
+
+def merge_results(results, limit=RESULT_LIMIT):
+    return heapq.nlargest(limit, results, key=lambda result: result[:2])
+
+
+class QuickOpenDialog(QDialog):
+    """Fuzzy 'go to file / go to heading' palette"""
+    
+    # Signals emitted when a result is chosen
+    file_requested = pyqtSignal(str, int)
+    heading_requested = pyqtSignal(str, int, int)  # text, level, line
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.indexes = {'files': FuzzyIndex([], []), 'headings': FuzzyIndex([], [])}
+        self.index_keys = {'files': None, 'headings': None}
+        self.building = set()
+        
+        # (query, candidate ids) per index from the previous keystroke
+        self.last_ids = {}
+        
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.signals = _PaletteSignals()
+        self.signals.index_built.connect(self.on_index_built)
+        self.signals.ranked.connect(self.on_rank_finished)
+        
+        self.setup_ui()
+    
+    def setup_ui(self):
+        self.setWindowTitle("Go to File or Heading")
+        self.setMinimumWidth(500)
+        self.setMinimumHeight(350)
+        
+        layout = QVBoxLayout(self)
+        
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText(
+            f"Search files, or type {HEADING_PREFIX} to search headings of this document"
+        )
+        layout.addWidget(self.search_input)
+        
+        self.results = QListWidget()
+        layout.addWidget(self.results)
+        
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+        # Connect signals
+        self.search_input.textChanged.connect(self.update_results)
+        self.search_input.returnPressed.connect(self.accept_current)
+        self.results.itemActivated.connect(self.on_item_activated)
+    
+    def set_files(self, paths, root=None):
+        """Set the files to offer; the index is only rebuilt if they changed"""
+        paths = tuple(paths)
+        self.build_index('files', (paths, root), file_index, (paths, root))
+    
+    def set_document(self, markdown_text):
+        """Set the document whose headings are offered"""
+        self.build_index('headings', markdown_text, heading_index, (markdown_text,))
+    
+    def build_index(self, kind, key, build, args):
+        if key == self.index_keys[kind]:
+            return
+        self.index_keys[kind] = key
+        self.building.add(kind)
+        QThreadPool.globalInstance().start(_BuildTask(kind, key, build, args, self.signals))
+    
+    def on_index_built(self, kind, key, index):
+        # Ignore indexes that were superseded while being built
+        if key != self.index_keys[kind]:
+            return
+        
+        self.indexes[kind] = index
+        self.building.discard(kind)
+        self.last_ids.clear()
+        if self.isVisible():
+            self.update_results(self.search_input.text())
+    
+    def popup(self, text=""):
+        self.search_input.setText(text)
+        self.update_results(text)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.search_input.setFocus()
+    
+    def update_results(self, text):
+        self.generation += 1
+        
+        if text.startswith(HEADING_PREFIX):
+            indexes = [self.indexes['headings']]
+            text = text[len(HEADING_PREFIX):]
+        else:
+            indexes = [self.indexes['files'], self.indexes['headings']]
+        
+        query = ' '.join(text.lower().split())
+        if not query:
+            self.show_results([
+                (0, 0, index, i) for index in indexes for i in range(min(len(index), RESULT_LIMIT))
+            ][:RESULT_LIMIT])
+            return
+        
+        jobs = []
+        for index in indexes:
+            # A query extending the last one only needs to narrow its candidates
+            previous = self.last_ids.get(id(index))
+            if previous and query.startswith(previous[0]):
+                ids = index.narrow(set(query[len(previous[0]):]) - {' '}, previous[1])
+            else:
+                ids = index.narrow(set(query) - {' '})
+            self.last_ids[id(index)] = (query, ids)
+            jobs.append((index, ids))
+        
+        if sum(len(ids) for _, ids in jobs) <= SYNC_LIMIT:
+            results = []
+            for index, ids in jobs:
+                results.extend((score, length, index, i) for score, length, i in index.rank(ids, query))
+            self.show_results(merge_results(results))
+            return
+        
+        # Show the shortest matches at once and rank everything on a worker
+        results = []
+        for index, ids in jobs:
+            results.extend(
+                (score, length, index, i) for score, length, i in index.first_matches(ids, query)
+            )
+        self.show_results(merge_results(results), ranking=True)
+        self.pool.clear()
+        self.pool.start(_RankTask(self.generation, jobs, query, self))
+    
+    def on_rank_finished(self, generation, results):
+        # Drop results for queries that have since changed
+        if generation == self.generation:
+            self.show_results(results)
+    
+    def show_results(self, results, ranking=False):
+        self.results.clear()
+        for _, _, index, i in results:
+            candidate = index.candidates[i]
+            item = QListWidgetItem(f"{candidate.label}\n{candidate.detail}")
+            item.setData(Qt.ItemDataRole.UserRole, candidate)
+            self.results.addItem(item)
+        
+        if self.results.count():
+            self.results.setCurrentRow(0)
+        
+        if self.building:
+            self.status_label.setText("Indexing...")
+        elif ranking:
+            self.status_label.setText("Ranking...")
+        else:
+            self.status_label.setText(f"{self.results.count()} results" if results else "No results")
+    
+    def keyPressEvent(self, event):
+        # Move through the results while typing
+        key = event.key()
+        if key in (Qt.Key.Key_Down, Qt.Key.Key_Up, Qt.Key.Key_PageDown, Qt.Key.Key_PageUp):
+            row = self.results.currentRow()
+            step = {
+                Qt.Key.Key_Down: 1, Qt.Key.Key_Up: -1,
+                Qt.Key.Key_PageDown: 10, Qt.Key.Key_PageUp: -10,
+            }[key]
+            if self.results.count():
+                self.results.setCurrentRow(max(0, min(self.results.count() - 1, row + step)))
+            return
+        super().keyPressEvent(event)
+    
+    def accept_current(self):
+        item = self.results.currentItem()
+        if item is not None:
+            self.on_item_activated(item)
+    
+    def on_item_activated(self, item):
+        candidate = item.data(Qt.ItemDataRole.UserRole)
+        if candidate is None:
+            return
+        
+        self.hide()
+        if candidate.path:
+            self.file_requested.emit(candidate.path, candidate.line)
+        else:
+            self.heading_requested.emit(candidate.label, candidate.level, candidate.line)
\ No newline at end of file
@@ -0,0 +1,436 @@
+import re
+from html.parser import HTMLParser
+
+from PyQt6.QtCore import QCoreApplication, QEvent, QObject, QRunnable, QThreadPool, pyqtSignal
+
+# HTML past this size is converted on a worker thread behind a placeholder
+ASYNC_PASTE_CHARS = 32 * 1024
+
+# Plain text past this size is pasted with the preview held back until done
+LARGE_PASTE_CHARS = 256 * 1024
+
+# Fed to the parser a piece at a time, so the progress can be reported
+FEED_CHARS = 64 * 1024
+
+# Stands in for HTML being converted; the id finds it again afterwards
+PASTE_PLACEHOLDER = "<!-- Converting pasted HTML ({}) -->"
+
+# Markup worth converting; HTML with none of it, e.g. syntax-highlighted
+# code from an editor, is pasted as plain text
+RICH_HTML_REGEX = re.compile(
+    r'<(?:h[1-6]|p|a|b|strong|i|em|ul|ol|table|img|pre|blockquote)[\s>]', re.IGNORECASE
+)
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+# Dropped with everything inside them
+SKIPPED_ELEMENTS = {
+    'head', 'script', 'style', 'template', 'noscript', 'svg', 'math',
+    'iframe', 'object', 'canvas', 'select', 'button', 'textarea',
+}
+
+BLOCK_ELEMENTS = {
+    'p', 'div', 'section', 'article', 'main', 'header', 'footer', 'aside',
+    'nav', 'figure', 'figcaption', 'address', 'center', 'form', 'fieldset',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'dl', 'dt', 'dd',
+    'pre', 'blockquote', 'hr', 'table', 'html', 'body', 'details', 'summary',
+}
+
+# Opening one of these ends the open elements it names, as in HTML, but
+# not past the containers that follow
+IMPLIED_END = {
+    'p': ({'p'}, BLOCK_ELEMENTS - {'p'}),
+    'li': ({'li'}, {'ul', 'ol'}),
+    'dt': ({'dt', 'dd'}, {'dl'}),
+    'dd': ({'dt', 'dd'}, {'dl'}),
+    'tr': ({'tr', 'td', 'th'}, {'table', 'thead', 'tbody', 'tfoot'}),
+    'td': ({'td', 'th'}, {'tr', 'table'}),
+    'th': ({'td', 'th'}, {'tr', 'table'}),
+}
+
+WHITESPACE_REGEX = re.compile(r'[ \t\n\r\f\xa0]+')
+
+# Characters that would otherwise start Markdown syntax or HTML inside text
+ESCAPE_REGEX = re.compile(r'[\\`*\[\]]|(?<!\w)_|_(?!\w)|<(?=[a-zA-Z/!?])|&(?=#?\w+;)')
+
+# Written as entities: "\\[" would start display math, and "\\<" and "\\&"
+# are not escapes in Python-Markdown
+ENTITIES = {'[': '&#91;', '<': '&lt;', '&': '&amp;'}
+
+# Line starts that would turn a paragraph into a heading, quote or list
+LINE_START_REGEX = re.compile(r'^(?:([#>]|[-+*](?=\s))|(\d+)\.(?=\s))', re.MULTILINE)
+
+LANGUAGE_REGEX = re.compile(r'(?:lang|language)-([\w+#-]+)')
+
+
+class _Element:
+    __slots__ = ('tag', 'attrs', 'children')
+    
+    def __init__(self, tag, attrs):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+
+
+class _TreeBuilder(HTMLParser):
+    """Builds a forgiving element tree; unmatched end tags are ignored"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Element('root', {})
+        self.stack = [self.root]
+        self.skipping = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if self.skipping:
+            if tag in SKIPPED_ELEMENTS:
+                self.skipping += 1
+            return
+        if tag in SKIPPED_ELEMENTS:
+            self.skipping = 1
+            return
+        
+        if tag in IMPLIED_END:
+            closes, containers = IMPLIED_END[tag]
+            end = None
+            for depth in range(len(self.stack) - 1, 0, -1):
+                open_tag = self.stack[depth].tag
+                if open_tag in closes:
+                    end = depth
+                elif open_tag in containers:
+                    break
+            if end is not None:
+                del self.stack[end:]
+        
+        element = _Element(tag, dict(attrs))
+        self.stack[-1].children.append(element)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(element)
+    
+    def handle_startendtag(self, tag, attrs):
+        if tag in VOID_ELEMENTS or tag in SKIPPED_ELEMENTS:
+            self.handle_starttag(tag, attrs)
+            if tag in SKIPPED_ELEMENTS and self.skipping:
+                self.skipping -= 1
+        else:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+    
+    def handle_endtag(self, tag):
+        if self.skipping:
+            if tag in SKIPPED_ELEMENTS:
+                self.skipping -= 1
+            return
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.stack[depth].tag == tag:
+                del self.stack[depth:]
+                return
+    
+    def handle_data(self, data):
+        if not self.skipping:
+            self.stack[-1].children.append(data)
+
+
+def _text_content(node):
+    if isinstance(node, str):
+        return node
+    if node.tag == 'br':
+        return '\n'
+    return ''.join(_text_content(child) for child in node.children)
+
+
+def _escape(text):
+    return ESCAPE_REGEX.sub(
+        lambda match: ENTITIES.get(match.group(0)) or '\\' + match.group(0), text
+    )
+
+
+def _escape_line_start(match):
+    if match.group(1):
+        return '\\' + match.group(1)
+    return match.group(2) + '\\.'
+
+
+def _code_span(text):
+    longest = max((len(run) for run in re.findall(r'`+', text)), default=0)
+    fence = '`' * (longest + 1)
+    padding = ' ' if text.startswith('`') or text.endswith('`') else ''
+    return f"{fence}{padding}{text}{padding}{fence}"
+
+
+def _wrap(text, marker):
+    """Put emphasis markers around text, outside its surrounding spaces"""
+    stripped = text.strip()
+    if not stripped:
+        return text
+    start = text[:len(text) - len(text.lstrip())]
+    end = text[len(text.rstrip()):]
+    return f"{start}{marker}{stripped}{marker}{end}"
+
+
+def _is_word_list_item(element):
+    # Word marks list paragraphs with a class and draws the bullet itself
+    return 'MsoListParagraph' in element.attrs.get('class', '')
+
+
+class _MarkdownWriter:
+    """Turns an element tree into Markdown blocks"""
+    
+    def blocks(self, children):
+        """Return the Markdown blocks of a run of sibling nodes"""
+        blocks = []
+        inline = []
+        word_list = False
+        
+        def flush():
+            text = self.paragraph(''.join(inline))
+            if text:
+                blocks.append(text)
+            inline.clear()
+        
+        for child in children:
+            if isinstance(child, str) or child.tag not in BLOCK_ELEMENTS:
+                inline.append(self.inline(child))
+                continue
+            flush()
+            block = self.block(child)
+            if isinstance(block, list):
+                blocks.extend(block)
+            elif block:
+                if word_list and _is_word_list_item(child):
+                    # One list, not a paragraph per item
+                    blocks[-1] += '\n' + block
+                else:
+                    blocks.append(block)
+            word_list = bool(block) and not isinstance(block, list) and _is_word_list_item(child)
+        flush()
+        return blocks
+    
+    def paragraph(self, text):
+        lines = [re.sub(r' {2,}', ' ', line).strip() for line in text.split('\n')]
+        text = '\n'.join(line for line in lines if line)
+        return LINE_START_REGEX.sub(_escape_line_start, text)
+    
+    def block(self, element):
+        tag = element.tag
+        if tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            text = ' '.join(self.inline(element).split())
+            return f"{'#' * int(tag[1])} {text}" if text else ''
+        if tag == 'hr':
+            return '---'
+        if tag == 'pre':
+            return self.code_block(element)
+        if tag in ('ul', 'ol'):
+            return self.list(element)
+        if tag == 'li':
+            return self.list_item(element, '- ')
+        if tag == 'blockquote':
+            body = '\n\n'.join(self.blocks(element.children))
+            return '\n'.join(f"> {line}" if line else '>' for line in body.split('\n'))
+        if tag == 'table':
+            return self.table(element)
+        if tag == 'dt':
+            text = self.paragraph(self.inline(element))
+            return f"**{text}**" if text else ''
+        if tag == 'p' and _is_word_list_item(element):
+            return self.list_item(element, '- ')
+        return self.blocks(element.children)
+    
+    def inline(self, node):
+        if isinstance(node, str):
+            return _escape(WHITESPACE_REGEX.sub(' ', node))
+        
+        tag = node.tag
+        if tag == 'br':
+            return '\n'
+        if tag == 'img':
+            src = node.attrs.get('src') or ''
+            if not src or src.startswith('data:'):
+                return ''
+            alt = _escape(WHITESPACE_REGEX.sub(' ', node.attrs.get('alt') or '').strip())
+            return f"![{alt}]({src})"
+        if tag == 'input':
+            if node.attrs.get('type') == 'checkbox':
+                return '[x] ' if 'checked' in node.attrs else '[ ] '
+            return ''
+        if tag in ('code', 'kbd', 'samp', 'tt'):
+            text = WHITESPACE_REGEX.sub(' ', _text_content(node))
+            return _code_span(text) if text.strip() else text
+        if tag == 'span' and 'mso-list:ignore' in node.attrs.get('style', '').lower().replace(' ', ''):
+            return ''
+        
+        text = ''.join(self.inline(child) for child in node.children)
+        if tag in ('strong', 'b'):
+            return _wrap(text, '**')
+        if tag in ('em', 'i', 'cite', 'dfn'):
+            return _wrap(text, '*')
+        if tag in ('del', 's', 'strike'):
+            return _wrap(text, '~~')
+        if tag == 'a':
+            href = node.attrs.get('href')
+            if not href or href.startswith('javascript:') or not text.strip():
+                return text
+            target = href.replace(' ', '%20')
+            title = node.attrs.get('title')
+            if title:
+                target += ' "{}"'.format(title.replace('"', '&quot;'))
+            return f"[{text.strip()}]({target})"
+        if tag in BLOCK_ELEMENTS:
+            # A block inside an inline element, e.g. a link around a heading
+            return f"\n{text}\n"
+        return text
+    
+    def code_block(self, element):
+        text = _text_content(element).strip('\n')
+        classes = element.attrs.get('class', '')
+        for child in element.children:
+            if not isinstance(child, str) and child.tag == 'code':
+                classes += ' ' + child.attrs.get('class', '')
+        match = LANGUAGE_REGEX.search(classes)
+        longest = max((len(run) for run in re.findall(r'^`{3,}', text, re.MULTILINE)), default=2)
+        fence = '`' * (longest + 1)
+        return f"{fence}{match.group(1) if match else ''}\n{text}\n{fence}"
+    
+    def list(self, element):
+        items = [
+            child for child in element.children
+            if not isinstance(child, str) and child.tag == 'li'
+        ]
+        try:
+            number = int(element.attrs.get('start', 1))
+        except ValueError:
+            number = 1
+        
+        bodies = []
+        for item in items:
+            marker = f"{number}. " if element.tag == 'ol' else '- '
+            number += 1
+            body = self.list_item(item, marker)
+            if body:
+                bodies.append(body)
+        
+        # Items with paragraphs of their own make a loose list
+        loose = any('\n\n' in body for body in bodies)
+        return ('\n\n' if loose else '\n').join(bodies)
+    
+    def list_item(self, element, marker):
+        # Text followed by a nested list stays tight; paragraphs do not
+        paragraphs = any(
+            not isinstance(child, str) and child.tag in ('p', 'pre', 'blockquote', 'table')
+            for child in element.children
+        )
+        body = ('\n\n' if paragraphs else '\n').join(self.blocks(element.children))
+        if not body:
+            return ''
+        # Python-Markdown wants nested content indented by four spaces
+        indent = ' ' * 4
+        lines = body.split('\n')
+        return '\n'.join(
+            [marker + lines[0]] + [indent + line if line else '' for line in lines[1:]]
+        )
+    
+    def table(self, element):
+        rows = []
+        pending = [element]
+        while pending:
+            node = pending.pop(0)
+            for child in node.children:
+                if isinstance(child, str):
+                    continue
+                if child.tag == 'tr':
+                    rows.append([
+                        ' '.join(self.inline(cell).split()).replace('|', '\\|')
+                        for cell in child.children
+                        if not isinstance(cell, str) and cell.tag in ('td', 'th')
+                    ])
+                elif child.tag in ('thead', 'tbody', 'tfoot'):
+                    pending.append(child)
+        rows = [row for row in rows if row]
+        if not rows:
+            return ''
+        
+        # Markdown tables need a header; the first row serves as one
+        width = max(len(row) for row in rows)
+        rows = [row + [''] * (width - len(row)) for row in rows]
+        lines = [
+            '| ' + ' | '.join(rows[0]) + ' |',
+            '| ' + ' | '.join('---' for _ in range(width)) + ' |',
+        ]
+        lines.extend('| ' + ' | '.join(row) + ' |' for row in rows[1:])
+        return '\n'.join(lines)
+
+
+def html_to_markdown(html, progress=None):
+    """Convert an HTML fragment, e.g. from the clipboard, to Markdown
+
+    Headings, paragraphs, emphasis, links, images, code, lists, quotes and
+    tables are kept; styling, scripts and unknown elements are reduced to
+    their text. progress(percent) is called as the HTML is parsed.
+    """
+    builder = _TreeBuilder()
+    total = len(html) or 1
+    for start in range(0, len(html), FEED_CHARS):
+        builder.feed(html[start:start + FEED_CHARS])
+        if progress is not None:
+            # Parsing is most of the work; writing the Markdown is the rest
+            progress(min(90, (start + FEED_CHARS) * 90 // total))
+    builder.close()
+    
+    blocks = _MarkdownWriter().blocks(builder.root.children)
+    if progress is not None:
+        progress(100)
+    return '\n\n'.join(blocks)
+
+
+class _PasteSignals(QObject):
+    progress = pyqtSignal(int, int)  # paste id, percent
+    finished = pyqtSignal(int, object)  # paste id, Markdown or None
+
+
+class _PasteTask(QRunnable):
+    def __init__(self, paste_id, html, signals):
+        super().__init__()
+        self.paste_id = paste_id
+        self.html = html
+        self.signals = signals
+    
+    def report(self, percent):
+        self.signals.progress.emit(self.paste_id, percent)
+    
+    def run(self):
+        try:
+            markdown = html_to_markdown(self.html, self.report)
+        except RecursionError:
+            # Nested too deeply to convert; the plain text is pasted instead
+            markdown = None
+        self.html = None
+        self.signals.finished.emit(self.paste_id, markdown)
+
+
+class HTMLPasteConverter(QObject):
+    """Converts pasted HTML to Markdown on a background thread, in order"""
+    
+    # Emitted on the GUI thread
+    progress = pyqtSignal(int, int)  # paste id, percent
+    finished = pyqtSignal(int, object)  # paste id, Markdown or None
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        
+        self.signals = _PasteSignals()
+        self.signals.progress.connect(self.progress)
+        self.signals.finished.connect(self.finished)
+    
+    def convert(self, paste_id, html):
+        self.pool.start(_PasteTask(paste_id, html, self.signals))
+    
+    def flush(self):
+        """Block until every queued conversion is done and emit the results now"""
+        self.pool.waitForDone()
+        # finished reaches this thread as queued calls; deliver only those
+        QCoreApplication.sendPostedEvents(self, QEvent.Type.MetaCall)
\ No newline at end of file
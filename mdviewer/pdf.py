@@ -0,0 +1,543 @@
+import re
+
+# Between tokens: whitespace and comments
+SPACE_REGEX = re.compile(rb'(?:[\x00\t\n\x0c\r ]|%[^\r\n]*)*')
+
+# A run of regular characters: a number, keyword or the body of a name
+TOKEN_REGEX = re.compile(rb'[^\x00\t\n\x0c\r ()<>\[\]{}/%]+')
+
+REF_REGEX = re.compile(rb'(\d+)\s+(\d+)\s+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])')
+OBJ_REGEX = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+XREF_SECTION_REGEX = re.compile(rb'(\d+)\s+(\d+)')
+XREF_ENTRY_REGEX = re.compile(rb'(\d{10})\s(\d{5})\s([nf])')
+INTEGER_REGEX = re.compile(rb'[+-]?\d+')
+
+# Page attributes a page may inherit from its ancestors in the page tree
+INHERITED_KEYS = (b'Resources', b'MediaBox', b'CropBox', b'Rotate')
+
+class PdfError(Exception):
+    """Raised for PDF files this module cannot read"""
+
+
+class Name(bytes):
+    """A PDF name, without the leading slash"""
+
+
+class Raw(bytes):
+    """A token that is written back unchanged: a string, real, boolean or null"""
+
+
+class Ref:
+    """An indirect reference to an object of the file being read"""
+    
+    __slots__ = ('num', 'gen')
+    
+    def __init__(self, num, gen=0):
+        self.num = num
+        self.gen = gen
+    
+    def __eq__(self, other):
+        return isinstance(other, Ref) and (self.num, self.gen) == (other.num, other.gen)
+    
+    def __hash__(self):
+        return hash((self.num, self.gen))
+
+
+class OutputRef(Ref):
+    """A reference to an object of the file being written, never renumbered"""
+
+
+class Stream:
+    __slots__ = ('dict', 'data')
+    
+    def __init__(self, dictionary, data):
+        self.dict = dictionary
+        self.data = data
+
+
+def parse_value(data, position):
+    """Parse one object at position and return it with the position after it"""
+    position = SPACE_REGEX.match(data, position).end()
+    char = data[position:position + 1]
+    
+    if char == b'/':
+        match = TOKEN_REGEX.match(data, position + 1)
+        end = match.end() if match else position + 1
+        return Name(data[position + 1:end]), end
+    
+    if data.startswith(b'<<', position):
+        result = {}
+        position += 2
+        while True:
+            position = SPACE_REGEX.match(data, position).end()
+            if data.startswith(b'>>', position):
+                return result, position + 2
+            key, position = parse_value(data, position)
+            if not isinstance(key, Name):
+                raise PdfError(f"Dictionary key expected at offset {position}")
+            result[key], position = parse_value(data, position)
+    
+    if char == b'[':
+        items = []
+        position += 1
+        while True:
+            position = SPACE_REGEX.match(data, position).end()
+            if data.startswith(b']', position):
+                return items, position + 1
+            item, position = parse_value(data, position)
+            items.append(item)
+    
+    if char == b'(':
+        # Literal string: balanced parentheses, backslash escapes
+        depth = 0
+        index = position
+        try:
+            while True:
+                byte = data[index]
+                if byte == 0x5C:
+                    index += 2
+                    continue
+                if byte == 0x28:
+                    depth += 1
+                elif byte == 0x29:
+                    depth -= 1
+                    if depth == 0:
+                        return Raw(data[position:index + 1]), index + 1
+                index += 1
+        except IndexError:
+            raise PdfError("Unterminated string") from None
+    
+    if char == b'<':
+        end = data.find(b'>', position)
+        if end < 0:
+            raise PdfError("Unterminated hex string")
+        return Raw(data[position:end + 1]), end + 1
+    
+    match = REF_REGEX.match(data, position)
+    if match:
+        return Ref(int(match.group(1)), int(match.group(2))), match.end()
+    
+    match = TOKEN_REGEX.match(data, position)
+    if not match:
+        raise PdfError(f"Unexpected data at offset {position}")
+    token = match.group()
+    if INTEGER_REGEX.fullmatch(token):
+        return int(token), match.end()
+    return Raw(token), match.end()
+
+
+def serialize(value, renumber):
+    """Return the PDF syntax of a value, mapping references through renumber"""
+    if isinstance(value, Name):
+        return b'/' + value
+    if isinstance(value, Raw):
+        return bytes(value)
+    if isinstance(value, bool):
+        return b'true' if value else b'false'
+    if isinstance(value, int):
+        return b'%d' % value
+    if isinstance(value, float):
+        return (b'%.4f' % value).rstrip(b'0').rstrip(b'.')
+    if isinstance(value, OutputRef):
+        return b'%d 0 R' % value.num
+    if isinstance(value, Ref):
+        return b'%d 0 R' % renumber(value)
+    if isinstance(value, dict):
+        return b'<<' + b''.join(
+            b'/' + key + b' ' + serialize(item, renumber) for key, item in value.items()
+        ) + b'>>'
+    if isinstance(value, list):
+        return b'[' + b' '.join(serialize(item, renumber) for item in value) + b']'
+    if value is None:
+        return b'null'
+    raise TypeError(f"Cannot write {type(value).__name__} to a PDF")
+
+
+def text_string(text):
+    """Return a PDF text string (UTF-16 with byte order mark) for text"""
+    return Raw(b'<FEFF' + text.encode('utf-16-be').hex().upper().encode('ascii') + b'>')
+
+
+def decode_name(name):
+    """Return a PDF name with its #xx escapes resolved, as text"""
+    return re.sub(
+        rb'#([0-9A-Fa-f]{2})', lambda match: bytes([int(match.group(1), 16)]), name
+    ).decode('utf-8', 'replace')
+
+
+def decode_string(raw):
+    """Return the text of a literal or hex string token"""
+    if raw.startswith(b'<'):
+        data = bytes.fromhex(raw[1:-1].decode('ascii'))
+    else:
+        escapes = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+        data = re.sub(
+            rb'\\([0-7]{1,3}|.)',
+            lambda match: (bytes([int(match.group(1), 8) & 0xFF])
+                           if match.group(1)[:1].isdigit()
+                           else escapes.get(match.group(1), match.group(1))),
+            raw[1:-1], flags=re.DOTALL
+        )
+    if data.startswith(b'\xfe\xff'):
+        return data[2:].decode('utf-16-be', 'replace')
+    return data.decode('latin-1')
+
+
+class PdfReader:
+    """Random access to the objects of a PDF file
+
+    Only files with classic cross-reference tables are supported, which is
+    what Chromium and Qt write. Objects are parsed on first access.
+    """
+    
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as file:
+            self.data = file.read()
+        self.offsets = {}  # object number -> file offset
+        self.cache = {}
+        
+        try:
+            self.trailer = self._read_xref()
+        except (PdfError, ValueError, IndexError):
+            # Damaged or unusual cross-reference data, find the objects instead
+            self.trailer = self._scan_objects()
+    
+    def _read_xref(self):
+        data = self.data
+        start = data.rfind(b'startxref')
+        if start < 0:
+            raise PdfError("No cross-reference table")
+        position = int(data[start + 9:start + 40].split()[0])
+        
+        trailer = None
+        seen = set()
+        while position is not None and position not in seen:
+            seen.add(position)
+            position = SPACE_REGEX.match(data, position).end()
+            if not data.startswith(b'xref', position):
+                raise PdfError("Cross-reference streams are not supported")
+            position += 4
+            
+            while True:
+                position = SPACE_REGEX.match(data, position).end()
+                if data.startswith(b'trailer', position):
+                    break
+                match = XREF_SECTION_REGEX.match(data, position)
+                if not match:
+                    raise PdfError("Malformed cross-reference table")
+                first, count = int(match.group(1)), int(match.group(2))
+                position = match.end()
+                for number in range(first, first + count):
+                    position = SPACE_REGEX.match(data, position).end()
+                    entry = XREF_ENTRY_REGEX.match(data, position)
+                    if not entry:
+                        raise PdfError("Malformed cross-reference entry")
+                    position = entry.end()
+                    # Sections read later are older revisions
+                    if entry.group(3) == b'n' and number not in self.offsets:
+                        self.offsets[number] = int(entry.group(1))
+            
+            section_trailer, _ = parse_value(data, position + 7)
+            if trailer is None:
+                trailer = section_trailer
+            previous = section_trailer.get(b'Prev')
+            position = previous if isinstance(previous, int) else None
+        
+        return trailer
+    
+    def _scan_objects(self):
+        self.offsets.clear()
+        for match in re.finditer(rb'(?<![0-9])(\d+)\s+\d+\s+obj\b', self.data):
+            self.offsets[int(match.group(1))] = match.start()
+        
+        start = self.data.rfind(b'trailer')
+        if start < 0:
+            raise PdfError("No trailer found")
+        trailer, _ = parse_value(self.data, start + 7)
+        return trailer
+    
+    def object(self, ref):
+        """Return the object a reference (or object number) points to, or None"""
+        number = ref.num if isinstance(ref, Ref) else ref
+        if number in self.cache:
+            return self.cache[number]
+        offset = self.offsets.get(number)
+        if offset is None:
+            return None
+        
+        data = self.data
+        match = OBJ_REGEX.match(data, offset)
+        if not match:
+            raise PdfError(f"Object {number} not found at offset {offset}")
+        value, position = parse_value(data, match.end())
+        
+        position = SPACE_REGEX.match(data, position).end()
+        if isinstance(value, dict) and data.startswith(b'stream', position):
+            position += 6
+            if data.startswith(b'\r\n', position):
+                position += 2
+            elif data[position:position + 1] in (b'\n', b'\r'):
+                position += 1
+            
+            length = self.resolve(value.get(b'Length'))
+            end = position + length if isinstance(length, int) else -1
+            if end < 0 or not data[end:end + 20].lstrip().startswith(b'endstream'):
+                # Missing or wrong length, trust the end marker instead
+                end = data.find(b'endstream', position)
+                if end < 0:
+                    raise PdfError(f"Unterminated stream in object {number}")
+                if data[end - 1:end] == b'\n':
+                    end -= 2 if data[end - 2:end] == b'\r\n' else 1
+                elif data[end - 1:end] == b'\r':
+                    end -= 1
+            value = Stream(value, data[position:end])
+        
+        self.cache[number] = value
+        return value
+    
+    def resolve(self, value):
+        return self.object(value) if isinstance(value, Ref) else value
+    
+    def catalog(self):
+        catalog = self.resolve(self.trailer.get(b'Root'))
+        if not isinstance(catalog, dict):
+            raise PdfError("Document catalog not found")
+        return catalog
+    
+    def pages(self):
+        """Return (reference, page dictionary) of every page, in order
+
+        Attributes inherited from the page tree are copied into the returned
+        dictionaries, so each page can be written on its own.
+        """
+        pages = []
+        seen = set()
+        stack = [(self.catalog().get(b'Pages'), {})]
+        while stack:
+            ref, inherited = stack.pop()
+            node = self.resolve(ref)
+            if not isinstance(node, dict) or (isinstance(ref, Ref) and ref in seen):
+                continue
+            if isinstance(ref, Ref):
+                seen.add(ref)
+            
+            if node.get(b'Type') == b'Pages' or b'Kids' in node:
+                inherited = dict(inherited)
+                for key in INHERITED_KEYS:
+                    if key in node:
+                        inherited[key] = node[key]
+                kids = self.resolve(node.get(b'Kids')) or []
+                stack.extend((kid, inherited) for kid in reversed(kids))
+            else:
+                page = dict(inherited)
+                page.update(node)
+                pages.append((ref, page))
+        return pages
+    
+    def named_destinations(self):
+        """Return {name: destination array} for the document's named destinations"""
+        catalog = self.catalog()
+        destinations = {}
+        
+        dests = self.resolve(catalog.get(b'Dests'))
+        if isinstance(dests, dict):
+            for name, dest in dests.items():
+                destinations[decode_name(name)] = dest
+        
+        names = self.resolve(catalog.get(b'Names'))
+        tree = self.resolve(names.get(b'Dests')) if isinstance(names, dict) else None
+        stack = [tree] if isinstance(tree, dict) else []
+        while stack:
+            node = stack.pop()
+            for kid in self.resolve(node.get(b'Kids')) or []:
+                kid = self.resolve(kid)
+                if isinstance(kid, dict):
+                    stack.append(kid)
+            pairs = self.resolve(node.get(b'Names')) or []
+            for key, dest in zip(pairs[::2], pairs[1::2]):
+                if isinstance(key, Raw):
+                    destinations.setdefault(decode_string(key), dest)
+        
+        # Destinations may be wrapped in a dictionary, and may be indirect
+        for name, dest in list(destinations.items()):
+            dest = self.resolve(dest)
+            if isinstance(dest, dict):
+                dest = self.resolve(dest.get(b'D'))
+            if isinstance(dest, list) and dest and isinstance(dest[0], Ref):
+                destinations[name] = dest
+            else:
+                del destinations[name]
+        return destinations
+
+
+class PdfWriter:
+    """Streams the pages of several PDF files into a single file
+
+    Each appended document is copied object by object straight to the output,
+    so only one input file is held in memory at a time. The page tree,
+    named destinations and outline are written by close().
+    """
+    
+    CATALOG = 1
+    PAGES = 2
+    
+    def __init__(self, file_path):
+        self.file = open(file_path, 'wb')
+        self.file.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        self.offsets = [None, None, None]  # object number -> offset, 0 unused
+        self.pages = []  # object numbers of the output pages
+        self.destinations = {}  # name -> destination array
+    
+    def reserve(self):
+        """Return a new object number to write later"""
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+    
+    def write_object(self, number, value, renumber=None):
+        self.offsets[number] = self.file.tell()
+        self.file.write(b'%d 0 obj\n' % number)
+        if isinstance(value, Stream):
+            dictionary = dict(value.dict)
+            dictionary[b'Length'] = len(value.data)
+            self.file.write(serialize(dictionary, renumber))
+            self.file.write(b'\nstream\n')
+            self.file.write(value.data)
+            self.file.write(b'\nendstream')
+        else:
+            self.file.write(serialize(value, renumber))
+        self.file.write(b'\nendobj\n')
+    
+    def append(self, reader):
+        """Copy all pages of a PdfReader to the output
+
+        Returns the index of its first page in the output and its named
+        destinations, pointing at the output pages. They are also written to
+        the output unless an earlier document already used the name.
+        """
+        numbers = {}  # object number in reader -> object number in output
+        pending = []
+        
+        def renumber(ref):
+            if ref.num not in numbers:
+                numbers[ref.num] = self.reserve()
+                pending.append(ref.num)
+            return numbers[ref.num]
+        
+        first_page = len(self.pages)
+        pages = {}
+        for ref, page in reader.pages():
+            if not isinstance(ref, Ref):
+                continue
+            pages[ref.num] = page
+            self.pages.append(renumber(ref))
+        
+        while pending:
+            number = pending.pop()
+            if number in pages:
+                value = pages[number]
+                value[b'Parent'] = OutputRef(self.PAGES)
+            else:
+                value = reader.object(number)
+                if value is None:
+                    value = Raw(b'null')
+            self.write_object(numbers[number], value, renumber)
+        
+        destinations = {}
+        for name, dest in reader.named_destinations().items():
+            if dest[0].num in pages:
+                destinations[name] = [OutputRef(numbers[dest[0].num])] + [
+                    item for item in dest[1:] if not isinstance(item, (Ref, dict, list))
+                ]
+                self.destinations.setdefault(name, destinations[name])
+        
+        return first_page, destinations
+    
+    def destination(self, page_index):
+        """Return a destination array for the top of an output page"""
+        return [OutputRef(self.pages[page_index]), Name(b'XYZ'), None, None, None]
+    
+    def write_outline(self, items):
+        """Write an outline from (title, level, destination) items in document order
+
+        Returns the object number of the outline dictionary.
+        """
+        root = {'number': self.reserve(), 'children': [], 'level': 0}
+        stack = [root]
+        for title, level, dest in items:
+            while stack[-1]['level'] >= level:
+                stack.pop()
+            node = {
+                'number': self.reserve(), 'children': [], 'level': level,
+                'title': title, 'dest': dest, 'parent': stack[-1],
+            }
+            stack[-1]['children'].append(node)
+            stack.append(node)
+        
+        nodes = [root]
+        order = []
+        while nodes:
+            node = nodes.pop()
+            order.append(node)
+            nodes.extend(node['children'])
+        
+        for node in reversed(order):
+            children = node['children']
+            value = {b'Type': Name(b'Outlines')} if node is root else {
+                b'Title': text_string(node['title']),
+                b'Parent': OutputRef(node['parent']['number']),
+                b'Dest': node['dest'],
+            }
+            if children:
+                value[b'First'] = OutputRef(children[0]['number'])
+                value[b'Last'] = OutputRef(children[-1]['number'])
+                # Entries start collapsed: only the top level is visible
+                value[b'Count'] = len(children) if node is root else -len(children)
+            if node is not root:
+                siblings = node['parent']['children']
+                index = siblings.index(node)
+                if index > 0:
+                    value[b'Prev'] = OutputRef(siblings[index - 1]['number'])
+                if index + 1 < len(siblings):
+                    value[b'Next'] = OutputRef(siblings[index + 1]['number'])
+            self.write_object(node['number'], value)
+        
+        return root['number']
+    
+    def close(self, outline=None):
+        """Write the page tree, destinations and optional outline, and close the file"""
+        self.write_object(self.PAGES, {
+            b'Type': Name(b'Pages'),
+            b'Kids': [OutputRef(number) for number in self.pages],
+            b'Count': len(self.pages),
+        })
+        
+        catalog = {b'Type': Name(b'Catalog'), b'Pages': OutputRef(self.PAGES)}
+        if self.destinations:
+            dests = self.reserve()
+            self.write_object(dests, {
+                Name(re.sub(r'[^A-Za-z0-9_.:-]',
+                            lambda match: ''.join(f'#{byte:02X}' for byte in match.group().encode('utf-8')),
+                            name).encode('ascii')): dest
+                for name, dest in self.destinations.items()
+            })
+            catalog[b'Dests'] = OutputRef(dests)
+        if outline:
+            catalog[b'Outlines'] = OutputRef(self.write_outline(outline))
+            catalog[b'PageMode'] = Name(b'UseOutlines')
+        self.write_object(self.CATALOG, catalog)
+        
+        xref = self.file.tell()
+        self.file.write(b'xref\n0 %d\n' % len(self.offsets))
+        self.file.write(b'0000000000 65535 f\r\n')
+        for offset in self.offsets[1:]:
+            if offset is None:
+                self.file.write(b'0000000000 65535 f\r\n')
+            else:
+                self.file.write(b'%010d 00000 n\r\n' % offset)
+        self.file.write(b'trailer\n')
+        self.file.write(serialize({b'Size': len(self.offsets), b'Root': OutputRef(self.CATALOG)}, None))
+        self.file.write(b'\nstartxref\n%d\n%%%%EOF\n' % xref)
+        self.file.close()
+    
+    def abort(self):
+        self.file.close()
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import time
+from collections import deque, defaultdict
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QLabel
+
+# Stages shown in the HUD, in pipeline order
+HUD_STAGES = (
+    ("highlight", "hl"),
+    ("toPlainText", "text"),
+    ("markdown", "md"),
+    ("setHtml", "html"),
+    ("outline", "outline"),
+    ("load", "load"),
+    ("frame", "total"),
+)
+
+class _NullSpan:
+    """Context manager used while tracing is disabled"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'start')
+    
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.tracer.add(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Tracer:
+    """Collects monotonic timestamps of pipeline stages in a ring buffer
+
+    A frame starts with a keystroke and ends when the preview has loaded
+    the resulting page. Callers check `enabled` (or use span(), which
+    returns a shared no-op object) so disabled tracing costs next to nothing.
+    """
+    
+    def __init__(self, capacity=20000, samples=1000):
+        self.enabled = False
+        self.events = deque(maxlen=capacity)  # (name, start ns, end ns, frame)
+        self.durations = defaultdict(lambda: deque(maxlen=samples))
+        self.frame = 0
+        self.frame_start = None
+        self.pending = {}  # async stage name -> start ns
+    
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_start = None
+        self.pending.clear()
+    
+    def clear(self):
+        self.events.clear()
+        self.durations.clear()
+    
+    def begin_frame(self):
+        """Mark the start of a keystroke-to-paint frame"""
+        if not self.enabled:
+            return
+        self.frame += 1
+        self.frame_start = time.perf_counter_ns()
+    
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        self.add("frame", self.frame_start, time.perf_counter_ns())
+        self.frame_start = None
+    
+    def span(self, name):
+        """Return a context manager timing the enclosed block"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+    
+    def begin_async(self, name):
+        """Start a stage that finishes in a later event, e.g. a page load"""
+        if self.enabled:
+            self.pending[name] = time.perf_counter_ns()
+    
+    def end_async(self, name):
+        start = self.pending.pop(name, None)
+        if start is not None:
+            self.add(name, start, time.perf_counter_ns())
+    
+    def add(self, name, start, end):
+        self.events.append((name, start, end, self.frame))
+        self.durations[name].append(end - start)
+    
+    def percentiles(self, name):
+        """Return (p50, p99) in milliseconds, or None without samples"""
+        samples = sorted(self.durations.get(name, ()))
+        if not samples:
+            return None
+        p50 = samples[len(samples) // 2]
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        return p50 / 1e6, p99 / 1e6
+    
+    def chrome_trace(self):
+        """Return the buffered events in Chrome trace event format"""
+        events = [
+            {
+                'name': name,
+                'cat': 'mdviewer',
+                'ph': 'X',
+                'ts': start / 1000,
+                'dur': (end - start) / 1000,
+                'pid': 1,
+                'tid': 1,
+                'args': {'frame': frame},
+            }
+            for name, start, end, frame in self.events
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+    
+    def save_chrome_trace(self, file_path):
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+# Shared by the editor, preview and main window
+tracer = Tracer()
+
+
+class PerformanceHUD(QLabel):
+    """Status bar label with p50/p99 timings of each pipeline stage"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(500)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+    
+    def set_active(self, active):
+        tracer.set_enabled(active)
+        if active:
+            self.setText("Waiting for edits...")
+            self.show()
+            self.timer.start()
+        else:
+            self.timer.stop()
+            self.hide()
+    
+    def refresh(self):
+        parts = []
+        for name, label in HUD_STAGES:
+            values = tracer.percentiles(name)
+            if values:
+                parts.append(f"{label} {values[0]:.1f}/{values[1]:.1f}")
+        if parts:
+            self.setText("p50/p99 ms: " + "  ".join(parts))
\ No newline at end of file
@@ -0,0 +1,320 @@
+import re
+import time
+from collections import deque, defaultdict, namedtuple
+
+import markdown
+from markdown.extensions.codehilite import CodeHiliteExtension
+from markdown.extensions.fenced_code import FencedCodeExtension
+from markdown.extensions.tables import TableExtension
+
+from mdviewer.formulas import PrerenderedMathExtension
+from mdviewer.includes import IncludeExtension, expand_includes
+from mdviewer.perf import tracer
+from mdviewer.sourcemap import SourceMap, SourceMapExtension
+from mdviewer.tables import FastTableExtension
+
+# Time spent in processors that come with Markdown itself, e.g. the block
+# parser and the inline patterns of every extension
+CORE = "core"
+
+ExtensionInfo = namedtuple('ExtensionInfo', 'name label factory detect replaces')
+
+# Registered extensions, in the order they are loaded
+EXTENSIONS = {}
+
+def extension(name, label, detect=None, replaces=None):
+    """Register an extension; the function returns it for a render context
+
+    The context has `base_dir`, the directory of the document, `path`, its
+    file, `preview`, which is true when rendering for the live preview, and
+    `highlight`,
+    which is true when syntax highlighting is enabled. The function may
+    return a list of extensions.
+
+    With a `detect` regex the extension is only loaded for documents that
+    match it, and then takes the place of the extension named `replaces`.
+    The regex sees the document after a newline. Patterns that start with
+    a literal keep the scan fast, since the search can skip ahead to it.
+    """
+    def register(factory):
+        EXTENSIONS[name] = ExtensionInfo(
+            name, label, factory, detect and re.compile(detect), replaces
+        )
+        return factory
+    return register
+
+
+@extension("includes", "Include Directive")
+def _includes(base_dir=None, path=None, **context):
+    return IncludeExtension(base_dir=base_dir or '', path=path or '')
+
+
+@extension("fenced_code", "Fenced Code Blocks")
+def _fenced_code(**context):
+    return FencedCodeExtension()
+
+
+# Fences inside list items and block quotes, which FencedCodeExtension misses
+@extension("superfences", "Nested Code Fences",
+           detect=r'\n[ \t>]+(?:`{3,}|~{3,})', replaces="fenced_code")
+def _superfences(highlight=True, **context):
+    # pymdownx is imported on first use, so plain documents never load it
+    from pymdownx.highlight import HighlightExtension
+    from pymdownx.superfences import SuperFencesCodeExtension
+    return [
+        HighlightExtension(use_pygments=highlight, css_class='highlight'),
+        SuperFencesCodeExtension(),
+    ]
+
+
+@extension("codehilite", "Syntax Highlighting")
+def _codehilite(**context):
+    return CodeHiliteExtension(linenums=False, css_class='highlight')
+
+
+@extension("tables", "Tables")
+def _tables(**context):
+    return TableExtension()
+
+
+@extension("fast_tables", "Large Tables")
+def _fast_tables(preview=False, **context):
+    # Only the preview can run the script that draws virtualized tables;
+    # exports keep every table as static markup
+    return FastTableExtension() if preview else []
+
+
+@extension("math", "Math")
+def _math(**context):
+    return PrerenderedMathExtension()
+
+
+@extension("tasklist", "Task Lists", detect=r'\[[ xX]\](?<=[-*+.)][ \t]\[[ xX]\])')
+def _tasklist(**context):
+    from pymdownx.tasklist import TasklistExtension
+    return TasklistExtension()
+
+
+@extension("strikethrough", "Strikethrough", detect=r'~~')
+def _strikethrough(**context):
+    from pymdownx.tilde import DeleteSubExtension
+    # GitHub has no ~subscript~
+    return DeleteSubExtension(subscript=False)
+
+
+# Bare URLs and email addresses. A URL starts after anything but a letter or
+# digit, as in magiclink, leaving out the `](` of links and `<` of autolinks
+_URL_START = r'(?<=(?:[^\w<(]|_|(?<!\])\(){})'
+
+AUTOLINK_DETECT = (
+    r'//(?i:' + '|'.join(
+        _URL_START.format(scheme) for scheme in ('ftp://', 'ftps://', 'http://', 'https://')
+    ) + ')'
+    # Literal www so the search skips ahead to a w; other cases than these are
+    # rare enough to leave out
+    r'|www\.(?<=[\W_]www\.)|Www\.(?<=[\W_]Www\.)|WWW\.(?<=[\W_]WWW\.)'
+    r'|@(?<=[-+\w]@)[-\w]+\.'
+)
+
+@extension("autolinks", "Autolinks", detect=AUTOLINK_DETECT)
+def _autolinks(**context):
+    from pymdownx.magiclink import MagiclinkExtension
+    return MagiclinkExtension()
+
+
+@extension("emoji", "Emoji", detect=r':(?<![\w:]:)[a-z0-9_+-]+:')
+def _emoji(**context):
+    from pymdownx.emoji import EmojiExtension, gemoji, to_alt
+    # GitHub's shortcodes as Unicode characters, so no images are fetched
+    return EmojiExtension(emoji_index=gemoji, emoji_generator=to_alt)
+
+
+@extension("source_map", "Click to Source")
+def _source_map(preview=False, **context):
+    # Block ids only mean something to the preview page
+    return SourceMapExtension() if preview else []
+
+
+@extension("nl2br", "Newlines as Line Breaks")
+def _nl2br(**context):
+    return 'nl2br'
+
+
+@extension("sane_lists", "Sane Lists")
+def _sane_lists(**context):
+    return 'sane_lists'
+
+
+@extension("toc", "Heading Anchors")
+def _toc(**context):
+    return 'toc'
+
+
+# Named sets of extensions; the preview uses one chosen in the View menu,
+# exports always use "full"
+PROFILES = {
+    "full": ("Full", tuple(EXTENSIONS)),
+    "fast_preview": (
+        "Fast Preview",
+        tuple(name for name in EXTENSIONS if name not in ("codehilite", "toc")),
+    ),
+}
+
+EXPORT_PROFILE = "full"
+
+
+def profile_extensions(profile):
+    return PROFILES[profile][1]
+
+
+def matching_profile(names):
+    """Return the profile with exactly these extensions, or None"""
+    for profile, (_, profile_names) in PROFILES.items():
+        if set(profile_names) == set(names):
+            return profile
+    return None
+
+
+class ExtensionTimings:
+    """Time spent in each extension's processors, per conversion"""
+    
+    def __init__(self, samples=200):
+        self.current = defaultdict(int)
+        self.last = {}
+        self.history = defaultdict(lambda: deque(maxlen=samples))
+    
+    def add(self, name, elapsed):
+        self.current[name] += elapsed
+    
+    def begin(self):
+        self.current = defaultdict(int)
+    
+    def end(self):
+        self.last = dict(self.current)
+        for name, elapsed in self.last.items():
+            self.history[name].append(elapsed)
+    
+    def report(self):
+        """Return (name, last ms, mean ms, share of the mean total) rows, slowest first"""
+        means = {
+            name: sum(samples) / len(samples) / 1e6
+            for name, samples in self.history.items() if samples
+        }
+        total = sum(means.values()) or 1.0
+        rows = [
+            (name, self.last.get(name, 0) / 1e6, mean, mean / total)
+            for name, mean in means.items()
+        ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+# Shared by every pipeline, so the report covers the preview and exports
+extension_timings = ExtensionTimings()
+
+
+def _timed(run, name, timings):
+    span = f"ext:{name}"
+    
+    def timed_run(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return run(*args, **kwargs)
+        finally:
+            end = time.perf_counter_ns()
+            timings.add(name, end - start)
+            if tracer.enabled:
+                tracer.add(span, start, end)
+    return timed_run
+
+
+def _processors(md):
+    return [
+        *md.preprocessors, *md.parser.blockprocessors,
+        *md.treeprocessors, *md.postprocessors,
+    ]
+
+
+class MarkdownPipeline:
+    """A Markdown converter with a set of registered extensions
+
+    The run() of every preprocessor, block processor, treeprocessor and
+    postprocessor is timed and charged to the extension that registered
+    it. Extensions with a `detect` pattern are only loaded for documents
+    that use their syntax, found by a scan of the text before converting;
+    with `lazy=False` they are always loaded. A converter is kept for each
+    set of extensions and reused between conversions.
+    """
+    
+    def __init__(self, names, timings=extension_timings, lazy=True, **context):
+        self.names = tuple(name for name in EXTENSIONS if name in names)
+        self.timings = timings
+        self.lazy = lazy
+        self.context = dict(context, highlight='codehilite' in self.names)
+        self.converters = {}
+        self.md = None
+        self.extensions = {}
+    
+    def detect(self, text):
+        """Return the enabled extensions needed to convert text"""
+        names = self.names
+        if self.lazy:
+            if "includes" in names and '--8<--' in text:
+                text = expand_includes(text, self.context.get('base_dir'), self.context.get('path'))
+            text = '\n' + text
+            names = [
+                name for name in names
+                if EXTENSIONS[name].detect is None or EXTENSIONS[name].detect.search(text)
+            ]
+        replaced = {EXTENSIONS[name].replaces for name in names}
+        return tuple(name for name in names if name not in replaced)
+    
+    def _build(self, names):
+        md = markdown.Markdown()
+        extensions = {}
+        
+        # Whatever is new after loading an extension belongs to it
+        for name in names:
+            extension = EXTENSIONS[name].factory(**self.context)
+            before = set(map(id, _processors(md)))
+            md.registerExtensions(extension if isinstance(extension, list) else [extension], {})
+            extensions[name] = extension
+            self._wrap(name, [p for p in _processors(md) if id(p) not in before])
+        
+        owned = {id(p) for p in _processors(md) if hasattr(p, '_timed_by')}
+        self._wrap(CORE, [p for p in _processors(md) if id(p) not in owned])
+        return md, extensions
+    
+    def _wrap(self, name, processors):
+        for processor in processors:
+            processor._timed_by = name
+            processor.run = _timed(processor.run, name, self.timings)
+    
+    def convert(self, text):
+        names = self.detect(text)
+        if names not in self.converters:
+            self.converters[names] = self._build(names)
+        self.md, self.extensions = self.converters[names]
+        
+        self.md.reset()
+        self.timings.begin()
+        try:
+            return self.md.convert(text)
+        finally:
+            self.timings.end()
+    
+    def included_files(self):
+        """Return the files included by the last converted document"""
+        includes = self.extensions.get("includes")
+        return includes.files if includes is not None else set()
+    
+    def source_map(self):
+        """Return the SourceMap of the last converted document"""
+        extension = self.extensions.get("source_map")
+        if isinstance(extension, SourceMapExtension):
+            return extension.source_map
+        return SourceMap()
+
+
+def render_markdown(text, profile=EXPORT_PROFILE, **context):
+    """Convert text with the extensions of a profile"""
+    return MarkdownPipeline(profile_extensions(profile), **context).convert(text)
\ No newline at end of file
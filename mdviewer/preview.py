@@ -1,30 +1,117 @@
 import os
-import markdown
-from markdown.extensions.codehilite import CodeHiliteExtension
-from markdown.extensions.fenced_code import FencedCodeExtension
-from markdown.extensions.tables import TableExtension
+import re
+import json
 
-from PyQt6.QtCore import Qt, QUrl
+from PyQt6.QtCore import Qt, QUrl, QTimer, QFile, QIODevice, QObject, QFileSystemWatcher, pyqtSignal, pyqtSlot
 from PyQt6.QtGui import QColor, QPalette
 from PyQt6.QtWidgets import QWidget, QVBoxLayout
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineSettings
+from PyQt6.QtWebEngineCore import QWebEngineSettings, QWebEngineScript
+from PyQt6.QtWebChannel import QWebChannel
+
+from mdviewer.assets import ASSET_SCHEME, AssetSchemeHandler, asset_base_url, asset_url_to_path
+from mdviewer.perf import tracer
+from mdviewer.pipeline import MarkdownPipeline, profile_extensions
+from mdviewer.sourcemap import SourceMap, SOURCE_MAP_SCRIPT
+from mdviewer.tables import VIRTUAL_TABLE_SCRIPT
+
+# setHtml() refuses content over 2 MB; larger pages are served by the asset handler
+MAX_INLINE_HTML = 2 * 1024 * 1024 - 4096
+
+
+class SourceMapBridge(QObject):
+    """The object the page reaches as `sourceMap` over the web channel"""
+    
+    # Start and end of a selection, each as (block, text, offset, occurrence)
+    selected = pyqtSignal(int, str, int, int, int, str, int, int)
+    
+    @pyqtSlot(int, str, int, int, int, str, int, int)
+    def select(self, *position):
+        self.selected.emit(*position)
+
+
+def _web_channel_script():
+    """Return qwebchannel.js, which Qt ships as a resource"""
+    file = QFile(":/qtwebchannel/qwebchannel.js")
+    if not file.open(QIODevice.OpenModeFlag.ReadOnly):
+        return ""
+    try:
+        return bytes(file.readAll()).decode('utf-8')
+    finally:
+        file.close()
+
 
 class MarkdownPreview(QWebEngineView):
+    # Body HTML of each rendering, for the preview server
+    rendered = pyqtSignal(str)
+    
+    # A file included by the document changed on disk
+    includes_changed = pyqtSignal()
+    
+    # Source (start line, start column, end line, end column), all 0-based,
+    # of a click or selection in the page
+    source_selected = pyqtSignal(int, int, int, int)
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
         self.zoom_factor = 1.0
         self.is_dark_mode = False
+        self.base_url = QUrl("file://")
+        self.document_path = None
+        self.markdown_text = ""
+        
+        # Rebuilt when the extensions or the document file change
+        self.extension_names = profile_extensions("full")
+        self.pipeline = None
+        self.pipeline_context = None
         
         # Set up web engine settings
         self.settings().setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
         self.settings().setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
         
+        # Serve images next to the document through the asset pipeline
+        profile = self.page().profile()
+        if profile.urlSchemeHandler(ASSET_SCHEME) is None:
+            profile.installUrlSchemeHandler(ASSET_SCHEME, AssetSchemeHandler(profile))
+        self.asset_handler = profile.urlSchemeHandler(ASSET_SCHEME)
+        self.page_path = None
+        
+        # Clicks in the page map back to the source through the blocks
+        # of the last rendering; the editor's block is highlighted
+        self.source_map = SourceMap()
+        self.source_lines = None
+        self.source_line = -1
+        self.current_block = -1
+        self.bridge = SourceMapBridge(self)
+        self.bridge.selected.connect(self._on_source_selected)
+        self.channel = QWebChannel(self.page())
+        self.channel.registerObject("sourceMap", self.bridge)
+        self.page().setWebChannel(self.channel)
+        
+        script = QWebEngineScript()
+        script.setName("mdviewer-source-map")
+        script.setSourceCode(_web_channel_script() + SOURCE_MAP_SCRIPT)
+        script.setInjectionPoint(QWebEngineScript.InjectionPoint.DocumentCreation)
+        script.setWorldId(QWebEngineScript.ScriptWorldId.MainWorld)
+        script.setRunsOnSubFrames(False)
+        self.page().scripts().insert(script)
+        
         # Apply default styles
         self.default_css = self._get_default_css()
         self.current_css = self.default_css
         
+        # Re-render when included files change; saves often come in bursts
+        self.include_watcher = QFileSystemWatcher(self)
+        self.include_timer = QTimer(self)
+        self.include_timer.setSingleShot(True)
+        self.include_timer.setInterval(200)
+        self.include_timer.timeout.connect(self.includes_changed)
+        self.include_watcher.fileChanged.connect(lambda path: self.include_timer.start())
+        
+        # The page load completes the latency trace of an edit
+        self.loadFinished.connect(self._on_load_finished)
+        
         # Initialize with empty content
         self.set_markdown("")
     
@@ -97,6 +184,34 @@ class MarkdownPreview(QWebEngineView):
             background-color: #f6f8fa;
         }
         
+        .virtual-table {
+            max-height: 70vh;
+            overflow-y: auto;
+            margin-bottom: 16px;
+            border: 1px solid #dfe2e5;
+        }
+        
+        .virtual-table table {
+            table-layout: fixed;
+            margin-bottom: 0;
+        }
+        
+        .virtual-table th {
+            position: sticky;
+            top: 0;
+            background-color: #ffffff;
+        }
+        
+        .virtual-table td {
+            white-space: nowrap;
+            overflow: hidden;
+            text-overflow: ellipsis;
+        }
+        
+        .virtual-table tr.spacer {
+            background-color: transparent;
+        }
+        
         hr {
             height: 0.25em;
             padding: 0;
@@ -110,6 +225,48 @@ class MarkdownPreview(QWebEngineView):
             box-sizing: content-box;
         }
         
+        math {
+            font-family: "Latin Modern Math", "STIX Two Math", "Cambria Math", math;
+        }
+        
+        math[display="block"] {
+            margin: 16px 0;
+            overflow-x: auto;
+        }
+        
+        .math-error {
+            color: #d73a49;
+        }
+        
+        .include-error {
+            padding: 0 1em;
+            color: #d73a49;
+            border-left: 0.25em solid #d73a49;
+        }
+        
+        .diff-deleted {
+            background-color: #ffebe9;
+            text-decoration: line-through;
+            opacity: 0.7;
+        }
+        
+        .diff-inserted {
+            background-color: #e6ffec;
+        }
+        
+        .mdv-current {
+            box-shadow: -8px 0 0 -4px #54aeff;
+        }
+        
+        .task-list-item {
+            list-style-type: none;
+        }
+        
+        .task-list-item input {
+            margin: 0 0.2em 0.25em -1.4em;
+            vertical-align: middle;
+        }
+        
         a {
             color: #0366d6;
             text-decoration: none;
@@ -192,6 +349,34 @@ class MarkdownPreview(QWebEngineView):
             background-color: #161b22;
         }
         
+        .virtual-table {
+            max-height: 70vh;
+            overflow-y: auto;
+            margin-bottom: 16px;
+            border: 1px solid #30363d;
+        }
+        
+        .virtual-table table {
+            table-layout: fixed;
+            margin-bottom: 0;
+        }
+        
+        .virtual-table th {
+            position: sticky;
+            top: 0;
+            background-color: #0d1117;
+        }
+        
+        .virtual-table td {
+            white-space: nowrap;
+            overflow: hidden;
+            text-overflow: ellipsis;
+        }
+        
+        .virtual-table tr.spacer {
+            background-color: transparent;
+        }
+        
         hr {
             height: 0.25em;
             padding: 0;
@@ -205,6 +390,48 @@ class MarkdownPreview(QWebEngineView):
             box-sizing: content-box;
         }
         
+        math {
+            font-family: "Latin Modern Math", "STIX Two Math", "Cambria Math", math;
+        }
+        
+        math[display="block"] {
+            margin: 16px 0;
+            overflow-x: auto;
+        }
+        
+        .math-error {
+            color: #f85149;
+        }
+        
+        .include-error {
+            padding: 0 1em;
+            color: #f85149;
+            border-left: 0.25em solid #f85149;
+        }
+        
+        .diff-deleted {
+            background-color: #4b1818;
+            text-decoration: line-through;
+            opacity: 0.7;
+        }
+        
+        .diff-inserted {
+            background-color: #12361f;
+        }
+        
+        .mdv-current {
+            box-shadow: -8px 0 0 -4px #1f6feb;
+        }
+        
+        .task-list-item {
+            list-style-type: none;
+        }
+        
+        .task-list-item input {
+            margin: 0 0.2em 0.25em -1.4em;
+            vertical-align: middle;
+        }
+        
         a {
             color: #58a6ff;
             text-decoration: none;
@@ -217,17 +444,32 @@ class MarkdownPreview(QWebEngineView):
     
     def set_markdown(self, text):
         """Set the markdown content to be displayed"""
+        self.markdown_text = text
+        
         # Process markdown to HTML
-        extensions = [
-            FencedCodeExtension(),
-            CodeHiliteExtension(linenums=False, css_class='highlight'),
-            TableExtension(),
-            'nl2br',  # newline to break
-            'sane_lists',
-            'toc'  # table of contents
-        ]
+        context = dict(base_dir=self.base_path(), path=self.document_path)
+        if self.pipeline is None or self.pipeline_context != context:
+            self.pipeline = MarkdownPipeline(self.extension_names, preview=True, **context)
+            self.pipeline_context = context
         
-        html = markdown.markdown(text, extensions=extensions)
+        with tracer.span("markdown"):
+            html = self.pipeline.convert(text)
+        self.watch_includes(self.pipeline.included_files())
+        
+        self.source_map = self.pipeline.source_map()
+        self.source_lines = None
+        self.current_block = self.source_map.block_at(self.source_line)
+        
+        self.show_html(html)
+        self.rendered.emit(html)
+    
+    def show_html(self, html):
+        """Display rendered HTML in the preview page"""
+        # Let the browser decode images lazily and off the main thread
+        html = html.replace('<img ', '<img loading="lazy" decoding="async" ')
+        
+        # Large tables only carry their rows as data; the script draws the visible ones
+        script = f"<script>{VIRTUAL_TABLE_SCRIPT}</script>" if 'class="virtual-table"' in html else ""
         
         # Wrap the HTML content
         full_html = f"""
@@ -239,6 +481,7 @@ class MarkdownPreview(QWebEngineView):
             <style>
                 {self.current_css}
             </style>
+            {script}
         </head>
         <body>
             {html}
@@ -247,7 +490,97 @@ class MarkdownPreview(QWebEngineView):
         """
         
         # Set the content
-        self.setHtml(full_html, QUrl("file://"))
+        with tracer.span("setHtml"):
+            data = full_html.encode('utf-8')
+            if len(data) > MAX_INLINE_HTML:
+                self.load_large_page(data)
+            else:
+                self.release_page()
+                self.setHtml(full_html, self.base_url)
+        tracer.begin_async("load")
+    
+    def load_large_page(self, data):
+        """Load a page too big for setHtml() through the asset handler"""
+        base_url = self.base_url
+        if base_url.scheme() != ASSET_SCHEME.decode():
+            # Untitled documents resolve relative paths against the working directory
+            base_url = asset_base_url(os.getcwd())
+        
+        url = base_url.resolved(QUrl(f".mdviewer-preview-{id(self)}.html"))
+        self.release_page()
+        self.page_path = asset_url_to_path(url)
+        self.asset_handler.pages[self.page_path] = data
+        self.load(url)
+    
+    def release_page(self):
+        if self.page_path is not None:
+            self.asset_handler.pages.pop(self.page_path, None)
+            self.page_path = None
+    
+    def set_extensions(self, names):
+        """Render with these registered extensions from now on"""
+        self.extension_names = tuple(names)
+        self.pipeline = None
+        self.pipeline_context = None
+        self.set_markdown(self.markdown_text)
+    
+    def watch_includes(self, files):
+        """Watch exactly the files the document includes"""
+        watched = set(self.include_watcher.files())
+        # Files replaced by a rename drop out of the watcher; adding them
+        # again picks up the new file
+        stale = watched - files
+        if stale:
+            self.include_watcher.removePaths(list(stale))
+        missing = [path for path in files - watched if os.path.exists(path)]
+        if missing:
+            self.include_watcher.addPaths(missing)
+    
+    def _on_load_finished(self, ok):
+        tracer.end_async("load")
+        tracer.end_frame()
+        if self.current_block >= 0:
+            self._highlight_block(self.current_block)
+    
+    def highlight_source_line(self, line):
+        """Highlight the block of a 0-based source line, e.g. the editor's"""
+        self.source_line = line
+        block = self.source_map.block_at(line)
+        if block != self.current_block:
+            self.current_block = block
+            self._highlight_block(block)
+    
+    def _highlight_block(self, block):
+        self.page().runJavaScript(f"window.mdvSourceMap && mdvSourceMap.highlight({block});")
+    
+    def _on_source_selected(self, *position):
+        if self.source_lines is None:
+            self.source_lines = self.markdown_text.split('\n')
+        start = self.source_map.locate(self.source_lines, *position[:4])
+        end = self.source_map.locate(self.source_lines, *position[4:])
+        if start is None:
+            return
+        self.source_selected.emit(*start, *(end or start))
+    
+    def set_base_path(self, directory):
+        """Resolve relative links and images against directory"""
+        self.document_path = None
+        if directory:
+            self.base_url = asset_base_url(directory)
+        else:
+            self.base_url = QUrl("file://")
+    
+    def set_document_path(self, path):
+        """Show the document of the file at path, relative to its directory"""
+        path = os.path.abspath(path)
+        self.set_base_path(os.path.dirname(path))
+        self.document_path = path
+    
+    def base_path(self):
+        """Return the directory relative paths resolve against, if any"""
+        if self.base_url.scheme() != ASSET_SCHEME.decode():
+            return None
+        return asset_url_to_path(self.base_url)
     
     def set_dark_mode(self, dark_mode):
         """Switch between light and dark mode"""
@@ -260,13 +593,29 @@ class MarkdownPreview(QWebEngineView):
             self.current_css = self._get_default_css()
         
         # Re-render the current content
-        current_content = self.page().toHtml(lambda content: self.set_markdown(content))
+        self.set_markdown(self.markdown_text)
     
     def set_zoom_factor(self, factor):
         """Set the zoom factor for the preview"""
         self.zoom_factor = factor
         super().setZoomFactor(factor)
     
+    def scroll_to_heading(self, heading_text, level, occurrence=0):
+        """Scroll to a heading, the nth one if several have the same text"""
+        # Inline markup is gone from the rendered heading
+        text = re.sub(r'[*_`]', '', heading_text).strip()
+        script = f"""
+        (function(text, n) {{
+            for (const heading of document.querySelectorAll('h{level}')) {{
+                if (heading.textContent.trim() === text && n-- === 0) {{
+                    heading.scrollIntoView();
+                    return;
+                }}
+            }}
+        }})({json.dumps(text)}, {occurrence});
+        """
+        self.page().runJavaScript(script)
+    
     def print_(self, printer, html_content=None):
         """Print the current preview content"""
         if html_content:
@@ -0,0 +1,218 @@
+import os
+import re
+import sys
+import json
+import time
+import platform
+import threading
+from collections import Counter
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from mdviewer import __version__
+from mdviewer.perf import tracer, HUD_STAGES
+
+class SamplingProfiler:
+    """Samples the call stack of one thread from a background thread
+
+    Sampling with sys._current_frames() only costs the profiled thread a
+    brief hold of the GIL per sample, unlike sys.setprofile which runs on
+    every call.
+    """
+    
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = Counter()  # stack tuple (root first) -> count
+        self.sample_count = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self.samples.clear()
+        self.sample_count = 0
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="mdviewer-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.elapsed = time.perf_counter() - self.started
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            
+            self.samples[tuple(stack)] += 1
+            self.sample_count += 1
+    
+    @staticmethod
+    def frame_name(frame):
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+    
+    def collapsed(self):
+        """Return the samples in collapsed-stack format (flamegraph.pl, speedscope)"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            names = ';'.join(self.frame_name(frame).replace(';', ':') for frame in stack)
+            lines.append(f"{names} {count}")
+        return '\n'.join(lines) + '\n'
+    
+    def speedscope(self, name="MDViewer"):
+        """Return the samples as a speedscope sampled profile"""
+        frames = []
+        frame_index = {}
+        samples = []
+        weights = []
+        
+        for stack, count in self.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                indices.append(frame_index[frame])
+            samples.append(indices)
+            weights.append(count * self.interval)
+        
+        return {
+            '$schema': "https://www.speedscope.app/file-format-schema.json",
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+            'name': name,
+            'exporter': f"MDViewer {__version__}",
+        }
+
+
+def document_statistics(text):
+    """Return size statistics of a markdown document"""
+    lines = text.split('\n') if text else []
+    return {
+        'characters': len(text),
+        'bytes': len(text.encode('utf-8')),
+        'lines': len(lines),
+        'words': len(text.split()),
+        'headings': sum(1 for line in lines if re.match(r'^#{1,6}\s', line)),
+        'code_fences': sum(1 for line in lines if line.lstrip().startswith('```')) // 2,
+        'table_rows': sum(1 for line in lines if line.lstrip().startswith('|')),
+        'links': text.count(']('),
+        'longest_line': max((len(line) for line in lines), default=0),
+    }
+
+
+def render_summary():
+    """Return p50/p99 render stage timings recorded by the tracer"""
+    summary = {}
+    for name, _ in HUD_STAGES:
+        values = tracer.percentiles(name)
+        if values:
+            summary[name] = {
+                'samples': len(tracer.durations[name]),
+                'p50_ms': round(values[0], 3),
+                'p99_ms': round(values[1], 3),
+            }
+    return summary
+
+
+class ProfileRecorder(QObject):
+    """Records a sampling profile and render timings for a fixed duration"""
+    
+    # Emitted with the output directory, or an empty string on failure
+    finished = pyqtSignal(str)
+    
+    def __init__(self, text_provider, parent=None):
+        super().__init__(parent)
+        
+        self.text_provider = text_provider
+        self.profiler = None
+        self.output_dir = None
+        self.tracer_was_enabled = False
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.stop)
+    
+    def is_recording(self):
+        return self.profiler is not None
+    
+    def start(self, seconds, output_dir):
+        if self.is_recording():
+            return
+        
+        self.output_dir = output_dir
+        
+        # Collect render timings for the summary, alongside the samples
+        self.tracer_was_enabled = tracer.enabled
+        if not tracer.enabled:
+            tracer.set_enabled(True)
+        tracer.clear()
+        
+        self.profiler = SamplingProfiler()
+        self.profiler.start()
+        self.timer.start(int(seconds * 1000))
+    
+    def stop(self):
+        if not self.is_recording():
+            return
+        
+        self.timer.stop()
+        self.profiler.stop()
+        profiler = self.profiler
+        self.profiler = None
+        
+        summary = {
+            'mdviewer': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'duration_s': round(profiler.elapsed, 3),
+            'samples': profiler.sample_count,
+            'interval_ms': profiler.interval * 1000,
+            'render_timings': render_summary(),
+            'document': document_statistics(self.text_provider()),
+        }
+        
+        if not self.tracer_was_enabled:
+            tracer.set_enabled(False)
+        
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(os.path.join(self.output_dir, "profile.speedscope.json"), 'w', encoding='utf-8') as file:
+                json.dump(profiler.speedscope(), file)
+            with open(os.path.join(self.output_dir, "profile.folded"), 'w', encoding='utf-8') as file:
+                file.write(profiler.collapsed())
+            with open(os.path.join(self.output_dir, "summary.json"), 'w', encoding='utf-8') as file:
+                json.dump(summary, file, indent=2)
+        except OSError:
+            self.finished.emit("")
+            return
+        
+        self.finished.emit(self.output_dir)
+
+
+def default_profile_dir(base_dir):
+    """Return a new, timestamped directory name for a profile below base_dir"""
+    return os.path.join(base_dir, time.strftime("mdviewer-profile-%Y%m%d-%H%M%S"))
\ No newline at end of file
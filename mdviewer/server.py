@@ -0,0 +1,422 @@
+import os
+import re
+import json
+import socket
+import asyncio
+import posixpath
+import threading
+from html import unescape
+from urllib.parse import unquote, urljoin, urlsplit
+
+from mdviewer.assets import guess_mime_type
+from mdviewer.tables import VIRTUAL_TABLE_SCRIPT
+
+DEFAULT_PORT = 8765
+
+# Events queued for a client that stops reading; past this it is dropped
+# and reconnects to a fresh copy of the document
+CLIENT_QUEUE_SIZE = 64
+
+# Comments, tags and the raw text of script and style elements
+TAG_REGEX = re.compile(
+    r'<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)(?:"[^"]*"|\'[^\']*\'|[^\'">])*?(/?)>', re.DOTALL
+)
+
+# URLs the page can load: attributes of the rendered HTML and url() in its CSS
+REFERENCE_REGEX = re.compile(
+    r'\b(?:src|href|poster|data|srcset)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')'
+    r'|url\(\s*["\']?([^"\')]+)', re.IGNORECASE
+)
+
+# Names a browser on this machine may use for the server, besides the bound address
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '[::1]'}
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'source', 'track', 'wbr',
+}
+
+# Keeps a list of DOM nodes per block and applies the pushed patches
+CLIENT_SCRIPT = """
+const content = document.getElementById('mdv-content');
+const style = document.getElementById('mdv-style');
+let blocks = [];
+let version = null;
+
+function parse(html) {
+    const template = document.createElement('template');
+    template.innerHTML = html;
+    // Scripts added through innerHTML do not run; replace them with fresh ones
+    for (const old of template.content.querySelectorAll('script')) {
+        const script = document.createElement('script');
+        for (const attribute of old.attributes) {
+            script.setAttribute(attribute.name, attribute.value);
+        }
+        script.textContent = old.textContent;
+        old.replaceWith(script);
+    }
+    return Array.from(template.content.childNodes);
+}
+
+function insert(index, htmlBlocks) {
+    const next = blocks.slice(index).find(nodes => nodes.length);
+    const before = next ? next[0] : null;
+    const added = htmlBlocks.map(parse);
+    for (const nodes of added) {
+        for (const node of nodes) {
+            content.insertBefore(node, before);
+        }
+    }
+    blocks.splice(index, 0, ...added);
+}
+
+const source = new EventSource('/__events');
+
+source.addEventListener('reset', event => {
+    const data = JSON.parse(event.data);
+    content.replaceChildren();
+    blocks = [];
+    insert(0, data.blocks);
+    style.textContent = data.css;
+    version = data.version;
+});
+
+source.addEventListener('patch', event => {
+    const data = JSON.parse(event.data);
+    if (data.base !== version) {
+        // Missed an update; the reconnect starts with a full copy
+        source.close();
+        location.reload();
+        return;
+    }
+    for (const nodes of blocks.splice(data.start, data.remove)) {
+        nodes.forEach(node => node.remove());
+    }
+    insert(data.start, data.insert);
+    version = data.version;
+});
+
+source.addEventListener('style', event => {
+    style.textContent = JSON.parse(event.data).css;
+});
+"""
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>MDViewer</title>
+    <style id="mdv-style"></style>
+    <script>{tables}</script>
+</head>
+<body>
+    <div id="mdv-content"></div>
+    <script>{client}</script>
+</body>
+</html>
+"""
+
+def split_blocks(html):
+    """Split rendered HTML into its top-level elements
+
+    Text between elements stays with the element after it. Unbalanced
+    markup only makes the blocks coarser, never loses content.
+    """
+    blocks = []
+    start = 0
+    depth = 0
+    position = 0
+    while True:
+        match = TAG_REGEX.search(html, position)
+        if match is None:
+            break
+        position = match.end()
+        closing, name, self_closing = match.groups()
+        if name is None:
+            continue
+        name = name.lower()
+        
+        if closing:
+            depth = max(0, depth - 1)
+        elif name in ('script', 'style'):
+            end = html.find(f'</{name}', position)
+            position = len(html) if end < 0 else html.find('>', end) + 1 or len(html)
+        elif name not in VOID_ELEMENTS and not self_closing:
+            depth += 1
+            continue
+        
+        if depth == 0:
+            blocks.append(html[start:position])
+            start = position
+    
+    if html[start:].strip():
+        blocks.append(html[start:])
+    return blocks
+
+
+def diff_blocks(old, new):
+    """Return (start, removed count, inserted blocks) turning old into new"""
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[-1 - end] == new[-1 - end]:
+        end += 1
+    return start, len(old) - start - end, new[start:len(new) - end]
+
+
+def referenced_paths(html):
+    """Return the normalized relative paths of the local files HTML refers to"""
+    paths = set()
+    for match in REFERENCE_REGEX.finditer(html):
+        value = unescape(match.group(1) or match.group(2) or match.group(3) or '')
+        # Each candidate of a srcset is a URL followed by its descriptor
+        for candidate in value.split(','):
+            url = candidate.strip().split(' ', 1)[0]
+            parts = urlsplit(url)
+            if not parts.path or parts.scheme or parts.netloc:
+                continue
+            path = posixpath.normpath(unquote(urljoin('/', parts.path)).lstrip('/'))
+            paths.add(path)
+    return paths
+
+
+def lan_address():
+    """Return this machine's address on the local network, if it has one"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            # No packet is sent; this only picks the outgoing interface
+            probe.connect(('192.0.2.1', 9))
+            return probe.getsockname()[0]
+    except OSError:
+        return '127.0.0.1'
+
+
+def _event(name, data, event_id=None):
+    lines = [f'event: {name}', f'data: {json.dumps(data)}']
+    if event_id is not None:
+        lines.insert(0, f'id: {event_id}')
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class PreviewServer:
+    """Serves the rendered preview over HTTP and pushes edits to browsers
+
+    The server runs an asyncio loop on its own thread. The GUI publishes
+    each new rendering once; it is split into top-level blocks and compared
+    with the previous one, and the resulting patch is encoded a single
+    time and queued to every connected browser as a Server-Sent Event.
+    Newly connected browsers get the whole document as one event. Files
+    the document refers to, such as images, are served from its directory;
+    nothing else in it is. Requests naming any host but this machine are
+    refused, so other sites can't read the server through DNS rebinding.
+    """
+    
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.thread = None
+        self.server = None
+        self.ready = threading.Event()
+        self.error = None
+        self.hosts = set()
+        
+        # Only touched on the loop thread
+        self.blocks = []
+        self.css = ''
+        self.root = None
+        self.version = 0
+        self.reset_message = None
+        self.assets = None
+        self.clients = set()
+    
+    @property
+    def url(self):
+        host = lan_address() if self.host in ('0.0.0.0', '') else self.host
+        return f"http://{host}:{self.port}/"
+    
+    def start(self):
+        """Start serving; raises OSError if the port cannot be bound"""
+        self.ready.clear()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="PreviewServer", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+    
+    def stop(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop = None
+    
+    def publish(self, html, css=None, root=None):
+        """Show new rendered HTML to every browser; safe to call from any thread"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._update, html, css, root)
+    
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            self.server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+        except OSError as error:
+            self.error = error
+            loop.close()
+            self.ready.set()
+            return
+        
+        self.port = self.server.sockets[0].getsockname()[1]
+        names = LOCAL_HOSTS | {self.host}
+        if self.host in ('0.0.0.0', ''):
+            names |= {lan_address(), socket.gethostname().lower()}
+        self.hosts = {f'{name}:{self.port}' for name in names}
+        if self.port == 80:
+            # Browsers leave the default port out
+            self.hosts |= names
+        self.loop = loop
+        self.ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self.server.close()
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+    
+    def _update(self, html, css, root):
+        self.root = root
+        if css is not None and css != self.css:
+            self.css = css
+            self.assets = None
+            self._broadcast(_event('style', {'css': css}))
+        
+        blocks = split_blocks(html)
+        start, removed, inserted = diff_blocks(self.blocks, blocks)
+        if not removed and not inserted:
+            return
+        
+        base = self.version
+        self.version += 1
+        self.blocks = blocks
+        self.reset_message = None
+        self.assets = None
+        self._broadcast(_event('patch', {
+            'base': base, 'version': self.version,
+            'start': start, 'remove': removed, 'insert': inserted,
+        }, self.version))
+    
+    def _broadcast(self, message):
+        for queue in list(self.clients):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Ending the stream makes the browser reconnect
+                self.clients.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+    
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            lines = request.decode('latin-1').split('\r\n')
+            method, target, _ = lines[0].split(' ', 2)
+            path = unquote(urlsplit(target).path)
+            host = next(
+                (line.split(':', 1)[1].strip().lower() for line in lines[1:]
+                 if line.lower().startswith('host:')), None
+            )
+            
+            if host not in self.hosts:
+                await self._respond(writer, 403, 'text/plain', b'Forbidden')
+            elif method not in ('GET', 'HEAD'):
+                await self._respond(writer, 405, 'text/plain', b'Method Not Allowed')
+            elif path == '/__events':
+                await self._stream_events(writer)
+            elif path == '/':
+                page = PAGE_TEMPLATE.format(tables=VIRTUAL_TABLE_SCRIPT, client=CLIENT_SCRIPT)
+                await self._respond(writer, 200, 'text/html; charset=utf-8', page.encode('utf-8'),
+                                    head_only=method == 'HEAD')
+            else:
+                await self._serve_file(writer, path, method == 'HEAD')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _respond(self, writer, status, content_type, body, head_only=False):
+        reason = {200: 'OK', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: close\r\n\r\n".encode('latin-1')
+        )
+        if not head_only:
+            writer.write(body)
+        await writer.drain()
+    
+    async def _serve_file(self, writer, path, head_only):
+        if self.assets is None:
+            # Worked out on the first request after each update
+            self.assets = referenced_paths(''.join(self.blocks) + self.css)
+        
+        file_path = None
+        relative = posixpath.normpath(path.lstrip('/'))
+        hidden = any(part.startswith('.') for part in relative.split('/'))
+        if self.root is not None and relative in self.assets and not hidden:
+            root = os.path.realpath(self.root)
+            candidate = os.path.realpath(os.path.join(root, relative))
+            if candidate.startswith(os.path.join(root, '')) and os.path.isfile(candidate):
+                file_path = candidate
+        
+        if file_path is None:
+            await self._respond(writer, 404, 'text/plain', b'Not Found')
+            return
+        
+        data = await asyncio.get_running_loop().run_in_executor(None, _read_file, file_path)
+        await self._respond(writer, 200, guess_mime_type(file_path), data, head_only)
+    
+    async def _stream_events(self, writer):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        if self.reset_message is None:
+            # Built once per version and shared by the browsers connecting to it
+            self.reset_message = _event('reset', {
+                'version': self.version, 'css': self.css, 'blocks': self.blocks,
+            }, self.version)
+        writer.write(self.reset_message)
+        await writer.drain()
+        
+        queue = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        self.clients.add(queue)
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self.clients.discard(queue)
+
+
+def _read_file(path):
+    with open(path, 'rb') as file:
+        return file.read()
\ No newline at end of file
@@ -0,0 +1,418 @@
+import re
+from array import array
+from bisect import bisect_right
+
+from markdown import util
+from markdown.blockprocessors import BlockProcessor
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+from markdown.postprocessors import Postprocessor
+from markdown.treeprocessors import Treeprocessor
+
+# A paragraph of its own before each top-level block. It starts with a
+# private use character, so no Markdown or HTML syntax matches it.
+TOKEN_START = "\ue000mdv-block:"
+TOKEN = TOKEN_START + "{}"
+TOKEN_REGEX = re.compile(TOKEN_START + r'(\d+)\n*')
+
+# The first tag of stashed HTML
+TAG_REGEX = re.compile(r'^(\s*<[a-zA-Z][\w-]*)')
+
+ATTRIBUTE_REGEX = re.compile(r' data-block="\d+"')
+
+FENCE_REGEX = re.compile(r'^[ \t]*(`{3,}|~{3,})')
+LIST_REGEX = re.compile(r'^[ ]{0,3}(?:[*+-]|\d+[.)])[ \t]')
+HEADING_REGEX = re.compile(r'^[ ]{0,3}#{1,6}(?:[ \t]|$)')
+HTML_REGEX = re.compile(r'^[ ]{0,3}<(!--|[a-zA-Z][\w-]*)')
+
+VOID_ELEMENTS = {'br', 'hr', 'img', 'input', 'link', 'meta', 'wbr', 'source', 'embed'}
+
+# Defines mdvSourceMap, the page side of SourceMapBridge. Clicks and
+# selections are sent as (block, text, offset, occurrence): the text node
+# under the pointer, the offset in it, and how often the same text comes
+# earlier in the block, which is enough to find the spot in the source
+SOURCE_MAP_SCRIPT = """
+(function() {
+    let bridge = null;
+    let current = null;
+    let pending = null;
+
+    function blockOf(node) {
+        let element = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+        let top = null;
+        for (; element && element !== document.body; element = element.parentElement) {
+            if (element.dataset.block !== undefined) {
+                return element;
+            }
+            top = element;
+        }
+        // Elements after the first of a block, e.g. from an included file
+        for (; top; top = top.previousElementSibling) {
+            if (top.dataset.block !== undefined) {
+                return top;
+            }
+        }
+        return null;
+    }
+
+    function position(node, offset) {
+        const block = blockOf(node);
+        if (!block) {
+            return null;
+        }
+        if (node.nodeType !== Node.TEXT_NODE) {
+            return [Number(block.dataset.block), '', 0, 0];
+        }
+        const text = node.data;
+        let occurrence = 0;
+        if (text.trim()) {
+            const walker = document.createTreeWalker(block, NodeFilter.SHOW_TEXT);
+            for (let other = walker.nextNode(); other && other !== node; other = walker.nextNode()) {
+                occurrence += other.data.split(text).length - 1;
+            }
+        }
+        return [Number(block.dataset.block), text, offset, occurrence];
+    }
+
+    function send() {
+        const selection = window.getSelection();
+        if (!bridge || !selection.rangeCount) {
+            return;
+        }
+        const range = selection.getRangeAt(0);
+        const start = position(range.startContainer, range.startOffset);
+        if (!start) {
+            return;
+        }
+        const end = (range.collapsed ? null : position(range.endContainer, range.endOffset)) || start;
+        bridge.select(...start, ...end);
+    }
+
+    function highlight(block) {
+        pending = block;
+        if (current) {
+            current.classList.remove('mdv-current');
+            current = null;
+        }
+        if (block < 0 || !document.body) {
+            return;
+        }
+        current = document.querySelector('[data-block="' + block + '"]');
+        if (current) {
+            current.classList.add('mdv-current');
+            const rect = current.getBoundingClientRect();
+            if (rect.bottom < 0 || rect.top > window.innerHeight) {
+                current.scrollIntoView({block: 'center'});
+            }
+        }
+    }
+
+    window.mdvSourceMap = {highlight: highlight};
+
+    document.addEventListener('DOMContentLoaded', () => {
+        new QWebChannel(qt.webChannelTransport, channel => {
+            bridge = channel.objects.sourceMap;
+        });
+        // A click places the caret; a drag leaves a selection
+        document.addEventListener('mouseup', event => {
+            if (event.button === 0 && !event.target.closest('a')) {
+                setTimeout(send, 0);
+            }
+        });
+        if (pending !== null) {
+            highlight(pending);
+        }
+    });
+})();
+"""
+
+
+class SourceMap:
+    """The source lines of each top-level block of a rendered document
+
+    Block ids are the order of the blocks in the document. starts and ends
+    are sorted arrays of the first line of each block and the line after
+    its last, so a line is found with a binary search and a block's lines
+    by indexing.
+    """
+    
+    __slots__ = ('starts', 'ends')
+    
+    def __init__(self):
+        self.starts = array('l')
+        self.ends = array('l')
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def block_at(self, line):
+        """Return the id of the block containing a 0-based line, or -1"""
+        index = bisect_right(self.starts, line) - 1
+        if index >= 0 and line < self.ends[index]:
+            return index
+        return -1
+    
+    def lines(self, block):
+        """Return the (start, end) lines of a block"""
+        return self.starts[block], self.ends[block]
+    
+    def locate(self, lines, block, text, offset, occurrence):
+        """Return the (line, column) of a spot in a rendered block
+
+        text is the rendered text around the spot and offset the position
+        in it. The text is looked up in the block's source; markup inside
+        it, e.g. an escaped character, makes the search fall back to the
+        word at the offset and then to the start of the block.
+        """
+        if not 0 <= block < len(self.starts):
+            return None
+        start, end = self.starts[block], self.ends[block]
+        source = '\n'.join(lines[start:end])
+        
+        found = _find(source, text, occurrence)
+        if found < 0:
+            # The word the spot is in
+            before = re.search(r'\w*$', text[:offset]).group(0)
+            after = re.match(r'\w*', text[offset:]).group(0)
+            word = before + after
+            offset = len(before)
+            found = _find(source, word, 0) if word else -1
+            if found < 0:
+                return start, 0
+        
+        position = found + offset
+        line = start + source.count('\n', 0, position)
+        return line, position - (source.rfind('\n', 0, position) + 1)
+
+
+def _find(source, text, occurrence):
+    if not text.strip():
+        return -1
+    found = -1
+    for _ in range(occurrence + 1):
+        found = source.find(text, found + 1)
+        if found < 0:
+            return -1
+    return found
+
+
+def strip_source_map(html):
+    """Remove the block ids of a preview rendering, e.g. for browsers"""
+    if 'data-block="' not in html:
+        return html
+    return ATTRIBUTE_REGEX.sub('', html)
+
+
+def _block_kind(line):
+    if LIST_REGEX.match(line):
+        return 'list'
+    stripped = line.lstrip()
+    if stripped.startswith('>'):
+        return 'quote'
+    if line.startswith(('    ', '\t')):
+        return 'code'
+    if HTML_REGEX.match(line):
+        return 'html'
+    return 'paragraph'
+
+
+def _continues(kind, line):
+    """Return True if line, after a blank line, is part of a block of this kind"""
+    if kind in ('list', 'code') and line.startswith(('    ', '\t')):
+        return True
+    if kind == 'list':
+        return LIST_REGEX.match(line) is not None
+    if kind == 'quote':
+        return line.lstrip().startswith('>')
+    return False
+
+
+def _html_depth(line, tag, depth):
+    """Return how many tag elements are open after line"""
+    if tag == '!--':
+        return 0 if '-->' in line else 1
+    if tag.lower() in VOID_ELEMENTS or line.rstrip().endswith('/>'):
+        return 0
+    lowered = line.lower()
+    tag = tag.lower()
+    return depth + len(re.findall(rf'<{tag}\b', lowered)) - lowered.count(f'</{tag}')
+
+
+def find_blocks(lines):
+    """Return (starts, ends) of the top-level blocks of Markdown lines
+
+    A blank line ends a block unless what follows continues it, as list
+    items, indented lines, quotes and raw HTML do. Fenced code is skipped
+    whole. When in doubt lines stay in the same block, which only makes
+    the map coarser.
+    """
+    starts = array('l')
+    ends = array('l')
+    kind = None
+    fence = None
+    html_tag = None
+    html_depth = 0
+    blank = True
+    last = 0
+    
+    for index, line in enumerate(lines):
+        if fence is not None:
+            # A closing fence has no info string
+            closing = line.strip()
+            if closing.startswith(fence) and not closing.strip(fence[0]):
+                fence = None
+            last = index
+            continue
+        if not line.strip():
+            blank = True
+            continue
+        
+        if kind is None:
+            new_block = True
+        elif html_tag is not None:
+            new_block = False
+        elif blank:
+            new_block = not _continues(kind, line)
+        else:
+            # Python-Markdown ends a paragraph at a heading, and indented
+            # code at the first line that isn't
+            new_block = (
+                kind == 'paragraph' and HEADING_REGEX.match(line) is not None
+                or kind == 'code' and not line.startswith(('    ', '\t'))
+            )
+        
+        if new_block:
+            if kind is not None:
+                ends.append(last + 1)
+            starts.append(index)
+            kind = _block_kind(line)
+            if kind == 'html':
+                html_tag = HTML_REGEX.match(line).group(1)
+                html_depth = 0
+        
+        if html_tag is not None:
+            html_depth = _html_depth(line, html_tag, html_depth)
+            if html_depth <= 0:
+                html_tag = None
+        if html_tag is None and line.lstrip()[:1] in ('`', '~'):
+            match = FENCE_REGEX.match(line)
+            if match:
+                fence = match.group(1)
+        blank = False
+        last = index
+    
+    if kind is not None:
+        ends.append(last + 1)
+    return starts, ends
+
+
+class SourceMapPreprocessor(Preprocessor):
+    def __init__(self, md, extension):
+        super().__init__(md)
+        self.extension = extension
+    
+    def run(self, lines):
+        starts, ends = find_blocks(lines)
+        source_map = SourceMap()
+        source_map.starts = starts
+        source_map.ends = ends
+        self.extension.source_map = source_map
+        self.extension.anchors = []
+        
+        output = []
+        previous = 0
+        for block, start in enumerate(starts):
+            output.extend(lines[previous:start])
+            if output and output[-1].strip():
+                output.append('')
+            output.append(TOKEN.format(block))
+            output.append('')
+            previous = start
+        output.extend(lines[previous:])
+        return output
+
+
+class SourceMapBlockProcessor(BlockProcessor):
+    """Takes the tokens out, noting where each block's elements begin"""
+    
+    def __init__(self, parser, extension):
+        super().__init__(parser)
+        self.extension = extension
+    
+    def test(self, parent, block):
+        return block.startswith(TOKEN_START)
+    
+    def run(self, parent, blocks):
+        block = blocks.pop(0)
+        match = TOKEN_REGEX.match(block)
+        self.extension.anchors.append((int(match.group(1)), len(parent)))
+        rest = block[match.end():].lstrip('\n')
+        if rest:
+            blocks.insert(0, rest)
+
+
+class SourceMapTreeprocessor(Treeprocessor):
+    """Sets data-block on the first top-level element of each block"""
+    
+    def __init__(self, md, extension):
+        super().__init__(md)
+        self.extension = extension
+    
+    def run(self, root):
+        anchors = self.extension.anchors
+        stash = self.md.htmlStash.rawHtmlBlocks
+        for index, (block, first) in enumerate(anchors):
+            end = anchors[index + 1][1] if index + 1 < len(anchors) else len(root)
+            if first >= end:
+                # Nothing rendered, e.g. link references
+                continue
+            element = root[first]
+            # Code, large tables and raw HTML are stashed until the end
+            match = None
+            if element.tag == 'p' and element.text and not len(element):
+                match = util.HTML_PLACEHOLDER_RE.fullmatch(element.text.strip())
+            if match is None:
+                element.set('data-block', str(block))
+                continue
+            raw = stash[int(match.group(1))]
+            if isinstance(raw, str):
+                stash[int(match.group(1))] = TAG_REGEX.sub(
+                    rf'\1 data-block="{block}"', raw, count=1
+                )
+            else:
+                raw.set('data-block', str(block))
+
+
+class SourceMapPostprocessor(Postprocessor):
+    def run(self, text):
+        # Tokens a block was mistaken to hold, e.g. inside unclosed HTML
+        if TOKEN_START not in text:
+            return text
+        return TOKEN_REGEX.sub('', text)
+
+
+class SourceMapExtension(Extension):
+    """Tags each top-level block of the output with its id in source_map
+
+    The first element of a block gets a data-block attribute; after a
+    conversion `source_map` maps the ids to source lines.
+    """
+    
+    def __init__(self, **kwargs):
+        self.source_map = SourceMap()
+        self.anchors = []
+        super().__init__(**kwargs)
+    
+    def reset(self):
+        # Empty documents skip the preprocessors
+        self.source_map = SourceMap()
+        self.anchors = []
+    
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        # Before includes (31), so the lines are those of the document
+        md.preprocessors.register(SourceMapPreprocessor(md, self), 'source_map', 35)
+        md.parser.blockprocessors.register(SourceMapBlockProcessor(md.parser, self), 'source_map', 110)
+        # After code highlighting (30), which replaces the code elements
+        md.treeprocessors.register(SourceMapTreeprocessor(md, self), 'source_map', 22)
+        md.postprocessors.register(SourceMapPostprocessor(md), 'source_map', 1)
\ No newline at end of file
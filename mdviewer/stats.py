@@ -0,0 +1,487 @@
+import re
+import math
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+
+from mdviewer.gutter import changed_lines
+
+# Average silent reading speed of adults, in words per minute
+READING_SPEED = 230
+
+WORD_REGEX = re.compile(r"[^\W_]+(?:['’.-][^\W_]+)*")
+
+# Link targets and HTML tags, whose text is not read
+MARKUP_REGEX = re.compile(r'\]\([^)]*\)|<[^>\n]*>')
+
+LINK_REGEX = re.compile(
+    r'(?<!!)\[[^\]\n]*\](?:\([^)\n]*\)|\[[^\]\n]*\])|<(?:https?|ftp|mailto):[^>\s]+>'
+)
+
+ATX_HEADING_REGEX = re.compile(r' {0,3}(#{1,6})(?:[ \t]|$)')
+SETEXT_REGEX = re.compile(r' {0,3}(=+|-+)[ \t]*$')
+FENCE_REGEX = re.compile(r'[ \t]*(`{3,}|~{3,})')
+
+# Heading codes of setext underlines, which only make a heading of the
+# line above when it is text
+SETEXT_LEVELS = {7: 1, 8: 2}
+
+LIST_ITEM_REGEX = re.compile(r'[ \t>]*(?:#|[-*+]|\d+[.)])[ \t]')
+SENTENCE_END_REGEX = re.compile(r'[.!?]+(?=[\s"\')\]*_]|$)')
+VOWEL_GROUP_REGEX = re.compile(r'[aeiouy]+')
+
+Statistics = namedtuple(
+    'Statistics', 'words reading_minutes headings links code_blocks code_lines longest_section'
+)
+
+# Heading title, level, line (from 1) and number of words of a section
+Section = namedtuple('Section', 'title level line words')
+
+Readability = namedtuple('Readability', 'reading_ease grade_level sentences syllables')
+
+def line_counts(line):
+    """Return (words, links, heading code, fence code) of a line
+
+    The heading code is the level of an ATX heading, or 7 and 8 for `===`
+    and `---` underlines. The fence code is the marker length, doubled,
+    plus one for tildes. Neither depends on other lines.
+    """
+    match = FENCE_REGEX.match(line)
+    if match:
+        marker = match.group(1)
+        fence = min(len(marker), 127) * 2 + (marker[0] == '~')
+        return len(WORD_REGEX.findall(line)), 0, 0, fence
+    
+    heading = 0
+    match = ATX_HEADING_REGEX.match(line)
+    if match:
+        heading = len(match.group(1))
+    else:
+        match = SETEXT_REGEX.match(line)
+        if match:
+            heading = 7 if match.group(1)[0] == '=' else 8
+    
+    links = 0
+    text = line
+    if '[' in line or '<' in line:
+        links = len(LINK_REGEX.findall(line))
+        text = MARKUP_REGEX.sub(' ', line)
+    return len(WORD_REGEX.findall(text)), links, heading, 0
+
+
+def _nonzero(values):
+    """Return the indexes of the non-zero entries of a byte array"""
+    return [match.start() for match in re.finditer(rb'[^\x00]', values.tobytes())]
+
+
+class DocumentStatistics:
+    """Counts of every line of a document and running totals of them
+
+    Attached to a QTextDocument, only the lines an edit touched are counted
+    again and the totals are adjusted by the difference, as LineDensity
+    does for the minimap. Code blocks, headings and sections are derived
+    from the few lines that are fences or headings when asked for.
+    """
+    
+    def __init__(self):
+        self.document = None
+        
+        # Text of every line, when not attached to a document
+        self.lines = None
+        
+        self.words = array('I', [0])
+        self.links = array('I', [0])
+        self.headings = array('B', [0])
+        self.fences = array('B', [0])
+        self.total_words = 0
+        self.total_links = 0
+    
+    def __len__(self):
+        return len(self.words)
+    
+    def attach(self, document):
+        if document is self.document:
+            return
+        self.detach()
+        self.document = document
+        self.lines = None
+        document.contentsChange.connect(self.on_contents_change)
+        self.rebuild(document.toPlainText().split('\n'))
+    
+    def detach(self):
+        if self.document is not None:
+            self.document.contentsChange.disconnect(self.on_contents_change)
+            self.document = None
+    
+    def set_text(self, text):
+        """Count a text that is not in a document, e.g. in reader mode"""
+        self.detach()
+        self.lines = text.split('\n')
+        self.rebuild(self.lines)
+    
+    def line_text(self, number):
+        if self.document is not None:
+            return self.document.findBlockByNumber(number).text()
+        return self.lines[number] if self.lines else ''
+    
+    @staticmethod
+    def count(lines):
+        words, links, headings, fences = zip(*map(line_counts, lines)) if lines else ((), (), (), ())
+        return array('I', words), array('I', links), array('B', headings), array('B', fences)
+    
+    def rebuild(self, lines):
+        self.words, self.links, self.headings, self.fences = self.count(lines)
+        self.total_words = sum(self.words)
+        self.total_links = sum(self.links)
+    
+    def on_contents_change(self, position, chars_removed, chars_added):
+        change = changed_lines(self.document, position, chars_added, len(self.words))
+        if change is None:
+            self.rebuild(self.document.toPlainText().split('\n'))
+            return
+        
+        first, old_last, lines = change
+        words, links, headings, fences = self.count(lines)
+        changed = slice(first, old_last + 1)
+        self.total_words += sum(words) - sum(self.words[changed])
+        self.total_links += sum(links) - sum(self.links[changed])
+        self.words[changed] = words
+        self.links[changed] = links
+        self.headings[changed] = headings
+        self.fences[changed] = fences
+    
+    def code_blocks(self):
+        """Return (first, last) line of every fenced code block, fences included"""
+        blocks = []
+        start = None
+        opening = 0
+        for line in _nonzero(self.fences):
+            fence = self.fences[line]
+            if start is None:
+                start, opening = line, fence
+            elif fence & 1 == opening & 1 and fence >= opening:
+                blocks.append((start, line))
+                start = None
+        if start is not None:
+            blocks.append((start, len(self.fences) - 1))
+        return blocks
+    
+    def heading_lines(self, blocks):
+        """Return (line, level) of every heading outside the code blocks"""
+        starts = [first for first, _ in blocks]
+        headings = []
+        for line in _nonzero(self.headings):
+            index = bisect_left(starts, line + 1) - 1
+            if index >= 0 and line <= blocks[index][1]:
+                continue
+            level = self.headings[line]
+            if level in SETEXT_LEVELS:
+                # The underline makes a heading of the text above it
+                if line == 0 or not self.words[line - 1] or self.headings[line - 1]:
+                    continue
+                line, level = line - 1, SETEXT_LEVELS[level]
+            headings.append((line, level))
+        return headings
+    
+    def statistics(self):
+        blocks = self.code_blocks()
+        code_words = [sum(self.words[first:last + 1]) for first, last in blocks]
+        code_links = sum(sum(self.links[first:last + 1]) for first, last in blocks)
+        words = self.total_words - sum(code_words)
+        
+        # Sections run from a heading to the next one; text before the
+        # first heading is not a section
+        longest = None
+        headings = self.heading_lines(blocks)
+        starts = [first for first, _ in blocks]
+        for index, (line, level) in enumerate(headings):
+            end = headings[index + 1][0] if index + 1 < len(headings) else len(self.words)
+            section_words = sum(self.words[line:end]) - sum(
+                code_words[bisect_left(starts, line):bisect_left(starts, end)]
+            )
+            if longest is None or section_words > longest[2]:
+                longest = (line, level, section_words)
+        
+        section = None
+        if longest is not None:
+            line, level, section_words = longest
+            title = self.line_text(line).strip().strip('#').strip()
+            section = Section(title, level, line + 1, section_words)
+        
+        return Statistics(
+            words=words,
+            reading_minutes=words / READING_SPEED,
+            headings=len(headings),
+            links=self.total_links - code_links,
+            code_blocks=len(blocks),
+            code_lines=sum(max(0, last - first - 1) for first, last in blocks),
+            longest_section=section,
+        )
+    
+    def prose(self):
+        """Return the text outside code blocks, for the readability worker"""
+        text = self.document.toPlainText() if self.document is not None else '\n'.join(self.lines or ())
+        lines = text.split('\n')
+        for first, last in reversed(self.code_blocks()):
+            del lines[first:last + 1]
+        return lines
+
+
+def syllables(word):
+    """Estimate the syllables of an English word from its vowel groups"""
+    word = word.lower()
+    count = len(VOWEL_GROUP_REGEX.findall(word))
+    if word.endswith('e') and not word.endswith(('le', 'ee')) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def readability_counts(line):
+    """Return (sentences, words, syllables) of a line of prose"""
+    text = MARKUP_REGEX.sub(' ', line) if ('](' in line or '<' in line) else line
+    words = WORD_REGEX.findall(text)
+    if not words:
+        return 0, 0, 0
+    sentences = len(SENTENCE_END_REGEX.findall(text))
+    # Headings and list items often end without punctuation
+    if not sentences and LIST_ITEM_REGEX.match(line):
+        sentences = 1
+    return sentences, len(words), sum(map(syllables, words))
+
+
+class ReadabilityCounter:
+    """Flesch scores of a text, with the counts of each line cached
+
+    Lines are looked up by their text, so after an edit only new or
+    changed lines are counted. Only used from one worker thread at a time.
+    """
+    
+    def __init__(self):
+        self.cache = {}
+    
+    def measure(self, lines, cancelled=lambda: False):
+        cache = {}
+        old = self.cache
+        sentences = words = total_syllables = 0
+        for index, line in enumerate(lines):
+            counts = cache.get(line)
+            if counts is None:
+                counts = old.get(line)
+                if counts is None:
+                    counts = readability_counts(line)
+                cache[line] = counts
+            sentences += counts[0]
+            words += counts[1]
+            total_syllables += counts[2]
+            if not index % 5000 and cancelled():
+                return None
+        self.cache = cache
+        
+        if not words:
+            return None
+        sentences = max(1, sentences)
+        words_per_sentence = words / sentences
+        syllables_per_word = total_syllables / words
+        return Readability(
+            reading_ease=206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word,
+            grade_level=0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59,
+            sentences=sentences,
+            syllables=total_syllables,
+        )
+
+
+class _ReadabilitySignals(QObject):
+    finished = pyqtSignal(int, object)  # generation, Readability or None
+
+
+class _ReadabilityTask(QRunnable):
+    def __init__(self, generation, lines, panel):
+        super().__init__()
+        self.generation = generation
+        self.lines = lines
+        self.panel = panel
+        self.counter = panel.readability_counter
+        self.signals = panel.signals
+    
+    def cancelled(self):
+        # Superseded by a later edit
+        return self.panel.generation != self.generation
+    
+    def run(self):
+        result = self.counter.measure(self.lines, self.cancelled)
+        if not self.cancelled():
+            self.signals.finished.emit(self.generation, result)
+
+
+class StatisticsPanel(QWidget):
+    """Live document statistics
+
+    Counts are kept per line and totalled on every edit (coalesced to one
+    update per 200 ms); readability scores are computed on a worker thread
+    once typing pauses.
+    """
+    
+    # Signal emitted when the longest section is clicked
+    heading_clicked = pyqtSignal(str, int, int)
+    
+    ROWS = (
+        ("words", "Words"),
+        ("reading_time", "Reading time"),
+        ("headings", "Headings"),
+        ("links", "Links"),
+        ("code_blocks", "Code blocks"),
+        ("code_lines", "Code lines"),
+        ("longest_section", "Longest section"),
+        ("reading_ease", "Reading ease"),
+        ("grade_level", "Grade level"),
+    )
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.stats = DocumentStatistics()
+        self.longest_section = None
+        
+        self.readability_counter = ReadabilityCounter()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.signals = _ReadabilitySignals()
+        self.signals.finished.connect(self.on_readability_finished)
+        
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(200)
+        self.update_timer.timeout.connect(self.refresh)
+        
+        self.readability_timer = QTimer(self)
+        self.readability_timer.setSingleShot(True)
+        self.readability_timer.setInterval(1000)
+        self.readability_timer.timeout.connect(self.update_readability)
+        
+        self.setup_ui()
+    
+    def setup_ui(self):
+        self.setMinimumWidth(200)
+        self.setMaximumWidth(400)
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.header_label = QLabel("Statistics")
+        layout.addWidget(self.header_label)
+        
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(2)
+        self.tree.setHeaderHidden(True)
+        self.tree.setRootIsDecorated(False)
+        self.items = {}
+        for key, label in self.ROWS:
+            item = QTreeWidgetItem([label, ""])
+            item.setTextAlignment(1, Qt.AlignmentFlag.AlignRight)
+            self.tree.addTopLevelItem(item)
+            self.items[key] = item
+        self.tree.resizeColumnToContents(0)
+        layout.addWidget(self.tree)
+        
+        # Connect signals
+        self.tree.itemClicked.connect(self.on_item_clicked)
+        self.tree.itemActivated.connect(self.on_item_clicked)
+    
+    def set_document(self, document):
+        """Follow the edits of a document"""
+        if document is self.stats.document:
+            return
+        self.stats.attach(document)
+        document.contentsChange.connect(self.on_contents_change)
+        self.schedule()
+    
+    def set_text(self, text):
+        """Show the statistics of a text that is not being edited"""
+        self.disconnect_document()
+        self.stats.set_text(text)
+        self.schedule()
+    
+    def disconnect_document(self):
+        """Stop following the document, e.g. while the panel is hidden"""
+        document = self.stats.document
+        if document is not None:
+            document.contentsChange.disconnect(self.on_contents_change)
+            self.stats.detach()
+    
+    def on_contents_change(self, position, chars_removed, chars_added):
+        self.schedule()
+    
+    def schedule(self):
+        self.update_timer.start()
+        self.readability_timer.start()
+    
+    def refresh(self):
+        stats = self.stats.statistics()
+        self.items["words"].setText(1, f"{stats.words:,}")
+        minutes = math.ceil(stats.reading_minutes)
+        self.items["reading_time"].setText(1, f"{minutes:,} min" if stats.words else "0 min")
+        self.items["headings"].setText(1, f"{stats.headings:,}")
+        self.items["links"].setText(1, f"{stats.links:,}")
+        self.items["code_blocks"].setText(1, f"{stats.code_blocks:,}")
+        self.items["code_lines"].setText(1, f"{stats.code_lines:,}")
+        
+        section = stats.longest_section
+        self.longest_section = section
+        item = self.items["longest_section"]
+        if section is None:
+            item.setText(1, "")
+            item.setToolTip(1, "")
+        else:
+            item.setText(1, f"{section.words:,} words")
+            item.setToolTip(1, f"{section.title} (line {section.line})")
+    
+    def update_readability(self):
+        """Score the prose on the worker thread; stale runs stop early"""
+        self.generation += 1
+        self.pool.start(_ReadabilityTask(self.generation, self.stats.prose(), self))
+    
+    def on_readability_finished(self, generation, result):
+        if generation != self.generation:
+            return
+        if result is None:
+            self.items["reading_ease"].setText(1, "")
+            self.items["grade_level"].setText(1, "")
+            return
+        self.items["reading_ease"].setText(1, f"{result.reading_ease:.0f}")
+        self.items["grade_level"].setText(1, f"{result.grade_level:.1f}")
+        self.items["reading_ease"].setToolTip(
+            1, "Flesch reading ease: 60-70 is plain English, lower is harder"
+        )
+        self.items["grade_level"].setToolTip(
+            1, f"Flesch-Kincaid grade, over {result.sentences:,} sentences"
+        )
+    
+    def on_item_clicked(self, item, column=0):
+        section = self.longest_section
+        if item is self.items["longest_section"] and section is not None:
+            self.heading_clicked.emit(section.title, section.level, section.line)
+    
+    def set_dark_mode(self, dark_mode):
+        """Apply dark mode to the statistics widget"""
+        palette = self.palette()
+        
+        if dark_mode:
+            # Dark mode colors
+            palette.setColor(QPalette.ColorRole.Base, QColor("#1E1E1E"))
+            palette.setColor(QPalette.ColorRole.Text, QColor("#FFFFFF"))
+            palette.setColor(QPalette.ColorRole.Window, QColor("#252526"))
+            palette.setColor(QPalette.ColorRole.WindowText, QColor("#FFFFFF"))
+        else:
+            # Light mode colors
+            palette.setColor(QPalette.ColorRole.Base, QColor("#FFFFFF"))
+            palette.setColor(QPalette.ColorRole.Text, QColor("#000000"))
+            palette.setColor(QPalette.ColorRole.Window, QColor("#F0F0F0"))
+            palette.setColor(QPalette.ColorRole.WindowText, QColor("#000000"))
+        
+        self.setPalette(palette)
+        self.tree.setPalette(palette)
\ No newline at end of file
@@ -0,0 +1,260 @@
+import re
+import json
+import xml.etree.ElementTree as etree
+
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+from markdown.postprocessors import Postprocessor
+from markdown.treeprocessors import InlineProcessor, UnescapeTreeprocessor
+
+# Tables with at least this many body rows take the fast path
+LARGE_TABLE_ROWS = 500
+
+# Rows drawn above and below the visible part of a virtualized table
+VIRTUAL_OVERSCAN = 20
+
+DELIMITER_REGEX = re.compile(r' {0,3}\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$')
+
+# Cells without these are plain text and need no inline processing: the
+# characters of Markdown, HTML, strikethrough and math syntax, and the
+# starts of emoji shortcodes and bare URLs and addresses
+INLINE_SPECIAL_REGEX = re.compile(r'[\\`*_\[<>&~$@]|:(?:\w|//)|www\.')
+
+# A pipe after an unmatched backtick, i.e. inside a single-backtick code span
+SPAN_PIPE_REGEX = re.compile(r'(?:[^`]*`[^`]*`)*[^`]*`[^`|]*\|')
+
+# The rows of a virtualized table until they are final HTML; see
+# VirtualTablePostprocessor
+ROWS_MARK = '\ue001'
+ROW_SEPARATOR = '\ue002'
+CELL_SEPARATOR = '\ue003'
+ROWS_REGEX = re.compile(f'{ROWS_MARK}([^{ROWS_MARK}]*){ROWS_MARK}')
+
+# Defines mdvVirtualTable(); included by the preview when a page has virtual tables
+VIRTUAL_TABLE_SCRIPT = """
+function mdvVirtualTable(id) {
+    const container = document.getElementById(id);
+    const rows = JSON.parse(container.querySelector('script').textContent);
+    const tbody = container.querySelector('tbody');
+    const head = container.querySelector('thead');
+    const aligns = Array.from(container.querySelectorAll('th'), th => th.style.textAlign);
+    const overscan = %d;
+    let rowHeight = 0;
+    let first = -1;
+    let last = -1;
+    let pending = false;
+
+    function row(index) {
+        return '<tr>' + rows[index].map((cell, column) =>
+            '<td style="text-align: ' + (aligns[column] || '') + '">' + cell + '</td>').join('') + '</tr>';
+    }
+
+    function render() {
+        pending = false;
+        if (!rowHeight) {
+            tbody.innerHTML = rows.length ? row(0) : '';
+            rowHeight = (tbody.firstChild && tbody.firstChild.getBoundingClientRect().height) || 30;
+        }
+        const top = Math.max(0, container.scrollTop - head.offsetHeight);
+        const start = Math.max(0, Math.floor(top / rowHeight) - overscan);
+        const end = Math.min(rows.length, Math.ceil((top + container.clientHeight) / rowHeight) + overscan);
+        if (start === first && end === last) {
+            return;
+        }
+        first = start;
+        last = end;
+
+        const parts = ['<tr class="spacer" style="height: ' + start * rowHeight + 'px"></tr>'];
+        for (let index = start; index < end; index++) {
+            parts.push(row(index));
+        }
+        parts.push('<tr class="spacer" style="height: ' + (rows.length - end) * rowHeight + 'px"></tr>');
+        tbody.innerHTML = parts.join('');
+    }
+
+    container.addEventListener('scroll', () => {
+        if (!pending) {
+            pending = true;
+            requestAnimationFrame(render);
+        }
+    }, {passive: true});
+    render();
+}
+""" % VIRTUAL_OVERSCAN
+
+def split_row(row):
+    """Split a table row into cell texts at unescaped pipes outside code spans"""
+    row = row.strip()
+    cells = row.split('|')
+    if '\\' in row or ('`' in row and ('``' in row or SPAN_PIPE_REGEX.match(row))):
+        cells = []
+        start = 0
+        index = 0
+        length = len(row)
+        while index < length:
+            char = row[index]
+            if char == '\\':
+                index += 2
+                continue
+            if char == '`':
+                # Skip to the closing run of the same number of backticks
+                end = index
+                while end < length and row[end] == '`':
+                    end += 1
+                ticks = row[index:end]
+                close = row.find(ticks, end)
+                index = close + len(ticks) if close >= 0 else end
+                continue
+            if char == '|':
+                cells.append(row[start:index])
+                start = index + 1
+            index += 1
+        cells.append(row[start:])
+    
+    if row.startswith('|'):
+        cells.pop(0)
+    if len(cells) > 1 and row.endswith('|') and not row.endswith('\\|'):
+        cells.pop()
+    return [cell.strip() for cell in cells]
+
+
+def column_alignments(delimiter):
+    alignments = []
+    for cell in split_row(delimiter):
+        if cell.startswith(':') and cell.endswith(':'):
+            alignments.append('center')
+        elif cell.startswith(':'):
+            alignments.append('left')
+        elif cell.endswith(':'):
+            alignments.append('right')
+        else:
+            alignments.append(None)
+    return alignments
+
+
+class FastTablePreprocessor(Preprocessor):
+    """Renders large pipe tables straight to HTML
+
+    Smaller tables are left to TableExtension; large ones are split with
+    a dedicated scanner. Cells go through the same inline patterns as the
+    rest of the document, all at once, and plain text cells skip them.
+    The rows are emitted as JSON for mdvVirtualTable() instead of markup.
+    """
+    
+    def run(self, lines):
+        # Delimiter rows are rare, so find them before looking at anything else
+        candidates = [
+            number for number, line in enumerate(lines)
+            if '-' in line and '|' in line and DELIMITER_REGEX.match(line)
+        ]
+        if not candidates:
+            return lines
+        
+        output = []
+        position = 0
+        tables = 0
+        for delimiter in candidates:
+            header = delimiter - 1
+            if header < position or '|' not in lines[header]:
+                continue
+            # A table starts a block
+            if header > 0 and lines[header - 1].strip():
+                continue
+            
+            end = delimiter + 1
+            while end < len(lines) and lines[end].strip():
+                end += 1
+            if end - delimiter - 1 < LARGE_TABLE_ROWS:
+                continue
+            
+            alignments = column_alignments(lines[delimiter])
+            headers = split_row(lines[header])
+            if len(headers) != len(alignments):
+                continue
+            
+            table_html = self.render_table(
+                headers, alignments, lines[delimiter + 1:end], f"vt-{tables}"
+            )
+            tables += 1
+            output.extend(lines[position:header])
+            output.extend(['', self.md.htmlStash.store(table_html), ''])
+            position = end
+        
+        if not tables:
+            return lines
+        output.extend(lines[position:])
+        return output
+    
+    def render_cells(self, cells):
+        """Replace the Markdown of each cell in a list of rows with HTML"""
+        pending = [
+            (row, column)
+            for row, row_cells in enumerate(cells) if INLINE_SPECIAL_REGEX.search(''.join(row_cells))
+            for column, cell in enumerate(row_cells) if INLINE_SPECIAL_REGEX.search(cell)
+        ]
+        if not pending:
+            return
+        
+        root = etree.Element('div')
+        for row, column in pending:
+            etree.SubElement(root, 'td').text = cells[row][column]
+        # The patterns keep their state on the registered processor. Its
+        # class's run(), as the instance's is timed as the core's.
+        InlineProcessor.run(self.md.treeprocessors['inline'], root)
+        UnescapeTreeprocessor(self.md).run(root)
+        for (row, column), element in zip(pending, root):
+            # Without the <td> and </td> around it
+            cells[row][column] = self.md.serializer(element)[4:-5]
+    
+    def render_table(self, headers, alignments, rows, table_id):
+        columns = len(alignments)
+        styles = [f' style="text-align: {align};"' if align else '' for align in alignments]
+        
+        cells = [headers]
+        for row in rows:
+            row_cells = split_row(row)[:columns]
+            row_cells.extend([''] * (columns - len(row_cells)))
+            cells.append(row_cells)
+        self.render_cells(cells)
+        head = ''.join(f'<th{style}>{cell}</th>' for cell, style in zip(cells.pop(0), styles))
+        
+        # Raw HTML and math in the cells are only put back at the end,
+        # so the rows become JSON after them
+        data = ROW_SEPARATOR.join(CELL_SEPARATOR.join(row) for row in cells)
+        return (
+            f'<div class="virtual-table" id="{table_id}">'
+            f'<table><thead><tr>{head}</tr></thead><tbody></tbody></table>'
+            f'<script type="application/json">{ROWS_MARK}{data}{ROWS_MARK}</script></div>'
+            f'<script>mdvVirtualTable("{table_id}");</script>'
+        )
+
+
+class VirtualTablePostprocessor(Postprocessor):
+    """Turns the rows of virtualized tables into JSON"""
+    
+    def run(self, text):
+        if ROWS_MARK not in text:
+            return text
+        return ROWS_REGEX.sub(self.rows_json, text)
+    
+    @staticmethod
+    def rows_json(match):
+        rows = [row.split(CELL_SEPARATOR) for row in match.group(1).split(ROW_SEPARATOR)]
+        # Escaped '<' can't end the script element early, or be rewritten
+        # as a tag by anything that edits the page's HTML
+        return json.dumps(rows, ensure_ascii=False, separators=(',', ':')).replace('<', '\\u003c')
+
+
+class FastTableExtension(Extension):
+    """Virtualized grids for large pipe tables, used alongside TableExtension
+
+    Only the preview can run the script that draws them.
+    """
+    
+    def extendMarkdown(self, md):
+        # After fenced code blocks (25) have been stashed away
+        md.preprocessors.register(
+            FastTablePreprocessor(md), 'fast_tables', 24
+        )
+        # After raw HTML (30), entities (20) and math (5) are put back
+        md.postprocessors.register(VirtualTablePostprocessor(md), 'virtual_tables', 3)
\ No newline at end of file
@@ -0,0 +1,575 @@
+import os
+import re
+import hashlib
+import sqlite3
+
+from PyQt6.QtCore import (
+    Qt, QObject, QRunnable, QThreadPool, QTimer, QDir, QStandardPaths,
+    QFileSystemWatcher, pyqtSignal
+)
+from PyQt6.QtGui import QColor, QPalette, QFileSystemModel
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QLabel, QLineEdit, QListWidget, QListWidgetItem,
+    QTreeView, QSplitter
+)
+
+from mdviewer.fileio import read_document
+
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+HEADING_REGEX = re.compile(r'^(#{1,6})\s+(.+)$')
+
+FENCE_REGEX = re.compile(r'^[ \t]*(`{3,}|~{3,})')
+
+# Characters used by highlight() to mark matched terms
+MATCH_START = '\x01'
+MATCH_END = '\x02'
+
+# Files indexed per transaction; a save during a long first index waits
+# for one batch, not for the whole folder
+INDEX_BATCH = 50
+
+def scan_markdown_files(root, directories=None):
+    """Yield (path, mtime, size) for every Markdown file below root
+
+    The folders walked, hidden ones aside, are added to `directories`.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        if directories is not None:
+            directories.append(directory)
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # Skip hidden folders such as .git
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(MARKDOWN_EXTENSIONS):
+                            stat = entry.stat()
+                            yield entry.path, stat.st_mtime, stat.st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def split_sections(text):
+    """Split markdown into (line, heading, body) sections
+
+    line is the 1-based line of the heading (0 for text before the first
+    heading); the body starts on the following line.
+    """
+    sections = []
+    start = 0
+    heading = ''
+    body = []
+    fence = None
+    
+    for line_no, line in enumerate(text.split('\n'), 1):
+        # Comments in code blocks look like headings
+        match = FENCE_REGEX.match(line)
+        if match:
+            marker = match.group(1)
+            if fence is None:
+                fence = marker
+            elif marker[0] == fence[0] and len(marker) >= len(fence):
+                fence = None
+        match = None if fence is not None else HEADING_REGEX.match(line)
+        if match:
+            if heading or any(body):
+                sections.append((start, heading, '\n'.join(body)))
+            start = line_no
+            heading = match.group(2).strip()
+            body = []
+        else:
+            body.append(line)
+    
+    if heading or any(body):
+        sections.append((start, heading, '\n'.join(body)))
+    
+    return sections
+
+
+def build_query(text):
+    """Turn user input into an FTS5 query matching all words as prefixes"""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class SearchHit:
+    """A ranked search result pointing at a file and line"""
+    
+    __slots__ = ('path', 'line', 'heading', 'text')
+    
+    def __init__(self, path, line, heading, text):
+        self.path = path
+        self.line = line
+        self.heading = heading
+        self.text = text
+
+
+class WorkspaceIndex:
+    """Persistent full-text index of the Markdown files in a folder"""
+    
+    def __init__(self, root, db_path=None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or self.default_db_path(self.root)
+        
+        # Folders walked by the last update()
+        self.directories = []
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+    
+    @staticmethod
+    def default_db_path(root):
+        data_dir = QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.AppLocalDataLocation
+        )
+        digest = hashlib.sha1(root.encode('utf-8')).hexdigest()
+        return os.path.join(data_dir, "workspaces", f"{digest}.sqlite")
+    
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime REAL, size INTEGER, "
+                "first_row INTEGER, last_row INTEGER)"
+            )
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sections'"
+            ).fetchone()
+            if not exists:
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE sections USING fts5("
+                    "file_id UNINDEXED, line UNINDEXED, heading, body, "
+                    "tokenize='unicode61')"
+                )
+                # Rank heading matches well above body matches
+                self.conn.execute(
+                    "INSERT INTO sections(sections, rank) "
+                    "VALUES('rank', 'bm25(0.0, 0.0, 10.0, 1.0)')"
+                )
+    
+    def close(self):
+        self.conn.close()
+    
+    def update(self, directories=None):
+        """Bring the index up to date with the folder, or only with the given
+        folders in it and their subfolders; return the changed paths"""
+        tops = directories or [self.root]
+        known = {
+            path: (mtime, size)
+            for path, mtime, size in self.conn.execute("SELECT path, mtime, size FROM files")
+        }
+        
+        changed = []
+        seen = set()
+        walked = []
+        for top in tops:
+            for path, mtime, size in scan_markdown_files(top, walked):
+                seen.add(path)
+                if known.get(path) != (mtime, size):
+                    changed.append(path)
+        self.directories = walked
+        
+        prefixes = tuple(os.path.join(top, '') for top in tops)
+        removed = [path for path in known if path.startswith(prefixes) and path not in seen]
+        
+        with self.conn:
+            for path in removed:
+                self._remove(path)
+        for start in range(0, len(changed), INDEX_BATCH):
+            with self.conn:
+                for path in changed[start:start + INDEX_BATCH]:
+                    self._index(path)
+        
+        return changed + removed
+    
+    def update_files(self, paths):
+        """Re-index some files, e.g. after they were saved or edited"""
+        for path in paths:
+            path = os.path.abspath(path)
+            with self.conn:
+                if os.path.exists(path):
+                    self._index(path)
+                else:
+                    self._remove(path)
+    
+    def _remove(self, path):
+        row = self.conn.execute(
+            "SELECT id, first_row, last_row FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return
+        
+        file_id, first_row, last_row = row
+        # Sections of a file are inserted together, so their rowids form a range
+        if first_row is not None:
+            self.conn.execute(
+                "DELETE FROM sections WHERE rowid BETWEEN ? AND ?", (first_row, last_row)
+            )
+        self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+    
+    def _index(self, path):
+        self._remove(path)
+        
+        try:
+            stat = os.stat(path)
+            text, _ = read_document(path)
+        except OSError:
+            return
+        
+        cursor = self.conn.execute(
+            "INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+            (path, stat.st_mtime, stat.st_size)
+        )
+        file_id = cursor.lastrowid
+        
+        first_row = last_row = None
+        for line, heading, body in split_sections(text):
+            cursor = self.conn.execute(
+                "INSERT INTO sections (file_id, line, heading, body) VALUES (?, ?, ?, ?)",
+                (file_id, line, heading, body)
+            )
+            if first_row is None:
+                first_row = cursor.lastrowid
+            last_row = cursor.lastrowid
+        
+        self.conn.execute(
+            "UPDATE files SET first_row = ?, last_row = ? WHERE id = ?",
+            (first_row, last_row, file_id)
+        )
+    
+    def paths(self):
+        """Return the paths of all indexed files"""
+        return [row[0] for row in self.conn.execute("SELECT path FROM files ORDER BY path")]
+    
+    def search(self, text, limit=50):
+        """Return ranked SearchHits for the words in text"""
+        query = build_query(text)
+        if not query:
+            return []
+        
+        try:
+            # Rank first so highlighting only runs on the returned rows
+            row_ids = [
+                row[0] for row in self.conn.execute(
+                    "SELECT rowid FROM sections WHERE sections MATCH ? ORDER BY rank LIMIT ?",
+                    (query, limit)
+                )
+            ]
+            if not row_ids:
+                return []
+            
+            placeholders = ','.join('?' * len(row_ids))
+            rows = self.conn.execute(
+                "SELECT sections.rowid, files.path, sections.line, sections.heading, "
+                f"highlight(sections, 3, '{MATCH_START}', '{MATCH_END}') "
+                "FROM sections JOIN files ON files.id = sections.file_id "
+                f"WHERE sections MATCH ? AND sections.rowid IN ({placeholders})",
+                (query, *row_ids)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        
+        by_row = {row[0]: row[1:] for row in rows}
+        hits = []
+        for row_id in row_ids:
+            if row_id not in by_row:
+                continue
+            path, line, heading, body = by_row[row_id]
+            hits.append(self._make_hit(path, line, heading, body))
+        return hits
+    
+    def _make_hit(self, path, line, heading, body):
+        position = body.find(MATCH_START)
+        if position < 0:
+            # Only the heading matched
+            return SearchHit(path, max(line, 1), heading, heading)
+        
+        line_start = body.rfind('\n', 0, position) + 1
+        line_end = body.find('\n', position)
+        if line_end < 0:
+            line_end = len(body)
+        text = body[line_start:line_end].replace(MATCH_START, '').replace(MATCH_END, '')
+        
+        hit_line = line + 1 + body.count('\n', 0, position)
+        return SearchHit(path, hit_line, heading, text.strip())
+
+
+class _IndexSignals(QObject):
+    finished = pyqtSignal(str, list, list)  # root, changed paths, folders walked
+    files_updated = pyqtSignal(list)  # re-indexed paths
+
+
+class _IndexTask(QRunnable):
+    """Updates the index for some folders, or only `paths` when given"""
+    
+    def __init__(self, root, db_path, signals, directories=None, paths=None):
+        super().__init__()
+        self.root = root
+        self.db_path = db_path
+        self.signals = signals
+        self.directories = directories
+        self.paths = paths
+    
+    def run(self):
+        # SQLite connections must not be shared between threads
+        index = WorkspaceIndex(self.root, self.db_path)
+        try:
+            if self.paths is None:
+                changed = index.update(self.directories)
+            else:
+                index.update_files(self.paths)
+                changed = self.paths
+        except sqlite3.Error:
+            changed = []
+        finally:
+            index.close()
+        
+        if self.paths is None:
+            self.signals.finished.emit(self.root, changed, index.directories)
+        else:
+            self.signals.files_updated.emit(changed)
+
+
+class WorkspacePanel(QWidget):
+    # Signal emitted when a file should be opened at a line
+    file_requested = pyqtSignal(str, int)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.root = None
+        self.index = None
+        self.indexing = False
+        self.reindex_pending = False
+        
+        # Folders reported as changed, rescanned together, and files saved
+        # from the editor
+        self.changed_directories = set()
+        self.changed_files = set()
+        
+        # Index tasks run one at a time, so only one connection writes and
+        # the GUI thread only reads
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = _IndexSignals()
+        self.signals.finished.connect(self.on_index_finished)
+        self.signals.files_updated.connect(self.on_files_updated)
+        
+        # Only folders are watched, since some systems need a descriptor
+        # per watch; a folder reports files added, removed or renamed over,
+        # and its files are then compared by mtime and size
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        
+        self.reindex_timer = QTimer(self)
+        self.reindex_timer.setSingleShot(True)
+        self.reindex_timer.setInterval(500)
+        self.reindex_timer.timeout.connect(self.reindex)
+        
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        
+        self.setup_ui()
+    
+    def setup_ui(self):
+        self.setMinimumWidth(200)
+        self.setMaximumWidth(400)
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        # Header label
+        self.header_label = QLabel("Workspace")
+        self.header_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.header_label)
+        
+        # Search field
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search workspace...")
+        self.search_input.setClearButtonEnabled(True)
+        layout.addWidget(self.search_input)
+        
+        # Folder tree and search results
+        self.model = QFileSystemModel(self)
+        self.model.setNameFilters([f"*{ext}" for ext in MARKDOWN_EXTENSIONS])
+        self.model.setNameFilterDisables(False)
+        self.model.setFilter(QDir.Filter.AllDirs | QDir.Filter.Files | QDir.Filter.NoDotAndDotDot)
+        
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
+        self.tree.setHeaderHidden(True)
+        for column in range(1, self.model.columnCount()):
+            self.tree.hideColumn(column)
+        
+        self.results = QListWidget()
+        self.results.hide()
+        
+        self.splitter = QSplitter(Qt.Orientation.Vertical)
+        self.splitter.addWidget(self.results)
+        self.splitter.addWidget(self.tree)
+        layout.addWidget(self.splitter)
+        
+        # Connect signals
+        self.search_input.textChanged.connect(self.on_search_changed)
+        self.search_input.returnPressed.connect(self.run_search)
+        self.tree.activated.connect(self.on_tree_activated)
+        self.tree.clicked.connect(self.on_tree_activated)
+        self.results.itemActivated.connect(self.on_result_activated)
+        self.results.itemClicked.connect(self.on_result_activated)
+    
+    def set_root(self, root):
+        """Open a folder as the workspace and index it in the background"""
+        root = os.path.abspath(root)
+        if self.index:
+            self.index.close()
+        
+        self.root = root
+        self.index = WorkspaceIndex(root)
+        self.header_label.setText(os.path.basename(root) or root)
+        
+        self.model.setRootPath(root)
+        self.tree.setRootIndex(self.model.index(root))
+        
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        self.changed_files.clear()
+        self.changed_directories = {root}
+        self.reindex()
+    
+    def watch_directories(self, directories):
+        """Watch the folders the watcher doesn't know yet"""
+        # Deleted folders drop out of the watcher by themselves
+        watched = set(self.watcher.directories())
+        missing = [path for path in directories if path not in watched]
+        if missing:
+            # Beyond the system's limit on watches, folders are left out
+            self.watcher.addPaths(missing)
+    
+    def on_directory_changed(self, path):
+        self.changed_directories.add(path)
+        self.reindex_timer.start()
+    
+    def reindex_files(self):
+        """Re-index the changed files on the worker thread"""
+        if not self.root or not self.changed_files:
+            return
+        paths = sorted(self.changed_files)
+        self.changed_files.clear()
+        self.pool.start(
+            _IndexTask(self.root, self.index.db_path, self.signals, paths=paths)
+        )
+    
+    def reindex(self):
+        """Incrementally update the changed folders on a worker thread"""
+        if not self.root or not self.changed_directories:
+            return
+        if self.indexing:
+            self.reindex_pending = True
+            return
+        
+        # A folder's subfolders are rescanned with it
+        directories = sorted(self.changed_directories)
+        self.changed_directories.clear()
+        directories = [
+            path for path in directories
+            if not any(path.startswith(os.path.join(other, '')) for other in directories)
+        ]
+        
+        self.indexing = True
+        self.header_label.setText(f"{os.path.basename(self.root)} (indexing...)")
+        self.pool.start(_IndexTask(self.root, self.index.db_path, self.signals, directories))
+    
+    def on_index_finished(self, root, changed, directories):
+        self.indexing = False
+        self.header_label.setText(os.path.basename(self.root) or self.root)
+        # An older root's update may finish after a switch
+        if root == self.root:
+            self.watch_directories(directories)
+        
+        if self.reindex_pending:
+            self.reindex_pending = False
+            self.reindex()
+        elif changed and self.search_input.text():
+            self.run_search()
+    
+    def file_saved(self, path):
+        """Re-index a file that was saved from the editor"""
+        path = os.path.abspath(path)
+        if self.index and path.startswith(self.root + os.sep):
+            self.changed_files.add(path)
+            self.reindex_files()
+    
+    def on_files_updated(self, paths):
+        if paths and self.search_input.text():
+            self.run_search()
+    
+    def on_search_changed(self, text):
+        if text.strip():
+            self.search_timer.start()
+        else:
+            self.search_timer.stop()
+            self.results.clear()
+            self.results.hide()
+    
+    def run_search(self):
+        if not self.index:
+            return
+        
+        hits = self.index.search(self.search_input.text())
+        
+        self.results.clear()
+        for hit in hits:
+            location = f"{os.path.relpath(hit.path, self.root)}:{hit.line}"
+            item = QListWidgetItem(f"{hit.text}\n{location}")
+            item.setToolTip(f"{hit.heading}\n{hit.path}" if hit.heading else hit.path)
+            item.setData(Qt.ItemDataRole.UserRole, (hit.path, hit.line))
+            self.results.addItem(item)
+        
+        if not hits:
+            self.results.addItem("No results")
+        self.results.show()
+    
+    def on_tree_activated(self, index):
+        if not self.model.isDir(index):
+            self.file_requested.emit(self.model.filePath(index), 0)
+    
+    def on_result_activated(self, item):
+        data = item.data(Qt.ItemDataRole.UserRole)
+        if data:
+            path, line = data
+            self.file_requested.emit(path, line)
+    
+    def set_dark_mode(self, dark_mode):
+        """Apply dark mode to the workspace widget"""
+        palette = self.palette()
+        
+        if dark_mode:
+            # Dark mode colors
+            palette.setColor(QPalette.ColorRole.Base, QColor("#1E1E1E"))
+            palette.setColor(QPalette.ColorRole.Text, QColor("#FFFFFF"))
+            palette.setColor(QPalette.ColorRole.Window, QColor("#252526"))
+            palette.setColor(QPalette.ColorRole.WindowText, QColor("#FFFFFF"))
+        else:
+            # Light mode colors
+            palette.setColor(QPalette.ColorRole.Base, QColor("#FFFFFF"))
+            palette.setColor(QPalette.ColorRole.Text, QColor("#000000"))
+            palette.setColor(QPalette.ColorRole.Window, QColor("#F0F0F0"))
+            palette.setColor(QPalette.ColorRole.WindowText, QColor("#000000"))
+        
+        self.setPalette(palette)
+        self.tree.setPalette(palette)
+        self.results.setPalette(palette)
\ No newline at end of file